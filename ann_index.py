@@ -0,0 +1,228 @@
+import os
+import tempfile
+
+import numpy as np
+
+from quantization import QUANTIZED_DTYPES, quantize_int8
+
+# --- Indice aproximado de vecinos mas cercanos (IVF-flat) ---
+# Los vectores se agrupan con k-means en 'nlist' listas invertidas. Una consulta solo
+# compara contra los centroides y contra los vectores de las 'nprobe' listas mas
+# cercanas, en lugar de contra todo el conjunto. La similitud es el coseno: los
+# vectores se guardan normalizados y se usa el producto punto.
+# Las listas pueden guardarse en float16 o en int8 con escala por fila (dtype), igual
+# que los embeddings cuantizados: asi el indice de un modelo cuantizado no vuelve a
+# ocupar una copia float32 de toda la matriz.
+
+def normalize_rows(vectors):
+    """Normaliza cada fila a norma L2 unitaria (las filas nulas quedan a cero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class IVFIndex:
+    """Indice IVF-flat en NumPy para busqueda aproximada por similitud de coseno."""
+
+    def __init__(self, nlist=None, nprobe=8, dtype="float32"):
+        if dtype != "float32" and dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Tipo de almacenamiento desconocido: '{dtype}'.")
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.dtype = dtype
+        self.centroids = None
+        self.list_vectors = []  # Un array (n_i, d) por lista invertida (en 'dtype')
+        self.list_scales = []   # Con int8, un array (n_i,) de escalas por lista
+        self.list_ids = []      # Un array (n_i,) de identificadores por lista
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.list_ids)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def train(self, vectors, iterations=10, max_samples_per_list=256, seed=0):
+        """Aprende los centroides con k-means esferico sobre una muestra de los vectores."""
+        vectors = normalize_rows(vectors)
+        if self.nlist is None:
+            self.nlist = max(1, int(np.sqrt(len(vectors))))
+        self.nlist = min(self.nlist, len(vectors))
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), self.nlist * max_samples_per_list)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = self._nearest_centroid(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=self.nlist)
+            # Las listas vacias conservan su centroide anterior
+            empty = counts == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+
+        self.centroids = centroids
+        self.list_vectors = [np.empty((0, vectors.shape[1]), dtype=self.dtype) for _ in range(self.nlist)]
+        self.list_scales = [np.empty(0, dtype=np.float32) for _ in range(self.nlist)] if self.dtype == "int8" else []
+        self.list_ids = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+        return self
+
+    def add(self, vectors, ids):
+        """Añade vectores (con sus identificadores) a las listas de sus centroides mas cercanos."""
+        if not self.is_trained:
+            raise Exception("El indice debe entrenarse antes de añadir vectores.")
+        vectors = normalize_rows(vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+        assignment = self._nearest_centroid(vectors, self.centroids)
+        codes, scales = self._encode(vectors)
+
+        order = np.argsort(assignment, kind="stable")
+        lists, starts = np.unique(assignment[order], return_index=True)
+        for list_no, chunk in zip(lists, np.split(order, starts[1:])):
+            self.list_vectors[list_no] = np.concatenate([self.list_vectors[list_no], codes[chunk]])
+            if scales is not None:
+                self.list_scales[list_no] = np.concatenate([self.list_scales[list_no], scales[chunk]])
+            self.list_ids[list_no] = np.concatenate([self.list_ids[list_no], ids[chunk]])
+        return self
+
+    def remove(self, ids):
+        """Retira de las listas los vectores con esos identificadores (los centroides no cambian)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        for list_no in range(len(self.list_ids)):
+            keep = ~np.isin(self.list_ids[list_no], ids)
+            if keep.all():
+                continue
+            # Arrays nuevos: una copia del indice que comparta las listas no se ve afectada
+            self.list_ids[list_no] = self.list_ids[list_no][keep]
+            self.list_vectors[list_no] = self.list_vectors[list_no][keep]
+            if self.list_scales:
+                self.list_scales[list_no] = self.list_scales[list_no][keep]
+        return self
+
+    def copy(self):
+        """Copia barata: comparte los arrays de las listas (add y remove nunca los modifican in-place)."""
+        index = IVFIndex(nlist=self.nlist, nprobe=self.nprobe, dtype=self.dtype)
+        index.centroids = self.centroids
+        index.list_vectors = list(self.list_vectors)
+        index.list_scales = list(self.list_scales)
+        index.list_ids = list(self.list_ids)
+        return index
+
+    def astype(self, dtype):
+        """Copia del indice (mismos centroides y listas) con los vectores guardados en 'dtype'."""
+        index = IVFIndex(nlist=self.nlist, nprobe=self.nprobe, dtype=dtype)
+        index.centroids = self.centroids
+        index.list_ids = list(self.list_ids)
+        for list_no in range(self.nlist):
+            codes, scales = index._encode(self._list_rows(list_no))
+            index.list_vectors.append(codes)
+            if scales is not None:
+                index.list_scales.append(scales)
+        return index
+
+    def search(self, query, k=10, nprobe=None, exclude=None):
+        """
+        Devuelve (ids, scores) de los k vectores mas similares a la consulta.
+        'exclude' es un identificador que no debe aparecer en el resultado (la propia consulta).
+        """
+        query = normalize_rows(query)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        candidate_ids = np.concatenate([self.list_ids[p] for p in probes])
+        candidate_scores = np.concatenate([self._list_scores(p, query) for p in probes])
+        if exclude is not None:
+            keep = candidate_ids != exclude
+            candidate_ids, candidate_scores = candidate_ids[keep], candidate_scores[keep]
+
+        k = min(k, len(candidate_ids))
+        if k == 0:
+            return candidate_ids, candidate_scores
+        top = np.argpartition(-candidate_scores, k - 1)[:k]
+        top = top[np.argsort(-candidate_scores[top], kind="stable")]
+        return candidate_ids[top], candidate_scores[top]
+
+    def save(self, file_path):
+        """
+        Guarda el indice en un archivo .npz (listas concatenadas + desplazamientos) de forma
+        atomica, como engine.save_atomic: archivo temporal del mismo directorio, fsync y
+        rename. Un fallo a mitad de escritura nunca deja un indice truncado.
+        """
+        sizes = np.array([len(ids) for ids in self.list_ids], dtype=np.int64)
+        directory = os.path.dirname(os.path.abspath(file_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(file_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                arrays = dict(
+                    centroids=self.centroids,
+                    vectors=np.concatenate(self.list_vectors),
+                    ids=np.concatenate(self.list_ids),
+                    offsets=np.concatenate([[0], np.cumsum(sizes)]),
+                    nprobe=np.array(self.nprobe),
+                    dtype=np.array(self.dtype),
+                )
+                if self.list_scales:
+                    arrays["scales"] = np.concatenate(self.list_scales)
+                np.savez(f, **arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def load(file_path):
+        """Carga un indice guardado con save. Las listas son vistas del array cargado."""
+        data = np.load(file_path)
+        # Los indices guardados antes de admitir listas cuantizadas no llevan 'dtype'
+        dtype = str(data["dtype"]) if "dtype" in data else "float32"
+        index = IVFIndex(nlist=len(data["centroids"]), nprobe=int(data["nprobe"]), dtype=dtype)
+        index.centroids = data["centroids"]
+        vectors, ids, offsets = data["vectors"], data["ids"], data["offsets"]
+        index.list_vectors = [vectors[offsets[i]:offsets[i + 1]] for i in range(index.nlist)]
+        index.list_ids = [ids[offsets[i]:offsets[i + 1]] for i in range(index.nlist)]
+        if "scales" in data:
+            scales = data["scales"]
+            index.list_scales = [scales[offsets[i]:offsets[i + 1]] for i in range(index.nlist)]
+        return index
+
+    def _encode(self, vectors):
+        """Vectores normalizados en el tipo de las listas: (codigos, escalas o None)."""
+        if self.dtype == "int8":
+            return quantize_int8(vectors)
+        return vectors.astype(self.dtype, copy=False), None
+
+    def _list_rows(self, list_no):
+        """Vectores de una lista como float32."""
+        rows = self.list_vectors[list_no].astype(np.float32)
+        if self.list_scales:
+            rows *= self.list_scales[list_no][:, None] / 127
+        return rows
+
+    def _list_scores(self, list_no, query):
+        """Producto punto de la consulta contra los vectores de una lista (convertidos a float32)."""
+        scores = self.list_vectors[list_no].astype(np.float32) @ query
+        if self.list_scales:
+            scores *= self.list_scales[list_no] / 127
+        return scores
+
+    @staticmethod
+    def _nearest_centroid(vectors, centroids, block_size=8192):
+        """Asigna cada vector a su centroide mas cercano, por bloques para acotar la memoria."""
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), block_size):
+            block = vectors[start:start + block_size]
+            assignment[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+
+def recall_at_k(approximate_ids, exact_ids):
+    """Fraccion media de los k vecinos exactos que recupera la busqueda aproximada."""
+    hits = [len(set(approx) & set(exact)) / max(len(exact), 1)
+            for approx, exact in zip(approximate_ids, exact_ids)]
+    return float(np.mean(hits)) if hits else 0.0
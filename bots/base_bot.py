@@ -40,7 +40,7 @@ class BaseBot:
         self.db_session = SessionLocal()
 
         # Instanciación de componentes del núcleo
-        self.memory = MemoryStore()
+        self.memory = MemoryStore.from_settings(self.settings, bind=engine)
         self.knowledge_base = KnowledgeManager()
         self.swarm_controller = SwarmController(node_id=node_id)
         self.ethics = EthicsCore()
@@ -56,6 +56,12 @@ class BaseBot:
         self.context: List[str] = []
         self.is_running: bool = True
 
+    def close(self):
+        """Apaga los componentes del núcleo: hechos pendientes del motor, memoria y sesión de la DB."""
+        self.brain.close()
+        self.memory.close()
+        self.db_session.close()
+
     async def send_message(self, message: str, **kwargs):
         """Método abstracto para enviar un mensaje a la plataforma."""
         raise NotImplementedError("Este método debe ser implementado por la subclase.")
@@ -84,7 +90,7 @@ class BaseBot:
             try:
                 _, *query_parts = command.split()
                 query = " ".join(query_parts)
-                results = self.memory.get_memory(self.db_session, query)
+                results = self.memory.get_memory(self.db_session, query, include_archive=True)
                 response = f"[Memoria] Resultados para '{query}':\n"
                 if not results:
                     response += "- No se encontraron recuerdos relevantes."
@@ -1,4 +1,5 @@
 import asyncio
+import itertools
 import os
 import sys
 
@@ -23,12 +24,13 @@ class CliBot(BaseBot):
         """Inicia el bucle principal de escucha y respuesta del bot de CLI."""
         print(self.responses.get("cli_instructions", "Escribe tu mensaje. Usa '/reset-memory' para borrar la memoria, o 'salir' para terminar."))
         
-        # Cargar y mostrar contexto de conversaciones anteriores
-        last_episodes = self.brain.memory.get_last_episodes(5)
+        # Cargar y mostrar contexto de conversaciones anteriores (las 5 últimas, en orden cronológico)
+        recent = self.memory.iter_episodes(self.db_session, type='conversation', source='user_interaction', batch_size=5)
+        last_episodes = list(itertools.islice(recent, 5))[::-1]
         if last_episodes:
             print("\n--- Historial de conversación reciente ---")
             for episode in last_episodes:
-                if episode.get('type') == 'conversation':
+                if isinstance(episode['data'], dict):
                     user_input = episode['data'].get('user_input', '')
                     bot_output = ' '.join(episode['data'].get('bot_output', []))
                     print(f"Tú > {user_input}")
@@ -50,7 +52,7 @@ class CliBot(BaseBot):
                 elif user_input.lower() == "/reset-memory":
                     confirm = input("¿Estás seguro de que quieres borrar toda la memoria? Esta acción es irreversible. (s/n): ")
                     if confirm.lower() == 's':
-                        self.brain.memory.reset_memory()
+                        self.memory.reset_memory(self.db_session)
                     else:
                         print("Operación cancelada.")
                 else:
@@ -64,4 +66,7 @@ class CliBot(BaseBot):
 
 if __name__ == "__main__":
     bot = CliBot()
-    bot.run()
+    try:
+        bot.run()
+    finally:
+        bot.close()
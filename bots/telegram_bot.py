@@ -75,4 +75,7 @@ class MeaTelegramBot(BaseBot):
 
 if __name__ == '__main__':
     bot = MeaTelegramBot()
-    bot.run()
\ No newline at end of file
+    try:
+        bot.run()
+    finally:
+        bot.close()
\ No newline at end of file
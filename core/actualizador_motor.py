@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from engine import MeaEngine
+
+class EngineUpdater:
+    """
+    Actualiza en segundo plano el motor de embeddings del cerebro con los hechos nuevos.
+
+    Los textos se encolan con submit() y un hilo los agrupa en lotes. Cada lote se aplica
+    sobre una copia del motor (MeaEngine.copy_for_update + update_online) y la copia
+    actualizada sustituye a la del cerebro con una sola asignacion, de modo que las
+    consultas en curso nunca se bloquean ni ven un motor a medio actualizar.
+    """
+    def __init__(self, brain: Any, batch_size: int = 32, interval_seconds: float = 5.0,
+                 save_path: Optional[str] = None, **update_kwargs: Any):
+        """
+        Args:
+            brain: Objeto con un atributo 'engine' (MeaEngine) que se sustituye tras cada lote.
+            batch_size (int): Maximo de textos por actualizacion.
+            interval_seconds (float): Espera maxima para completar un lote antes de aplicarlo.
+            save_path (str, opcional): Si se indica, el motor actualizado se guarda ahi (.pth).
+            **update_kwargs: Parametros para MeaEngine.update_online (epochs, learning_rate, ...).
+        """
+        self.brain = brain
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.save_path = save_path
+        self.update_kwargs = update_kwargs
+        self.pending: "queue.Queue[str]" = queue.Queue()
+        self.lock = threading.Lock()  # Un solo lote a la vez (hilo de fondo o flush)
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.updates = 0
+
+    def submit(self, text: str):
+        """Encola un texto nuevo para la proxima actualizacion. No bloquea."""
+        if text and text.strip():
+            self.pending.put(text)
+
+    def start(self):
+        """Inicia el hilo de actualizacion en segundo plano."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="engine-updater", daemon=True)
+        self.thread.start()
+
+    def stop(self, flush: bool = True):
+        """Detiene el hilo; con flush=True aplica antes los textos pendientes."""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if flush:
+            self.flush()
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Aplica de inmediato (en el hilo actual) todos los textos pendientes."""
+        texts = self._drain(block=False)
+        result = None
+        while texts:
+            result = self._apply(texts)
+            texts = self._drain(block=False)
+        return result
+
+    def _run(self):
+        while self.running:
+            texts = self._drain(block=True)
+            if texts:
+                self._apply(texts)
+
+    def _drain(self, block: bool) -> List[str]:
+        """Toma hasta batch_size textos; en modo bloqueante espera como mucho interval_seconds."""
+        texts: List[str] = []
+        deadline = time.monotonic() + self.interval_seconds
+        while len(texts) < self.batch_size:
+            try:
+                if block:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    texts.append(self.pending.get(timeout=timeout))
+                else:
+                    texts.append(self.pending.get_nowait())
+            except queue.Empty:
+                break
+        return texts
+
+    def _apply(self, texts: List[str]) -> Optional[Dict[str, Any]]:
+        """Actualiza una copia del motor con los textos y la publica en el cerebro."""
+        with self.lock:
+            current: Optional[MeaEngine] = self.brain.engine
+            if current is None:
+                print("[EngineUpdater] No hay motor cargado; se descartan los textos.")
+                return None
+            try:
+                updated = current.copy_for_update()
+                stats = updated.update_online(texts, **self.update_kwargs)
+                if self.save_path:
+                    updated.save_model(self.save_path)
+            except Exception as e:
+                print(f"[ERROR] Fallo en la actualizacion en linea del motor: {e}")
+                return None
+            # Intercambio atomico: las consultas usan el motor anterior o el nuevo, nunca uno a medias
+            self.brain.engine = updated
+            self.updates += 1
+            print(f"[EngineUpdater] Motor actualizado con {len(texts)} textos "
+                  f"({len(stats['new_words'])} palabras nuevas, {stats['pairs']} pares).")
+            return stats
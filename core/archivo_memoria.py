@@ -0,0 +1,152 @@
+import os
+import gzip
+import json
+import time
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from .indice_memoria import contains_phrase
+
+# --- Archivo frio (cold tier) de la memoria episodica ---
+# Los episodios antiguos, de baja prioridad y poco consultados salen de la tabla
+# episodic_memory (hot tier) y se guardan en segmentos: archivos JSON Lines comprimidos
+# con gzip, agrupados por mes del episodio (particion 'AAAA-MM'). Cada pasada del
+# compactor escribe segmentos nuevos; un segmento nunca se modifica (solo se añaden).
+#   archive/2026-01/1767225600.000-000001.jsonl.gz
+# Cada linea conserva el episodio tal cual estaba en la DB (datos cifrados) junto con sus
+# tokens ciegos (ver indice_memoria), de modo que el archivo se busca por frase sin
+# descifrar nada: solo se descifran los episodios que coinciden.
+
+SEGMENT_SUFFIX = ".jsonl.gz"
+
+def partition_key(timestamp: float) -> str:
+    """Particion (mes UTC, 'AAAA-MM') de un episodio."""
+    return time.strftime("%Y-%m", time.gmtime(timestamp))
+
+class SegmentArchive:
+    """Segmentos comprimidos, solo de añadido y particionados por mes, en un directorio."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def append(self, episodes: Sequence[Dict[str, Any]]) -> List[str]:
+        """
+        Escribe los episodios (con su clave 'tokens') en un segmento nuevo por particion.
+        Cada segmento se escribe en un archivo temporal y se renombra: un fallo nunca deja
+        un segmento a medias. Devuelve las rutas de los segmentos escritos.
+        """
+        by_partition: Dict[str, List[Dict[str, Any]]] = {}
+        for episode in episodes:
+            by_partition.setdefault(partition_key(episode['timestamp']), []).append(episode)
+
+        paths = []
+        with self.lock:
+            for key, partition in sorted(by_partition.items()):
+                directory = os.path.join(self.directory, key)
+                os.makedirs(directory, exist_ok=True)
+                first = min(episode['timestamp'] for episode in partition)
+                sequence = len(self._segments(key)) + 1
+                path = os.path.join(directory, f"{first:.3f}-{sequence:06d}{SEGMENT_SUFFIX}")
+                tmp_path = f"{path}.tmp"
+                with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                    for episode in partition:
+                        f.write(json.dumps(episode, ensure_ascii=False) + "\n")
+                os.replace(tmp_path, path)
+                paths.append(path)
+        return paths
+
+    def partitions(self) -> List[str]:
+        """Particiones del archivo, de la mas reciente a la mas antigua."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted((name for name in os.listdir(self.directory)
+                       if os.path.isdir(os.path.join(self.directory, name))), reverse=True)
+
+    def iter_partition(self, key: str) -> Iterator[Dict[str, Any]]:
+        """Episodios de una particion, leidos segmento a segmento (del mas reciente al mas antiguo)."""
+        for path in self._segments(key)[::-1]:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+    def search(self, tokens: Sequence[str], limit: int, exclude: Optional[set] = None) -> List[Dict[str, Any]]:
+        """
+        Episodios archivados que contienen la frase (como tokens ciegos). Las particiones se
+        descomprimen bajo demanda, de la mas reciente a la mas antigua, y la busqueda se
+        detiene en cuanto una particion completa 'limit' resultados. Ordena por prioridad y recencia.
+        """
+        exclude = exclude or set()
+        found: Dict[str, Dict[str, Any]] = {}
+        for key in self.partitions():
+            for episode in self.iter_partition(key):
+                if episode['id'] in exclude or episode['id'] in found:
+                    continue
+                if contains_phrase(episode.get('tokens', "").split(), tokens):
+                    found[episode['id']] = episode
+            if len(found) >= limit:
+                break
+        ranked = sorted(found.values(), key=lambda e: (e.get('priority') or 0, e['timestamp']), reverse=True)
+        return ranked[:limit]
+
+    def count(self) -> int:
+        """Numero de episodios archivados (lee todos los segmentos)."""
+        return sum(1 for key in self.partitions() for _ in self.iter_partition(key))
+
+    def _segments(self, key: str) -> List[str]:
+        directory = os.path.join(self.directory, key)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+class ArchiveCompactor:
+    """
+    Hilo que cada interval_seconds mueve al archivo los episodios frios de una base de
+    datos (MemoryStore.archive_cold_episodes), en lotes, con su propia sesion.
+    """
+    def __init__(self, store: Any, bind: Any, interval_seconds: float = 3600.0):
+        self.store = store
+        self.bind = bind
+        self.interval_seconds = interval_seconds
+        self.wake = threading.Event()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.archived = 0
+
+    def start(self):
+        """Inicia el hilo del compactor."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="memory-archiver", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Detiene el hilo (termina antes el lote en curso)."""
+        self.running = False
+        if self.thread is not None:
+            self.wake.set()
+            self.thread.join()
+            self.thread = None
+
+    def run_once(self) -> int:
+        """Una pasada completa del compactor. Devuelve los episodios archivados."""
+        db = Session(bind=self.bind)
+        try:
+            archived = self.store.archive_cold_episodes(db)
+        except Exception as e:
+            db.rollback()
+            print(f"[ERROR] Fallo al archivar episodios de la memoria: {e}")
+            archived = 0
+        finally:
+            db.close()
+        self.archived += archived
+        return archived
+
+    def _run(self):
+        while self.running:
+            self.run_once()
+            self.wake.wait(self.interval_seconds)
+            self.wake.clear()
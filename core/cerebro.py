@@ -1,3 +1,4 @@
+import os
 import random
 from typing import Any, Dict, List, Optional
 
@@ -7,7 +8,8 @@ from sqlalchemy.orm import Session
 from .memoria import MemoryStore
 from .conocimiento import KnowledgeManager
 from .etica import EthicsCore
-from engine import MeaEngine
+from .actualizador_motor import EngineUpdater
+from engine import MeaEngine, SkipGramModel
 
 # --- Dependencias Opcionales ---
 try:
@@ -44,15 +46,47 @@ class Brain:
         self.ethics = ethics
         self.model = None
         self.engine = None
+        self.engine_updater: Optional[EngineUpdater] = None
 
         # Cargar motor de embeddings si existe
+        # (se prefiere el formato mapeado en memoria: todos los procesos comparten los embeddings)
+        engine_path = "mea_engine.mmap" if os.path.isdir("mea_engine.mmap") else "mea_engine.pth"
         try:
-            self.engine = MeaEngine.load_model("mea_engine.pth")
+            self.engine = MeaEngine.load_model(engine_path)
         except FileNotFoundError:
-            print("[Cerebro] Modelo de motor de embeddings (mea_engine.pth) no encontrado.")
+            print(f"[Cerebro] Modelo de motor de embeddings ({engine_path}) no encontrado.")
         except Exception as e:
             print(f"[ERROR] No se pudo cargar MeaEngine: {e}")
 
+        # Recuperacion de recuerdos por similitud de embeddings (opcional)
+        vector_recall = self.settings.get("memory", {}).get("vector_recall", {})
+        if vector_recall.get("enabled") and self.engine is not None:
+            # Se resuelve self.engine en cada llamada: tras un cambio de motor (EngineUpdater)
+            # se codifica con el nuevo y el anterior puede liberarse
+            self.memory.enable_vector_recall(
+                lambda texts: self.engine.encode(texts),
+                index_path=vector_recall.get("index_path"),
+                weight=vector_recall.get("weight", 2.0),
+                min_similarity=vector_recall.get("min_similarity", 0.5),
+                ivf_threshold=vector_recall.get("ivf_threshold", 50_000),
+            )
+
+        # Actualizaciones en linea del motor con los hechos aprendidos (opcional)
+        online = self.settings.get("engine", {}).get("online_updates", {})
+        if online.get("enabled") and self.engine is not None:
+            if isinstance(self.engine.model, SkipGramModel):
+                self.engine_updater = EngineUpdater(
+                    self,
+                    batch_size=online.get("batch_size", 32),
+                    interval_seconds=online.get("interval_seconds", 5.0),
+                    save_path=online.get("save_path"),
+                    epochs=online.get("epochs", 2),
+                    learning_rate=online.get("learning_rate", 0.025),
+                )
+                self.engine_updater.start()
+            else:
+                print("[Advertencia] El motor cargado es de solo inferencia; actualizaciones en linea desactivadas.")
+
         # Inicializar modos de operación
         if self.mode == "ml" and SKLEARN_AVAILABLE:
             self._train_model()
@@ -60,6 +94,15 @@ class Brain:
             print("[Advertencia] scikit-learn no disponible. Cambiando a modo 'rule'.")
             self.mode = "rule"
 
+    def close(self):
+        """
+        Detiene el actualizador del motor aplicando antes los hechos pendientes (y guardando
+        el motor en su save_path, si lo tiene). Llamar al apagar, antes de cerrar la memoria.
+        """
+        if self.engine_updater is not None:
+            self.engine_updater.stop(flush=True)
+            self.engine_updater = None
+
     def _train_model(self):
         """Entrena un modelo de clasificación simple."""
         intents = list(self.responses.get("respuestas_especificas", {}).keys())
@@ -73,6 +116,9 @@ class Brain:
     def learn_fact(self, db: Session, fact_text: str):
         """Aprende un nuevo hecho y lo añade a la base de conocimiento."""
         self.knowledge.add_fact(db, fact_text)
+        if self.engine_updater is not None:
+            # El motor de embeddings se actualiza en segundo plano, sin bloquear la respuesta
+            self.engine_updater.submit(fact_text)
         print(f"[Cerebro] Hecho aprendido: {fact_text}")
 
     def get_response(self, db: Session, user_input: str, context: Optional[List[str]] = None) -> List[str]:
@@ -0,0 +1,301 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .vectores_memoria import vector_to_blob
+
+WAKE_UP = object()  # Marca en la cola: el hilo de fondo escribe ya su lote sin esperar mas
+
+class EpisodeWriter:
+    """
+    Escritura diferida (write-behind) de episodios de la memoria a largo plazo.
+
+    log_episode encola el episodio ya cifrado junto con sus terminos de busqueda (y su
+    embedding, si la recuperacion por vectores esta activa) y vuelve
+    sin tocar la base de datos. Un hilo agrupa los episodios pendientes y los escribe en
+    una sola transaccion por lote (por tamaño o por tiempo), de modo que N episodios
+    cuestan un commit en lugar de N. La cola esta acotada: si se llena, log_episode espera
+    (contrapresion) en lugar de acumular memoria sin limite.
+    Si un lote falla, sus episodios siguen pendientes (visibles en get_memory) y se
+    reintentan con espera exponencial; solo se olvidan cuando su commit tiene exito.
+    """
+    def __init__(self, store: Any, queue_size: int = 1000, batch_size: int = 64, interval_seconds: float = 0.5,
+                 retry_base_seconds: float = 0.5, retry_max_seconds: float = 30.0):
+        """
+        Args:
+            store: MemoryStore propietario (indice de busqueda y episodios pendientes).
+            queue_size (int): Maximo de episodios en cola.
+            batch_size (int): Maximo de episodios por transaccion.
+            interval_seconds (float): Espera maxima para completar un lote antes de escribirlo.
+            retry_base_seconds (float): Espera antes del primer reintento de un lote fallido (se duplica en cada fallo).
+            retry_max_seconds (float): Espera maxima entre reintentos.
+        """
+        self.store = store
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.pending: "queue.Queue[Tuple[Any, Dict[str, Any], List[str], Optional[np.ndarray]]]" = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()  # Un solo lote a la vez (hilo de fondo o flush)
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.retry: List[Tuple[Any, Dict[str, Any], List[str], Optional[np.ndarray]]] = []  # Episodios de lotes fallidos
+        self.retry_at = 0.0
+        self.failures = 0  # Fallos seguidos (para la espera exponencial)
+        self.batches = 0
+        self.written = 0
+
+    def submit(self, bind: Any, episode: Dict[str, Any], terms: List[str], vector: Optional[np.ndarray] = None):
+        """Encola un episodio (datos ya cifrados) para escribirlo en la base de datos 'bind'."""
+        self.pending.put((bind, episode, terms, vector))
+
+    def start(self):
+        """Inicia el hilo de escritura en segundo plano."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="episode-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self, flush: bool = True):
+        """Detiene el hilo; con flush=True escribe antes los episodios pendientes."""
+        self.running = False
+        if self.thread is not None:
+            self.pending.put(WAKE_UP)
+            self.thread.join()
+            self.thread = None
+        if flush:
+            self.flush()
+            if self.retry:
+                print(f"[ERROR] {len(self.retry)} episodios de la memoria no se han podido escribir antes de detener el escritor.")
+
+    def flush(self) -> int:
+        """
+        Escribe de inmediato (en el hilo actual) todos los episodios pendientes, incluidos
+        los de lotes fallidos (sin esperar a su reintento), y espera a que termine el lote
+        que este escribiendo el hilo de fondo. Devuelve los escritos aqui.
+        """
+        written = 0
+        items = self._drain(block=False)
+        while items:
+            written += self._write(items)
+            items = self._drain(block=False)
+        if self.thread is not None:
+            self.pending.put(WAKE_UP)
+        self.pending.join()
+        if self.retry:
+            written += self._write([], retry_now=True)
+        return written
+
+    def _run(self):
+        while self.running:
+            items = self._drain(block=True)
+            if items or (self.retry and time.monotonic() >= self.retry_at):
+                self._write(items)
+
+    def _drain(self, block: bool) -> List[Tuple[Any, Dict[str, Any], List[str], Optional[np.ndarray]]]:
+        """Toma hasta batch_size episodios; en modo bloqueante espera como mucho interval_seconds."""
+        items = []
+        deadline = time.monotonic() + self.interval_seconds
+        while len(items) < self.batch_size:
+            try:
+                if block:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    item = self.pending.get(timeout=timeout)
+                else:
+                    item = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is WAKE_UP:
+                self.pending.task_done()
+                if block:
+                    break
+                continue
+            items.append(item)
+        return items
+
+    def _write(self, items: List[Tuple[Any, Dict[str, Any], List[str], Optional[np.ndarray]]], retry_now: bool = False) -> int:
+        """
+        Escribe un lote (y los episodios de lotes fallidos cuyo reintento ya toca): una
+        transaccion (y un commit) por base de datos. Los episodios de una transaccion que
+        falla vuelven a la lista de reintentos.
+        """
+        written = 0
+        with self.lock:
+            batch = list(items)
+            if self.retry and (retry_now or time.monotonic() >= self.retry_at):
+                batch, self.retry = self.retry + batch, []
+            by_bind: Dict[Any, List[Tuple[Any, Dict[str, Any], List[str], Optional[np.ndarray]]]] = {}
+            for item in batch:
+                by_bind.setdefault(item[0], []).append(item)
+            failed = []
+            for bind, bind_items in by_bind.items():
+                db = Session(bind=bind)
+                try:
+                    index = self.store._search_index(db)
+                    db.add_all(models.EpisodicMemory(**episode) for _, episode, _, _ in bind_items)
+                    db.flush()
+                    if index is not None:
+                        for _, episode, terms, _ in bind_items:
+                            index.add(db, episode['id'], terms)
+                    db.add_all(models.EpisodeEmbedding(episode_id=episode['id'], vector=vector_to_blob(vector))
+                               for _, episode, _, vector in bind_items if vector is not None)
+                    db.commit()
+                    written += len(bind_items)
+                    self.store._forget_pending([episode['id'] for _, episode, _, _ in bind_items])
+                except Exception as e:
+                    db.rollback()
+                    failed.extend(bind_items)
+                    print(f"[ERROR] Fallo al escribir {len(bind_items)} episodios en la memoria (se reintentara): {e}")
+                finally:
+                    db.close()
+            if failed:
+                # Los episodios siguen pendientes: se reintentan con espera exponencial
+                self.failures += 1
+                self.retry = failed + self.retry
+                self.retry_at = time.monotonic() + min(self.retry_max_seconds,
+                                                       self.retry_base_seconds * 2 ** (self.failures - 1))
+            elif batch:
+                self.failures = 0
+            self.batches += 1
+            self.written += written
+        for _ in items:
+            self.pending.task_done()
+        return written
+
+class AccessCountTracker:
+    """
+    Acumula en memoria los accesos a episodios (resultados de get_memory) y los escribe
+    periodicamente con un solo UPDATE ... CASE por bloque de episodios, en su propia sesion.
+    Las lecturas solo suman en un diccionario: nunca escriben ni hacen commit.
+    """
+    def __init__(self, interval_seconds: float = 5.0, max_pending: int = 10_000, chunk_size: int = 500,
+                 on_flush: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            interval_seconds (float): Cada cuanto escribe el hilo de fondo los accesos acumulados.
+            max_pending (int): Episodios distintos acumulados a partir de los cuales se adelanta la escritura.
+            chunk_size (int): Episodios por sentencia UPDATE.
+            on_flush (Callable): Se llama tras confirmar cada bloque (p. ej. para invalidar cachés
+                que guardan el access_count de la DB).
+        """
+        self.interval_seconds = interval_seconds
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self.on_flush = on_flush
+        self.counts: Dict[Any, Dict[str, int]] = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.flushes = 0
+
+    def record(self, bind: Any, episode_ids: List[str]):
+        """Suma un acceso a cada episodio (de la base de datos 'bind'). No toca la base de datos."""
+        if not episode_ids:
+            return
+        with self.lock:
+            counts = self.counts.setdefault(bind, {})
+            for episode_id in episode_ids:
+                counts[episode_id] = counts.get(episode_id, 0) + 1
+            pending = sum(len(c) for c in self.counts.values())
+        if not self.running:
+            self.start()
+        if pending >= self.max_pending:
+            self.wake.set()
+
+    def pending(self, bind: Any, episode_id: str) -> int:
+        """Accesos de un episodio acumulados y aun no escritos."""
+        with self.lock:
+            return self.counts.get(bind, {}).get(episode_id, 0)
+
+    def clear(self):
+        """Descarta los accesos acumulados (por ejemplo, al borrar toda la memoria)."""
+        with self.lock:
+            self.counts = {}
+
+    def start(self):
+        """Inicia el hilo que escribe los accesos cada interval_seconds."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="access-counter", daemon=True)
+        self.thread.start()
+
+    def stop(self, flush: bool = True):
+        """Detiene el hilo; con flush=True escribe antes los accesos acumulados."""
+        self.running = False
+        if self.thread is not None:
+            self.wake.set()
+            self.thread.join()
+            self.thread = None
+        if flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Escribe todos los accesos acumulados. Devuelve el numero de episodios actualizados.
+        Cada bloque se confirma por separado y sus accesos solo se descuentan de 'counts'
+        tras su commit: si falla, se reintentan en la siguiente escritura, y mientras tanto
+        pending() sigue incluyendolos.
+        """
+        with self.lock:
+            snapshot = {bind: dict(counts) for bind, counts in self.counts.items() if counts}
+        updated = 0
+        for bind, counts in snapshot.items():
+            db = Session(bind=bind)
+            try:
+                Episode = models.EpisodicMemory
+                ids = list(counts)
+                for start in range(0, len(ids), self.chunk_size):
+                    chunk = {episode_id: counts[episode_id] for episode_id in ids[start:start + self.chunk_size]}
+                    db.execute(
+                        update(Episode)
+                        .where(Episode.id.in_(list(chunk)))
+                        .values(access_count=func.coalesce(Episode.access_count, 0) + case(chunk, value=Episode.id, else_=0))
+                        .execution_options(synchronize_session=False)
+                    )
+                    db.commit()
+                    # Primero se invalida y luego se descuenta: quien lea entre medias suma de
+                    # mas un momento, pero nunca ve un access_count que retrocede
+                    if self.on_flush is not None:
+                        self.on_flush()
+                    self._discount(bind, chunk)
+                    updated += len(chunk)
+            except Exception as e:
+                db.rollback()
+                print(f"[ERROR] Fallo al guardar los contadores de acceso de la memoria: {e}")
+            finally:
+                db.close()
+        if updated:
+            self.flushes += 1
+        return updated
+
+    def _discount(self, bind: Any, written: Dict[str, int]):
+        """Descuenta los accesos ya escritos (los sumados durante la escritura se conservan)."""
+        with self.lock:
+            counts = self.counts.get(bind)
+            if counts is None:
+                return
+            for episode_id, count in written.items():
+                remaining = counts.get(episode_id, 0) - count
+                if remaining > 0:
+                    counts[episode_id] = remaining
+                else:
+                    counts.pop(episode_id, None)
+            if not counts:
+                del self.counts[bind]
+
+    def _run(self):
+        while self.running:
+            self.wake.wait(self.interval_seconds)
+            self.wake.clear()
+            self.flush()
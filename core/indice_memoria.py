@@ -0,0 +1,154 @@
+import json
+import re
+import unicodedata
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .security import blind_token
+
+# --- Indice de texto completo (ciego) de la memoria episodica ---
+# Los datos de los episodios a largo plazo se guardan cifrados, asi que la base de datos
+# no puede buscar en ellos. Al registrar un episodio se extraen sus terminos (en Python,
+# igual para todos los motores) y cada termino se sustituye por su token ciego
+# (HMAC con clave, ver security.blind_token). El indice solo contiene tokens, en el orden
+# del texto: ni los datos ni las palabras quedan en claro en la base de datos.
+#   - SQLite: tabla virtual FTS5 'episode_tokens' y tabla 'episode_tokens_ids' que asocia
+#     cada documento (clave entera estable, incluso tras VACUUM) con su episodio; un trigger
+#     borra ambas entradas cuando se borra el episodio.
+#   - PostgreSQL: tabla 'episode_blind_index' con una columna tsvector de tokens e indice GIN
+#     (borrado en cascada con el episodio).
+# Una consulta convierte sus terminos en tokens y hace una busqueda de frase sobre el indice,
+# ordenada en la propia base de datos (prioridad y relevancia bm25 / ts_rank_cd), que
+# devuelve solo los ids de los top-k episodios; solo esos se descifran.
+
+# Tablas de la primera version del indice, que guardaban los terminos en claro
+LEGACY_SQLITE_DDL = (
+    "DROP TRIGGER IF EXISTS episode_fts_delete",
+    "DROP TABLE IF EXISTS episode_fts",
+    "DROP TABLE IF EXISTS episode_fts_ids",
+)
+LEGACY_POSTGRESQL_DDL = ("DROP TABLE IF EXISTS episode_search",)
+
+TERM_PATTERN = re.compile(r"[^\W_]+")
+
+def search_terms(value: str) -> List[str]:
+    """Terminos de busqueda de un texto: en minusculas, sin acentos y solo alfanumericos."""
+    normalized = unicodedata.normalize("NFKD", value.lower())
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    return TERM_PATTERN.findall(normalized)
+
+def episode_terms(data: Any) -> List[str]:
+    """Terminos de busqueda del contenido de un episodio (su JSON, claves incluidas)."""
+    return search_terms(json.dumps(data, ensure_ascii=False))
+
+def blind_tokens(terms: Sequence[str]) -> List[str]:
+    """Tokens ciegos de una secuencia de terminos (mismo orden, para las busquedas de frase)."""
+    return [blind_token(term) for term in terms]
+
+def contains_phrase(terms: Sequence[str], phrase: Sequence[str]) -> bool:
+    """Indica si los terminos de la frase aparecen seguidos en 'terms' (una frase vacia siempre esta)."""
+    n = len(phrase)
+    if n == 0:
+        return True
+    phrase = list(phrase)
+    return any(list(terms[i:i + n]) == phrase for i in range(len(terms) - n + 1))
+
+class EpisodeSearchIndex:
+    """Indice ciego de texto completo de episodic_memory para un dialecto de base de datos."""
+
+    SUPPORTED_DIALECTS = ("sqlite", "postgresql")
+
+    def __init__(self, dialect: str):
+        self.dialect = dialect
+
+    @property
+    def supported(self) -> bool:
+        return self.dialect in self.SUPPORTED_DIALECTS
+
+    def ensure_schema(self, db: Session) -> bool:
+        """
+        Crea las tablas del indice si no existen. Devuelve True si se acaban de crear
+        (los episodios que ya hubiera en la base de datos aun no estan indexados).
+        """
+        if self.dialect == "sqlite":
+            exists = db.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'episode_tokens'")).first()
+            if exists:
+                return False
+            for statement in LEGACY_SQLITE_DDL:
+                db.execute(text(statement))
+            db.execute(text(
+                "CREATE TABLE IF NOT EXISTS episode_tokens_ids ("
+                "doc_id INTEGER PRIMARY KEY, episode_id VARCHAR NOT NULL UNIQUE)"))
+            db.execute(text("CREATE VIRTUAL TABLE episode_tokens USING fts5(tokens)"))
+            db.execute(text(
+                "CREATE TRIGGER IF NOT EXISTS episode_tokens_delete AFTER DELETE ON episodic_memory BEGIN "
+                "DELETE FROM episode_tokens WHERE rowid = (SELECT doc_id FROM episode_tokens_ids WHERE episode_id = old.id); "
+                "DELETE FROM episode_tokens_ids WHERE episode_id = old.id; END"))
+        elif self.dialect == "postgresql":
+            exists = db.execute(text("SELECT to_regclass('episode_blind_index')")).scalar()
+            if exists:
+                return False
+            for statement in LEGACY_POSTGRESQL_DDL:
+                db.execute(text(statement))
+            db.execute(text(
+                "CREATE TABLE episode_blind_index ("
+                "episode_id VARCHAR PRIMARY KEY REFERENCES episodic_memory(id) ON DELETE CASCADE, "
+                "document TSVECTOR NOT NULL)"))
+            db.execute(text("CREATE INDEX ix_episode_blind_index_document ON episode_blind_index USING GIN (document)"))
+        else:
+            return False
+        db.commit()
+        return True
+
+    def add(self, db: Session, episode_id: str, terms: Sequence[str]):
+        """
+        Indexa (o reindexa) los terminos de un episodio como tokens ciegos. La fila del
+        episodio ya debe estar escrita en la sesion (flush); el commit lo hace quien llama.
+        """
+        document = " ".join(blind_tokens(terms))
+        if self.dialect == "sqlite":
+            db.execute(text(
+                "DELETE FROM episode_tokens WHERE rowid = (SELECT doc_id FROM episode_tokens_ids WHERE episode_id = :id)"),
+                {"id": episode_id})
+            db.execute(text("INSERT OR IGNORE INTO episode_tokens_ids (episode_id) VALUES (:id)"), {"id": episode_id})
+            db.execute(text(
+                "INSERT INTO episode_tokens (rowid, tokens) SELECT doc_id, :tokens FROM episode_tokens_ids WHERE episode_id = :id"),
+                {"id": episode_id, "tokens": document})
+        elif self.dialect == "postgresql":
+            db.execute(text(
+                "INSERT INTO episode_blind_index (episode_id, document) VALUES (:id, to_tsvector('simple', :tokens)) "
+                "ON CONFLICT (episode_id) DO UPDATE SET document = EXCLUDED.document"),
+                {"id": episode_id, "tokens": document})
+
+    def search(self, db: Session, phrase: Sequence[str], limit: int) -> List[str]:
+        """
+        Ids de los episodios que contienen la frase (comparando tokens ciegos), ordenados por
+        prioridad, relevancia y recencia, calculados en la base de datos (como mucho 'limit').
+        """
+        if not phrase:
+            return []
+        query = " ".join(blind_tokens(phrase))
+        if self.dialect == "sqlite":
+            rows = db.execute(text(
+                "SELECT e.id FROM episode_tokens JOIN episode_tokens_ids m ON m.doc_id = episode_tokens.rowid "
+                "JOIN episodic_memory e ON e.id = m.episode_id "
+                "WHERE episode_tokens MATCH :query "
+                "ORDER BY e.priority DESC, bm25(episode_tokens), e.timestamp DESC LIMIT :limit"),
+                {"query": f'"{query}"', "limit": limit})
+        elif self.dialect == "postgresql":
+            rows = db.execute(text(
+                "SELECT e.id FROM episode_blind_index s JOIN episodic_memory e ON e.id = s.episode_id, "
+                "phraseto_tsquery('simple', :query) q WHERE s.document @@ q "
+                "ORDER BY e.priority DESC, ts_rank_cd(s.document, q) DESC, e.timestamp DESC LIMIT :limit"),
+                {"query": query, "limit": limit})
+        else:
+            return []
+        return [row[0] for row in rows]
+
+def index_for(db: Session) -> Optional[EpisodeSearchIndex]:
+    """Indice de la base de datos de la sesion, o None si su motor no lo admite."""
+    index = EpisodeSearchIndex(db.get_bind().dialect.name)
+    return index if index.supported else None
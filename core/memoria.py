@@ -1,15 +1,60 @@
 import time
 import uuid
 import json
+import atexit
+import weakref
+import threading
 import collections
-from typing import Optional, Dict, List, Any, Callable
+from typing import Optional, Dict, List, Any, Callable, Iterator, Tuple
 
+import numpy as np
 from sqlalchemy.orm import Session
-from sqlalchemy import delete, desc
+from sqlalchemy import and_, delete, desc, func, or_
 
 # Importar los modelos y las funciones de cifrado
 from . import models
 from .security import encrypt_data, decrypt_data
+from .indice_memoria import EpisodeSearchIndex, index_for, search_terms, episode_terms, contains_phrase, blind_tokens
+from .escritor_memoria import EpisodeWriter, AccessCountTracker
+from .vectores_memoria import EpisodeVectorIndex, episode_text, vector_to_blob, blob_to_vector
+from .archivo_memoria import SegmentArchive, ArchiveCompactor
+from .retencion_memoria import RetentionPolicy, RetentionCompactor, database_size, compact_database
+
+UNDECRYPTABLE = "[datos indescifrables]"
+
+def encode_episode_data(data: Any) -> str:
+    """Cifra los datos de un episodio. El token Fernet se guarda como texto (cabe en la columna JSON)."""
+    return encrypt_data(json.dumps(data)).decode("ascii")
+
+def decode_episode_data(value: Any) -> Any:
+    """Descifra los datos de un episodio a largo plazo; los datos no cifrados se devuelven tal cual."""
+    if isinstance(value, bytes):
+        value = value.decode("ascii")
+    if not isinstance(value, str):
+        return value
+    decrypted = decrypt_data(value.encode("ascii"))
+    if decrypted == UNDECRYPTABLE:
+        return value
+    try:
+        return json.loads(decrypted)
+    except ValueError:
+        return decrypted
+
+def episode_to_dict(row: "models.EpisodicMemory") -> Dict[str, Any]:
+    """Convierte una fila de episodic_memory en un diccionario con los datos descifrados."""
+    return {
+        'id': row.id,
+        'timestamp': row.timestamp,
+        'type': row.type,
+        'source': row.source,
+        'data': decode_episode_data(row.data),
+        'priority': row.priority or 0,
+        'access_count': row.access_count or 0
+    }
+
+def _episode_id(mem: Any) -> str:
+    """Id de un recuerdo a corto plazo / pendiente (dict) o de una fila de la DB."""
+    return mem['id'] if isinstance(mem, dict) else mem.id
 
 # --- Clase MemoryStore Refactorizada ---
 
@@ -18,20 +63,165 @@ class MemoryStore:
     Gestiona la memoria de la IA usando SQLAlchemy para la persistencia.
     Incluye lógica para la sincronización de memoria en un enjambre.
     """
-    def __init__(self, short_term_limit=100, lru_cache_size=50):
+    def __init__(self, short_term_limit=100, lru_cache_size=50, write_behind=False,
+                 write_queue_size=1000, write_batch_size=64, write_interval_seconds=0.5,
+                 access_flush_interval_seconds=5.0, cache_ttl_seconds=30.0):
         """
         Inicializa las cachés en memoria.
+        lru_cache guarda los resultados de get_memory (como mucho lru_cache_size consultas,
+        durante cache_ttl_seconds); cualquier escritura en la memoria la invalida.
         El callback de broadcast se usará para enviar memorias al enjambre.
+        Con write_behind=True los episodios a largo plazo se escriben en segundo plano,
+        en lotes de hasta write_batch_size por transacción (ver EpisodeWriter).
+        Los accesos a episodios se acumulan y se escriben cada access_flush_interval_seconds.
         """
         self.short_term = collections.deque(maxlen=short_term_limit)
-        self.lru_cache = collections.OrderedDict()
+        # Caché de resultados de get_memory: clave -> (generación, caducidad, resultados)
+        self.lru_cache: "collections.OrderedDict[Any, Any]" = collections.OrderedDict()
         self.lru_cache_size = lru_cache_size
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_generation = 0  # Se incrementa con cada escritura; invalida las entradas anteriores
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_lock = threading.Lock()
         self.broadcast_callback: Optional[Callable[[Dict], None]] = None
+        # Indice de texto completo por motor de base de datos (None si el motor no lo admite)
+        self._search_indexes: "weakref.WeakKeyDictionary[Any, Optional[EpisodeSearchIndex]]" = weakref.WeakKeyDictionary()
+        self._search_index_lock = threading.RLock()  # rebuild_search_index vuelve a entrar
+        # Episodios encolados y aún no escritos (descifrados), visibles para get_memory
+        self._pending_episodes: "collections.OrderedDict[str, Dict]" = collections.OrderedDict()
+        self._pending_lock = threading.Lock()
+        self.writer: Optional[EpisodeWriter] = None
+        if write_behind:
+            self.writer = EpisodeWriter(self, write_queue_size, write_batch_size, write_interval_seconds)
+            self.writer.start()
+        # La caché de get_memory guarda el access_count de la DB: cada escritura de accesos la invalida
+        self.access_counts = AccessCountTracker(access_flush_interval_seconds, on_flush=self._invalidate_cache)
+        # Recuperación por vectores (desactivada hasta enable_vector_recall)
+        self._vector_encoder: Optional[Callable[[List[str]], np.ndarray]] = None
+        self._vector_indexes: "weakref.WeakKeyDictionary[Any, EpisodeVectorIndex]" = weakref.WeakKeyDictionary()
+        self.vector_index_path: Optional[str] = None
+        self.vector_weight = 2.0
+        self.vector_min_similarity = 0.5
+        self.vector_ivf_threshold = 50_000
+        # Archivo frío de episodios (desactivado hasta enable_archive)
+        self.archive: Optional[SegmentArchive] = None
+        self.archive_min_age_seconds = 30 * 86400
+        self.archive_max_priority = 0
+        self.archive_max_access_count = 2
+        self.archive_exclude_types: List[str] = ["goal"]
+        self.archive_batch_size = 500
+        # Políticas de retención por tipo de episodio (ver enable_retention)
+        self.retention_policies: Dict[str, RetentionPolicy] = {}
+        self.retention_batch_size = 500
+        self.retention_vacuum = True
+        self.compactors: List[Any] = []  # Hilos de mantenimiento (archivo y retención)
+        self.bind: Any = None  # Motor de la DB de from_settings: el índice de vectores se sincroniza al activarse
+        self.vector_syncs: List[threading.Thread] = []  # Hilos de sincronización del índice de vectores
+        atexit.register(self.close)
+
+    @staticmethod
+    def from_settings(settings: Dict[str, Any], bind: Any = None) -> "MemoryStore":
+        """
+        Crea el almacén con la sección "memory" de settings.json. Si se indica el motor de
+        la base de datos ('bind') y el archivo está activo, inicia también su compactor.
+        """
+        memory_settings = settings.get("memory", {})
+        write_behind = memory_settings.get("write_behind", {})
+        store = MemoryStore(
+            write_behind=write_behind.get("enabled", False),
+            write_queue_size=write_behind.get("queue_size", 1000),
+            write_batch_size=write_behind.get("batch_size", 64),
+            write_interval_seconds=write_behind.get("interval_seconds", 0.5),
+            access_flush_interval_seconds=memory_settings.get("access_counts", {}).get("interval_seconds", 5.0),
+            lru_cache_size=memory_settings.get("query_cache", {}).get("size", 50),
+            cache_ttl_seconds=memory_settings.get("query_cache", {}).get("ttl_seconds", 30.0)
+        )
+        store.bind = bind
+        tiering = memory_settings.get("tiering", {})
+        if tiering.get("enabled"):
+            store.enable_archive(
+                tiering.get("directory", "data/memory_archive"),
+                min_age_days=tiering.get("min_age_days", 30),
+                max_priority=tiering.get("max_priority", 0),
+                max_access_count=tiering.get("max_access_count", 2),
+                exclude_types=tiering.get("exclude_types", ["goal"]),
+                batch_size=tiering.get("batch_size", 500)
+            )
+            if bind is not None:
+                store.start_compactor(bind, tiering.get("interval_seconds", 3600))
+        retention = memory_settings.get("retention", {})
+        if retention.get("enabled"):
+            store.enable_retention(
+                {type: RetentionPolicy.from_dict(policy) for type, policy in retention.get("policies", {}).items()},
+                batch_size=retention.get("batch_size", 500),
+                vacuum=retention.get("vacuum", True)
+            )
+            if bind is not None:
+                store.start_retention(bind, retention.get("interval_seconds", 86400))
+        return store
 
     def set_broadcast_callback(self, callback: Callable[[Dict], None]):
         """Establece la función a llamar para transmitir una memoria al enjambre."""
         self.broadcast_callback = callback
 
+    def enable_vector_recall(self, encoder: Callable[[List[str]], np.ndarray], index_path: Optional[str] = None,
+                             weight: float = 2.0, min_similarity: float = 0.5, ivf_threshold: int = 50_000):
+        """
+        Activa la recuperación por vectores: cada episodio a largo plazo se codifica al
+        escribirse (encoder, p. ej. MeaEngine.encode) y get_memory suma a la puntuación de
+        palabras clave weight * similitud de coseno de los episodios más parecidos a la
+        consulta (con similitud >= min_similarity). El índice se guarda en index_path al cerrar.
+        Si el almacén conoce su base de datos (from_settings con 'bind'), el índice se
+        sincroniza con ella ya en segundo plano (start_vector_sync), antes de la primera petición.
+        """
+        self._vector_encoder = encoder
+        self.vector_index_path = index_path
+        self.vector_weight = weight
+        self.vector_min_similarity = min_similarity
+        self.vector_ivf_threshold = ivf_threshold
+        self._vector_indexes = weakref.WeakKeyDictionary()
+        self._invalidate_cache()
+        if self.bind is not None:
+            self.start_vector_sync(self.bind)
+
+    def enable_archive(self, directory: str, min_age_days: float = 30, max_priority: int = 0,
+                       max_access_count: int = 2, exclude_types: Optional[List[str]] = None, batch_size: int = 500):
+        """
+        Activa el archivo frío en 'directory': archive_cold_episodes mueve a segmentos
+        comprimidos los episodios con más de min_age_days días, prioridad <= max_priority
+        y como mucho max_access_count accesos (salvo los de exclude_types, por defecto 'goal').
+        """
+        self.archive = SegmentArchive(directory)
+        self.archive_min_age_seconds = min_age_days * 86400
+        self.archive_max_priority = max_priority
+        self.archive_max_access_count = max_access_count
+        self.archive_exclude_types = ["goal"] if exclude_types is None else list(exclude_types)
+        self.archive_batch_size = batch_size
+
+    def enable_retention(self, policies: Dict[str, RetentionPolicy], batch_size: int = 500, vacuum: bool = True):
+        """
+        Activa las políticas de retención por tipo de episodio (ver retencion_memoria).
+        enforce_retention borra en lotes de batch_size y, con vacuum=True, compacta después la DB.
+        """
+        self.retention_policies = dict(policies)
+        self.retention_batch_size = batch_size
+        self.retention_vacuum = vacuum
+
+    def start_retention(self, bind: Any, interval_seconds: float = 86400.0) -> RetentionCompactor:
+        """Inicia un hilo que aplica la retención en la base de datos 'bind' cada interval_seconds."""
+        compactor = RetentionCompactor(self, bind, interval_seconds)
+        compactor.start()
+        self.compactors.append(compactor)
+        return compactor
+
+    def start_compactor(self, bind: Any, interval_seconds: float = 3600.0) -> ArchiveCompactor:
+        """Inicia un hilo que archiva los episodios fríos de la base de datos 'bind' cada interval_seconds."""
+        compactor = ArchiveCompactor(self, bind, interval_seconds)
+        compactor.start()
+        self.compactors.append(compactor)
+        return compactor
+
     def log_episode(self, db: Session, type: str, source: str, data: Dict[str, Any], priority: int = 0, long_term: bool = True) -> Dict:
         """
         Registra un evento (episodio) en la memoria.
@@ -44,8 +234,7 @@ class MemoryStore:
         # La memoria a corto plazo los mantiene descifrados por rendimiento.
         data_to_store = data
         if long_term:
-            json_data = json.dumps(data)
-            data_to_store = encrypt_data(json_data)
+            data_to_store = encode_episode_data(data)
         
         new_episode_data = {
             'id': episode_id,
@@ -57,10 +246,30 @@ class MemoryStore:
             'access_count': 0
         }
 
-        if long_term:
+        vector = self._embed_episodes(db, [data])[0] if long_term else None
+
+        if long_term and self.writer is not None:
+            # Escritura diferida: visible en get_memory hasta que el escritor la confirme
+            with self._pending_lock:
+                self._pending_episodes[episode_id] = dict(new_episode_data, data=data)
+            self.writer.submit(db.get_bind(), new_episode_data, episode_terms(data), vector)
+            self._index_vectors(db, [episode_id], [vector])
+
+            if priority > 0 and self.broadcast_callback:
+                print(f"[Memoria] Transmitiendo recuerdo de alta prioridad (P{priority}) al enjambre.")
+                self.broadcast_callback('memory_sync', new_episode_data)
+        elif long_term:
+            index = self._search_index(db)
             db_episode = models.EpisodicMemory(**new_episode_data)
             db.add(db_episode)
+            db.flush()
+            if index is not None:
+                # El indice se escribe en la misma transaccion que el episodio
+                index.add(db, episode_id, episode_terms(data))
+            if vector is not None:
+                db.add(models.EpisodeEmbedding(episode_id=episode_id, vector=vector_to_blob(vector)))
             db.commit()
+            self._index_vectors(db, [episode_id], [vector])
             
             # Si la prioridad es > 0 y hay un callback, transmitir al enjambre.
             if priority > 0 and self.broadcast_callback:
@@ -69,7 +278,7 @@ class MemoryStore:
         else:
             self.short_term.append(new_episode_data)
         
-        self._update_lru(episode_id, new_episode_data)
+        self._invalidate_cache()
         return new_episode_data
 
     def add_remote_episode(self, db: Session, episode_data: Dict[str, Any]):
@@ -84,72 +293,577 @@ class MemoryStore:
             return
 
         print(f"[Memoria] Recibido recuerdo remoto {episode_data.get('id')} para almacenar.")
+        if isinstance(episode_data.get('data'), bytes):
+            episode_data = dict(episode_data, data=episode_data['data'].decode("ascii"))
+        index = self._search_index(db)
+        data = decode_episode_data(episode_data.get('data'))
+        vector = self._embed_episodes(db, [data])[0]
         db_episode = models.EpisodicMemory(**episode_data)
         db.add(db_episode)
+        db.flush()
+        if index is not None:
+            index.add(db, episode_data['id'], episode_terms(data))
+        if vector is not None:
+            db.add(models.EpisodeEmbedding(episode_id=episode_data['id'], vector=vector_to_blob(vector)))
         db.commit()
-        self._update_lru(episode_data['id'], episode_data)
+        self._index_vectors(db, [episode_data['id']], [vector])
+        self._invalidate_cache()
 
 
-    def get_memory(self, db: Session, query: str, context: Optional[List[str]] = None, top_n: int = 5) -> List[Dict]:
-        """Busca recuerdos relevantes, priorizando los de mayor prioridad y más recientes."""
-        # Ordenar por prioridad y luego por timestamp
-        all_db_memories = db.query(models.EpisodicMemory).order_by(
-            desc(models.EpisodicMemory.priority), 
-            desc(models.EpisodicMemory.timestamp)
-        ).limit(1000).all()
-        
-        long_term_dicts = []
-        for mem in all_db_memories:
-            mem_dict = mem.__dict__
-            # Descifrar el campo de datos si es de tipo bytes (cifrado)
-            if isinstance(mem_dict.get('data'), bytes):
-                decrypted_json = decrypt_data(mem_dict['data'])
-                mem_dict['data'] = json.loads(decrypted_json)
-            long_term_dicts.append(mem_dict)
-
-        all_memories = list(self.short_term) + long_term_dicts
-        scored_memories = []
-
-        for mem in all_memories:
-            score = 0
-            mem_content_lower = json.dumps(mem.get('data', '')).lower()
-            if query.lower() in mem_content_lower:
-                score += 2
-            
-            # Añadir la prioridad a la puntuación
-            score += mem.get('priority', 0)
+    def get_memory(self, db: Session, query: str, context: Optional[List[str]] = None, top_n: int = 5,
+                   include_archive: bool = False) -> List[Dict]:
+        """
+        Busca recuerdos relevantes, priorizando los de mayor prioridad y más recientes.
+        Un recuerdo es relevante si contiene la consulta como frase (una consulta vacía
+        coincide con todo); los de prioridad > 0 se devuelven aunque no coincidan.
+        En la DB la búsqueda usa el índice ciego (tokens HMAC) y solo se descifran los resultados.
+        Con la recuperación por vectores activa, los episodios semánticamente parecidos a la
+        consulta suman vector_weight * similitud (aunque no contengan sus palabras).
+        Con include_archive=True, si la memoria caliente no llega a top_n recuerdos, se
+        buscan también (bajo demanda) los episodios archivados que contengan la frase.
+        Los resultados se guardan en lru_cache por consulta normalizada (ver _cache_get).
+        """
+        phrase = search_terms(query)
+        # El contexto no interviene en la búsqueda, así que no forma parte de la clave: si
+        # lo hiciera, el contexto creciente de los bots impediría cualquier acierto
+        key = (db.get_bind(), " ".join(phrase), top_n, include_archive)
+        entries = self._cache_get(key)
+        if entries is None:
+            entries = self._search_memory(db, query, phrase, top_n, include_archive)
+            self._cache_put(key, entries)
+
+        # Contar el acceso: los episodios a corto plazo se actualizan en memoria; los de la
+        # DB (o pendientes de escribir) se acumulan y se escriben en bloque más tarde
+        bind = db.get_bind()
+        results, long_term_ids = [], []
+        for short_term_mem, result in entries:
+            if short_term_mem is not None:
+                short_term_mem['access_count'] = short_term_mem.get('access_count', 0) + 1
+                results.append(short_term_mem)
+            else:
+                long_term_ids.append(result['id'])
+                results.append(dict(result, access_count=result['access_count'] + self.access_counts.pending(bind, result['id']) + 1))
+        self.access_counts.record(bind, long_term_ids)
+        return results
+
+    def iter_episodes(self, db: Session, type: Optional[str] = None, source: Optional[str] = None,
+                      since: Optional[float] = None, until: Optional[float] = None,
+                      newest_first: bool = True, batch_size: int = 500) -> Iterator[Dict]:
+        """
+        Recorre los episodios de la DB (memoria a largo plazo) que cumplen los filtros, sin
+        cargarlos todos: el filtrado (tipo, origen y rango [since, until) de timestamp) se
+        hace en la base de datos y las filas se leen en páginas de batch_size por clave
+        (timestamp, id), no por OFFSET, así que cada página cuesta lo mismo. Cada episodio
+        se descifra solo al entregarlo. Los episodios a corto plazo no se incluyen.
+        """
+        if self.writer is not None:
+            self.writer.flush()  # Los episodios aún en cola también se recorren
+        Episode = models.EpisodicMemory
+        query = db.query(Episode)
+        if type is not None:
+            query = query.filter(Episode.type == type)
+        if source is not None:
+            query = query.filter(Episode.source == source)
+        if since is not None:
+            query = query.filter(Episode.timestamp >= since)
+        if until is not None:
+            query = query.filter(Episode.timestamp < until)
+        if newest_first:
+            query = query.order_by(desc(Episode.timestamp), desc(Episode.id))
+        else:
+            query = query.order_by(Episode.timestamp, Episode.id)
+
+        last = None
+        while True:
+            page = query
+            if last is not None:
+                timestamp, episode_id = last
+                if newest_first:
+                    page = page.filter(or_(Episode.timestamp < timestamp,
+                                           and_(Episode.timestamp == timestamp, Episode.id < episode_id)))
+                else:
+                    page = page.filter(or_(Episode.timestamp > timestamp,
+                                           and_(Episode.timestamp == timestamp, Episode.id > episode_id)))
+            rows = page.limit(batch_size).all()
+            if not rows:
+                return
+            last = (rows[-1].timestamp, rows[-1].id)
+            for row in rows:
+                yield episode_to_dict(row)
+                db.expunge(row)
+            if len(rows) < batch_size:
+                return
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Contadores de la caché de get_memory, para monitorización."""
+        with self._cache_lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'hit_rate': self.cache_hits / lookups if lookups else 0.0,
+                'size': len(self.lru_cache),
+                'max_size': self.lru_cache_size,
+                'ttl_seconds': self.cache_ttl_seconds,
+                'generation': self.cache_generation
+            }
+
+    def _search_memory(self, db: Session, query: str, phrase: List[str], top_n: int,
+                       include_archive: bool) -> List[Any]:
+        """
+        Búsqueda de get_memory sin caché. Devuelve pares (episodio a corto plazo o None,
+        resultado): los episodios a corto plazo se devuelven tal cual para contar sus accesos.
+        """
+        candidates = []  # (puntuación, recuerdo a corto plazo o fila de la DB)
 
+        with self._pending_lock:
+            buffered = list(self.short_term) + list(self._pending_episodes.values())
+        for mem in buffered:
+            score = mem.get('priority', 0)
+            if contains_phrase(episode_terms(mem.get('data', '')), phrase):
+                score += 2
             if score > 0:
-                scored_memories.append((mem, score))
+                candidates.append((score, mem))
+
+        index = self._search_index(db)
+        if index is None:
+            candidates.extend(self._scan_long_term(db, phrase))
+        else:
+            Episode = models.EpisodicMemory
+            by_priority = db.query(Episode).order_by(desc(Episode.priority), desc(Episode.timestamp))
+            if phrase:
+                matched_ids = index.search(db, phrase, top_n)
+                rows = {row.id: row for row in db.query(Episode).filter(Episode.id.in_(matched_ids))} if matched_ids else {}
+                candidates.extend((2 + (rows[i].priority or 0), rows[i]) for i in matched_ids if i in rows)
+                # Los recuerdos prioritarios puntúan aunque no contengan la consulta
+                candidates.extend((row.priority, row) for row in by_priority.filter(Episode.priority > 0).limit(top_n)
+                                  if row.id not in rows)
+            else:
+                candidates.extend((2 + (row.priority or 0), row) for row in by_priority.limit(top_n))
+
+        similar = self._vector_search(db, query, top_n)
+        if similar:
+            candidates = self._fuse_vector_hits(db, candidates, similar)
+
+        if include_archive and self.archive is not None and phrase:
+            hot_ids = {_episode_id(mem) for _, mem in candidates}
+            if len(hot_ids) < top_n:
+                for episode in self.archive.search(blind_tokens(phrase), top_n, exclude=hot_ids):
+                    mem = {key: value for key, value in episode.items() if key != 'tokens'}
+                    mem['data'] = decode_episode_data(mem['data'])
+                    candidates.append((2 + (mem.get('priority') or 0), mem))
+
+        candidates.sort(key=lambda x: x[0], reverse=True)
+        # Un episodio recién escrito puede estar a la vez pendiente y en la DB
+        seen, unique = set(), []
+        for _, mem in candidates:
+            episode_id = _episode_id(mem)
+            if episode_id not in seen:
+                seen.add(episode_id)
+                unique.append(mem)
+        # Solo se descifran los episodios que se devuelven
+        short_term_ids = {id(mem) for mem in self.short_term}
+        return [(mem, mem) if id(mem) in short_term_ids else (None, dict(mem) if isinstance(mem, dict) else episode_to_dict(mem))
+                for mem in unique[:top_n]]
+
+    def _cache_get(self, key: Any) -> Optional[List[Any]]:
+        """Resultado guardado de una consulta, o None si no está, caducó o hubo escrituras después."""
+        with self._cache_lock:
+            entry = self.lru_cache.get(key)
+            if entry is not None:
+                generation, expires_at, entries = entry
+                if generation == self.cache_generation and expires_at > time.monotonic():
+                    self.lru_cache.move_to_end(key)
+                    self.cache_hits += 1
+                    return entries
+                del self.lru_cache[key]
+            self.cache_misses += 1
+            return None
+
+    def _cache_put(self, key: Any, entries: List[Any]):
+        """Guarda el resultado de una consulta (desaloja la menos usada si la caché está llena)."""
+        if self.lru_cache_size <= 0:
+            return
+        with self._cache_lock:
+            self.lru_cache[key] = (self.cache_generation, time.monotonic() + self.cache_ttl_seconds, entries)
+            self.lru_cache.move_to_end(key)
+            while len(self.lru_cache) > self.lru_cache_size:
+                self.lru_cache.popitem(last=False)
+
+    def _invalidate_cache(self):
+        """Invalida la caché de get_memory tras una escritura (las entradas se descartan al leerlas)."""
+        with self._cache_lock:
+            self.cache_generation += 1
+
+    def flush(self):
+        """Escribe en la DB los episodios pendientes de la escritura diferida y los accesos acumulados."""
+        if self.writer is not None:
+            self.writer.flush()
+        self.access_counts.flush()
+
+    def close(self):
+        """Detiene los hilos en segundo plano escribiendo antes lo pendiente. Llamar al apagar."""
+        for compactor in self.compactors:
+            compactor.stop()
+        self.compactors = []
+        if self.writer is not None:
+            self.writer.stop(flush=True)
+            self.writer = None
+        self.access_counts.stop(flush=True)
+        self.save_vector_index()
 
-        scored_memories.sort(key=lambda x: x[1], reverse=True)
-        results = [mem for mem, score in scored_memories[:top_n]]
+    def delete_episode(self, db: Session, episode_id: str):
+        """
+        Borra un episodio de la DB (tras escribir los pendientes, por si aún no estaba escrito)
+        y confirma el borrado, como log_episode. Con escritura diferida es imprescindible:
+        un borrado sin confirmar bloquea la base de datos al hilo escritor.
+        """
+        self.flush()
+        self._delete_episodes(db, [episode_id])
+        db.commit()
+
+    def _delete_episodes(self, db: Session, episode_ids: List[str]):
+        """Borra episodios y sus embeddings (sin commit) y los retira del índice de vectores."""
+        db.execute(delete(models.EpisodeEmbedding).where(models.EpisodeEmbedding.episode_id.in_(episode_ids)))
+        db.execute(delete(models.EpisodicMemory).where(models.EpisodicMemory.id.in_(episode_ids)))
+        index = self._vector_indexes.get(db.get_bind())
+        if index is not None:
+            index.remove(episode_ids)
+        self._invalidate_cache()
+
+    def archive_cold_episodes(self, db: Session, now: Optional[float] = None) -> int:
+        """
+        Mueve al archivo frío los episodios que cumplen la política de enable_archive, por
+        lotes: cada lote se escribe en segmentos y después se borra de la DB (y de los
+        índices) en una transacción. Si algo falla entre ambos pasos, el episodio queda
+        duplicado pero nunca se pierde (get_memory descarta los duplicados). Devuelve los archivados.
+        """
+        if self.archive is None:
+            return 0
+        self.flush()  # Episodios pendientes y contadores de acceso al día
+        Episode = models.EpisodicMemory
+        cutoff = (time.time() if now is None else now) - self.archive_min_age_seconds
+        query = db.query(Episode).filter(
+            Episode.timestamp < cutoff,
+            func.coalesce(Episode.priority, 0) <= self.archive_max_priority,
+            func.coalesce(Episode.access_count, 0) <= self.archive_max_access_count)
+        if self.archive_exclude_types:
+            query = query.filter(or_(Episode.type.is_(None), Episode.type.notin_(self.archive_exclude_types)))
 
-        # Incrementar contador de acceso para los resultados encontrados en la DB
-        for r in results:
-            if 'id' in r and not isinstance(r, dict):
-                r['access_count'] += 1
-                db.query(models.EpisodicMemory).filter(models.EpisodicMemory.id == r['id']).update({'access_count': r['access_count']})
+        archived = 0
+        while True:
+            rows = query.order_by(Episode.timestamp).limit(self.archive_batch_size).all()
+            if not rows:
+                break
+            self.archive.append([{
+                'id': row.id,
+                'timestamp': row.timestamp,
+                'type': row.type,
+                'source': row.source,
+                'data': row.data,  # Tal cual (cifrado)
+                'priority': row.priority or 0,
+                'access_count': row.access_count or 0,
+                'tokens': " ".join(blind_tokens(episode_terms(decode_episode_data(row.data))))
+            } for row in rows])
+            ids = [row.id for row in rows]
+            self._delete_episodes(db, ids)
+            db.commit()
+            db.expunge_all()
+            archived += len(ids)
+        if archived:
+            print(f"[Memoria] Archivados {archived} episodios fríos en '{self.archive.directory}'.")
+        return archived
+
+    def enforce_retention(self, db: Session, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Aplica las políticas de retención: borra por lotes (un commit por lote) los episodios
+        que superan max_age_days y, si un tipo supera max_count, los de menor puntuación de
+        decaimiento; después ejecuta VACUUM/ANALYZE. Devuelve un informe con los borrados
+        por tipo, las filas recuperadas y el tamaño de la DB antes y después.
+        """
+        self.flush()  # Episodios pendientes y contadores de acceso al día
+        now = time.time() if now is None else now
+        bind = db.get_bind()
+        size_before = database_size(bind)
+        started = time.perf_counter()
+
+        Episode = models.EpisodicMemory
+        deleted: Dict[str, int] = {}
+        for episode_type, policy in self.retention_policies.items():
+            count = 0
+            candidates = and_(Episode.type == episode_type, policy.unprotected(Episode.priority))
+            if policy.max_age_days is not None:
+                cutoff = now - policy.max_age_days * 86400
+                count += self._delete_in_batches(db, db.query(Episode.id).filter(
+                    candidates, Episode.timestamp < cutoff).order_by(Episode.id))
+            if policy.max_count is not None:
+                excess = db.query(func.count(Episode.id)).filter(Episode.type == episode_type).scalar() - policy.max_count
+                if excess > 0:
+                    count += self._delete_in_batches(db, db.query(Episode.id).filter(candidates).order_by(
+                        policy.decay_order(Episode.timestamp, Episode.access_count), Episode.id), limit=excess)
+            if count:
+                deleted[episode_type] = count
+
+        if self.retention_vacuum:
+            db.commit()  # VACUUM no puede ejecutarse con una transacción abierta
+            compact_database(bind)
+        size_after = database_size(bind)
+        report = {
+            'deleted': deleted,
+            'rows_reclaimed': sum(deleted.values()),
+            'size_before': size_before,
+            'size_after': size_after,
+            'size_change': None if size_before is None or size_after is None else size_after - size_before,
+            'duration_seconds': time.perf_counter() - started
+        }
+        size = f"; {bind.url.database or bind.url}: {size_before} -> {size_after} bytes" if size_before is not None else ""
+        print(f"[Memoria] Retención: {report['rows_reclaimed']} episodios borrados {deleted}{size}.")
+        return report
+
+    def _delete_in_batches(self, db: Session, query: Any, limit: Optional[int] = None) -> int:
+        """
+        Borra los episodios que devuelve 'query' (de ids, ya ordenada) en lotes de
+        retention_batch_size, con un commit por lote y como mucho 'limit'. Devuelve los borrados.
+        """
+        count = 0
+        while limit is None or count < limit:
+            size = self.retention_batch_size if limit is None else min(self.retention_batch_size, limit - count)
+            ids = [episode_id for (episode_id,) in query.limit(size)]
+            if not ids:
+                break
+            self._delete_episodes(db, ids)
+            db.commit()
+            count += len(ids)
+        return count
+
+    def _forget_pending(self, episode_ids: List[str]):
+        """Retira de la lista de pendientes los episodios ya procesados por el escritor."""
+        with self._pending_lock:
+            for episode_id in episode_ids:
+                self._pending_episodes.pop(episode_id, None)
+
+    def rebuild_search_index(self, db: Session) -> int:
+        """
+        Reindexa todos los episodios de la DB (por ejemplo, los que ya existían al crear
+        el índice). Descifra cada episodio una vez. Devuelve el número de episodios indexados.
+        """
+        index = self._search_index(db)
+        if index is None:
+            return 0
+        count = 0
+        for row in db.query(models.EpisodicMemory).yield_per(500):
+            index.add(db, row.id, episode_terms(decode_episode_data(row.data)))
+            count += 1
         db.commit()
-        
-        return results
+        return count
+
+    def _search_index(self, db: Session) -> Optional[EpisodeSearchIndex]:
+        """Índice de texto completo del motor de la sesión; lo crea (e indexa lo existente) la primera vez."""
+        bind = db.get_bind()
+        with self._search_index_lock:
+            if bind not in self._search_indexes:
+                index = index_for(db)
+                self._search_indexes[bind] = index
+                if index is not None and index.ensure_schema(db):
+                    if db.query(models.EpisodicMemory.id).first() is not None:
+                        print(f"[Memoria] Indexados {self.rebuild_search_index(db)} episodios existentes para la búsqueda.")
+            return self._search_indexes[bind]
+
+    def sync_vector_index(self, db: Session) -> int:
+        """
+        Sincroniza el índice de vectores con la DB: retira los episodios borrados, carga los
+        embeddings guardados que falten y codifica los episodios que aún no tienen embedding
+        (anteriores a la recuperación por vectores o de otra dimensión), confirmándolos por
+        lotes. Puede tardar: fuera de las peticiones se ejecuta con start_vector_sync.
+        Devuelve los añadidos.
+        """
+        if self._vector_encoder is None:
+            return 0
+        index, _ = self._load_vector_index(db.get_bind())
+        probe = self._embed_texts([""])
+        if probe is None:
+            return 0
+        dim = probe.shape[1]
+        if index.dim is not None and index.dim != dim:
+            index.clear()
+
+        Episode, Embedding = models.EpisodicMemory, models.EpisodeEmbedding
+        # Las peticiones siguen añadiendo episodios mientras tanto: solo se retiran los que
+        # ya estaban en el índice (o pendientes) antes de leer la DB
+        with self._pending_lock:
+            pending = set(self._pending_episodes)
+        known = set(index.positions)
+        stored = dict(db.query(Embedding.episode_id, func.length(Embedding.vector)))
+        index.remove([i for i in known if i not in stored and i not in pending])
+
+        added = 0
+        valid = [i for i, size in stored.items() if size == dim * 4]
+        to_load = [i for i in valid if i not in index]
+        for start in range(0, len(to_load), 500):
+            rows = db.query(Embedding).filter(Embedding.episode_id.in_(to_load[start:start + 500])).all()
+            if rows:
+                index.add([row.episode_id for row in rows], np.stack([blob_to_vector(row.vector) for row in rows]))
+            added += len(rows)
+
+        valid = set(valid)
+        to_embed = [i for (i,) in db.query(Episode.id) if i not in valid]
+        for start in range(0, len(to_embed), 500):
+            rows = db.query(Episode).filter(Episode.id.in_(to_embed[start:start + 500])).all()
+            vectors = self._embed_texts([episode_text(decode_episode_data(row.data)) for row in rows])
+            if vectors is None:
+                break
+            for row, vector in zip(rows, vectors):
+                db.merge(Embedding(episode_id=row.id, vector=vector_to_blob(vector)))
+            db.commit()
+            index.add([row.id for row in rows], vectors)
+            added += len(rows)
+        return added
+
+    def start_vector_sync(self, bind: Any) -> Optional[threading.Thread]:
+        """
+        Carga el índice de vectores de la base de datos 'bind' y lo sincroniza con ella
+        (sync_vector_index) en un hilo con su propia sesión. Devuelve el hilo (None si la
+        recuperación por vectores está desactivada).
+        """
+        if self._vector_encoder is None:
+            return None
+        self._load_vector_index(bind)
+
+        def run():
+            db = Session(bind=bind)
+            try:
+                added = self.sync_vector_index(db)
+                if added:
+                    print(f"[Memoria] Añadidos {added} episodios al índice de vectores.")
+                self._invalidate_cache()
+            except Exception as e:
+                db.rollback()
+                print(f"[ERROR] Fallo al sincronizar el índice de vectores de la memoria: {e}")
+            finally:
+                db.close()
+
+        thread = threading.Thread(target=run, name="vector-index-sync", daemon=True)
+        thread.start()
+        self.vector_syncs = [t for t in self.vector_syncs if t.is_alive()] + [thread]
+        return thread
+
+    def save_vector_index(self):
+        """Guarda en vector_index_path el índice de vectores (si está configurado)."""
+        if self.vector_index_path is None:
+            return
+        for index in list(self._vector_indexes.values()):
+            try:
+                index.save(self.vector_index_path)
+            except OSError as e:
+                print(f"[ERROR] No se pudo guardar el índice de vectores de la memoria: {e}")
+
+    def _vector_index(self, db: Session) -> Optional[EpisodeVectorIndex]:
+        """
+        Índice de vectores del motor de la sesión. La primera vez solo se carga de
+        vector_index_path y la sincronización con la DB se lanza en segundo plano
+        (start_vector_sync): la petición nunca codifica episodios antiguos ni hace commit.
+        """
+        if self._vector_encoder is None:
+            return None
+        bind = db.get_bind()
+        index = self._vector_indexes.get(bind)
+        if index is None:
+            index, created = self._load_vector_index(bind)
+            if created:
+                self.start_vector_sync(bind)
+        return index
+
+    def _load_vector_index(self, bind: Any) -> Tuple[EpisodeVectorIndex, bool]:
+        """
+        Índice de vectores de 'bind' y si se acaba de crear: la primera vez lo crea y carga
+        vector_index_path (sin tocar la DB).
+        """
+        with self._search_index_lock:
+            if bind in self._vector_indexes:
+                return self._vector_indexes[bind], False
+            index = EpisodeVectorIndex(ivf_threshold=self.vector_ivf_threshold)
+            if self.vector_index_path is not None:
+                index.load(self.vector_index_path)
+            self._vector_indexes[bind] = index
+            return index, True
+
+    def _embed_texts(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Embeddings de varios textos, o None si falla el codificador."""
+        try:
+            return np.asarray(self._vector_encoder(texts), dtype=np.float32)
+        except Exception as e:
+            print(f"[Advertencia] Fallo al codificar episodios para la recuperación por vectores: {e}")
+            return None
+
+    def _embed_episodes(self, db: Session, datas: List[Any]) -> List[Optional[np.ndarray]]:
+        """Embedding de los datos de cada episodio (None si la recuperación por vectores está desactivada)."""
+        if self._vector_index(db) is None:
+            return [None] * len(datas)
+        vectors = self._embed_texts([episode_text(data) for data in datas])
+        return [None] * len(datas) if vectors is None else list(vectors)
+
+    def _index_vectors(self, db: Session, episode_ids: List[str], vectors: List[Optional[np.ndarray]]):
+        """Añade al índice de vectores los episodios recién registrados."""
+        index = self._vector_indexes.get(db.get_bind())
+        pairs = [(i, v) for i, v in zip(episode_ids, vectors) if v is not None]
+        if index is not None and pairs:
+            index.add([i for i, _ in pairs], np.stack([v for _, v in pairs]))
+
+    def _vector_search(self, db: Session, query: str, top_n: int) -> Dict[str, float]:
+        """Episodios (id -> similitud) más parecidos a la consulta, por encima de vector_min_similarity."""
+        if not query.strip():
+            return {}
+        index = self._vector_index(db)
+        if index is None:
+            return {}
+        vectors = self._embed_texts([query])
+        if vectors is None:
+            return {}
+        return {i: score for i, score in index.search(vectors[0], top_n) if score >= self.vector_min_similarity}
+
+    def _fuse_vector_hits(self, db: Session, candidates: List[Any], similar: Dict[str, float]) -> List[Any]:
+        """Suma la similitud a los candidatos y añade los episodios encontrados solo por vectores."""
+        fused = [(score + self.vector_weight * similar.get(_episode_id(mem), 0.0), mem) for score, mem in candidates]
+        found = {_episode_id(mem) for _, mem in candidates}
+        missing = [i for i in similar if i not in found]
+        with self._pending_lock:
+            pending = {i: self._pending_episodes[i] for i in missing if i in self._pending_episodes}
+        rows = db.query(models.EpisodicMemory).filter(
+            models.EpisodicMemory.id.in_([i for i in missing if i not in pending])).all() if len(missing) > len(pending) else []
+        for mem in list(pending.values()) + rows:
+            fused.append(((mem['priority'] if isinstance(mem, dict) else mem.priority or 0)
+                          + self.vector_weight * similar[_episode_id(mem)], mem))
+        return fused
+
+    def _scan_long_term(self, db: Session, phrase: List[str]) -> List[Any]:
+        """Búsqueda sin índice (motores sin texto completo): descifra y compara cada episodio."""
+        candidates = []
+        for row in db.query(models.EpisodicMemory).order_by(
+                desc(models.EpisodicMemory.priority), desc(models.EpisodicMemory.timestamp)).yield_per(500):
+            mem = episode_to_dict(row)
+            score = mem['priority'] + (2 if contains_phrase(episode_terms(mem['data']), phrase) else 0)
+            if score > 0:
+                candidates.append((score, mem))
+        return candidates
 
     def reset_memory(self, db: Session):
         """
         Limpia COMPLETAMENTE toda la memoria episódica y de clave-valor de la DB.
         También limpia las cachés en memoria.
         """
+        if self.writer is not None:
+            self.writer.flush()
+        self.access_counts.clear()
+        db.execute(delete(models.EpisodeEmbedding))
         db.execute(delete(models.EpisodicMemory))
         db.execute(delete(models.KeyValueStore))
         db.commit()
+        index = self._vector_indexes.get(db.get_bind())
+        if index is not None:
+            index.clear()
         
         self.short_term.clear()
-        self.lru_cache.clear()
+        with self._cache_lock:
+            self.lru_cache.clear()
+        self._invalidate_cache()
         print("[Memoria] La memoria episódica y de clave-valor ha sido reseteada.")
-
-    def _update_lru(self, key: str, value: Any):
-        """Actualiza la caché LRU."""
-        self.lru_cache[key] = value
-        self.lru_cache.move_to_end(key)
-        if len(self.lru_cache) > self.lru_cache_size:
-            self.lru_cache.popitem(last=False)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Text, JSON, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Text, JSON, Boolean, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 
@@ -46,6 +46,11 @@ class EpisodicMemory(Base):
     access_count = Column(Integer, default=0)
     priority = Column(Integer, default=0, index=True)  # 0: normal, >0: mayor prioridad
 
+class EpisodeEmbedding(Base):
+    __tablename__ = "episode_embeddings"
+    episode_id = Column(String, ForeignKey("episodic_memory.id", ondelete="CASCADE"), primary_key=True)
+    vector = Column(LargeBinary, nullable=False)  # float32, embedding_dim * 4 bytes
+
 class KeyValueStore(Base):
     __tablename__ = "kv_store"
     key = Column(String, primary_key=True, index=True)
@@ -34,19 +34,18 @@ class GoalManager:
         # Las metas se guardan como episodios, así que usamos get_memory
         results = self.mem.get_memory(db, query=name, top_n=100) # Búsqueda amplia
         for memory_item in results:
-            if memory_item.type == 'goal' and memory_item.data.get('name') == name:
-                return memory_item.data, memory_item.id
+            if memory_item['type'] == 'goal' and memory_item['data'].get('name') == name:
+                return memory_item['data'], memory_item['id']
         return None
 
     def list_goals(self, db: Session, status: str = "active") -> List[Dict[str, Any]]:
         """Lista todas las metas con un estado específico."""
-        results = self.mem.get_memory(db, query="", top_n=1000) # Obtener todos los recuerdos posibles
         goals = []
-        for memory_item in results:
-            if memory_item.type == 'goal':
-                goal_data = memory_item.data
-                if goal_data.get('status') == status:
-                    goals.append(goal_data)
+        # Se recorren solo los episodios de tipo 'goal', descifrándolos de uno en uno
+        for memory_item in self.mem.iter_episodes(db, type='goal'):
+            goal_data = memory_item['data']
+            if isinstance(goal_data, dict) and goal_data.get('status') == status:
+                goals.append(goal_data)
         return goals
 
     def complete_task(self, db: Session, goal_name: str, task_name: str) -> bool:
@@ -69,9 +68,7 @@ class GoalManager:
             
             # Actualizar borrando el registro antiguo y añadiendo el nuevo
             # Nota: Esta es una forma simple, podría ser más robusto con un update.
-            from sqlalchemy import delete
-            from . import models
-            db.execute(delete(models.EpisodicMemory).where(models.EpisodicMemory.id == memory_id))
+            self.mem.delete_episode(db, memory_id)
             self.mem.log_episode(db, type='goal', source='goal_manager', data=goal)
             
             print(f"[GoalManager] Tarea '{task_name}' de la meta '{goal_name}' completada. Progreso: {goal['progress']:.0f}%")
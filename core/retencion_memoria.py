@@ -0,0 +1,138 @@
+import os
+import math
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, func, text, true
+from sqlalchemy.orm import Session
+
+# --- Politicas de retencion de la memoria episodica ---
+# Cada tipo de episodio (conversation, goal, manual_log, replication...) tiene su politica:
+#   - max_age_days: los episodios mas antiguos se borran.
+#   - max_count: si hay mas episodios del tipo, se borran los de menor puntuacion de decaimiento.
+#   - min_priority: los episodios con prioridad >= min_priority nunca se borran.
+# La puntuacion de decaimiento combina uso y antiguedad:
+#   (1 + access_count) * 0.5 ** (edad_en_dias / half_life_days)
+# de modo que un recuerdo consultado a menudo sobrevive mas que uno reciente que nadie usa.
+# MemoryStore.enforce_retention aplica las politicas en borrados por lotes y despues
+# compacta la base de datos (VACUUM y ANALYZE), informando de las filas y bytes recuperados.
+# Los episodios a borrar se eligen en SQL (filtros y ORDER BY ... LIMIT), sin traer la tabla:
+# para max_count se ordena por decay_order, la misma puntuacion en escala logaritmica
+# (timestamp + half_life * log2(1 + access_count)) con el log2 redondeado hacia abajo,
+# que se calcula sin funciones matematicas (SQLite no siempre las tiene).
+
+class RetentionPolicy:
+    """Politica de retencion de un tipo de episodio (los limites a None no se aplican)."""
+
+    def __init__(self, max_age_days: Optional[float] = None, max_count: Optional[int] = None,
+                 min_priority: Optional[int] = None, half_life_days: float = 30.0):
+        self.max_age_days = max_age_days
+        self.max_count = max_count
+        self.min_priority = min_priority
+        self.half_life_days = half_life_days
+
+    @staticmethod
+    def from_dict(values: Dict[str, Any]) -> "RetentionPolicy":
+        """Crea la politica a partir de su seccion de settings.json."""
+        return RetentionPolicy(
+            max_age_days=values.get("max_age_days"),
+            max_count=values.get("max_count"),
+            min_priority=values.get("min_priority"),
+            half_life_days=values.get("half_life_days", 30.0)
+        )
+
+    def protects(self, priority: Optional[int]) -> bool:
+        """Indica si un episodio con esta prioridad esta protegido frente a la retencion."""
+        return self.min_priority is not None and (priority or 0) >= self.min_priority
+
+    def decay_score(self, access_count: Optional[int], age_seconds: float) -> float:
+        """Puntuacion de decaimiento: mas alta cuanto mas usado y mas reciente es el episodio."""
+        age_days = max(age_seconds, 0.0) / 86400
+        return (1 + (access_count or 0)) * math.pow(0.5, age_days / max(self.half_life_days, 1e-9))
+
+    def unprotected(self, priority_column: Any) -> Any:
+        """Condicion SQL de los episodios que la politica puede borrar (ver protects)."""
+        if self.min_priority is None:
+            return true()
+        return func.coalesce(priority_column, 0) < self.min_priority
+
+    def decay_order(self, timestamp_column: Any, access_count_column: Any) -> Any:
+        """
+        Expresion SQL que ordena como decay_score (de menor a mayor): cada duplicacion de
+        1 + access_count equivale a una vida media mas de recencia.
+        """
+        hits = 1 + func.coalesce(access_count_column, 0)
+        log2_hits = case(*[(hits >= 2 ** k, k) for k in range(62, 0, -1)], else_=0)
+        return func.coalesce(timestamp_column, 0) + self.half_life_days * 86400 * log2_hits
+
+def database_size(bind: Any) -> Optional[int]:
+    """Tamaño en bytes de la base de datos (archivo SQLite y su WAL, o pg_database_size); None si no se conoce."""
+    if bind.dialect.name == "sqlite":
+        path = bind.url.database
+        if not path or path == ":memory:" or not os.path.exists(path):
+            return None
+        return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+    if bind.dialect.name == "postgresql":
+        with bind.connect() as connection:
+            return connection.execute(text("SELECT pg_database_size(current_database())")).scalar()
+    return None
+
+def compact_database(bind: Any):
+    """VACUUM y ANALYZE fuera de una transaccion (en SQLite, vuelca tambien el WAL al archivo)."""
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if bind.dialect.name == "sqlite":
+            connection.exec_driver_sql("VACUUM")
+            connection.exec_driver_sql("ANALYZE")
+            connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        elif bind.dialect.name == "postgresql":
+            connection.exec_driver_sql("VACUUM ANALYZE episodic_memory")
+
+class RetentionCompactor:
+    """
+    Hilo que cada interval_seconds aplica las politicas de retencion de una base de datos
+    (MemoryStore.enforce_retention) con su propia sesion y guarda el ultimo informe.
+    """
+    def __init__(self, store: Any, bind: Any, interval_seconds: float = 86400.0):
+        self.store = store
+        self.bind = bind
+        self.interval_seconds = interval_seconds
+        self.wake = threading.Event()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        """Inicia el hilo de retencion."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="memory-retention", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Detiene el hilo (termina antes la pasada en curso)."""
+        self.running = False
+        if self.thread is not None:
+            self.wake.set()
+            self.thread.join()
+            self.thread = None
+
+    def run_once(self) -> Optional[Dict[str, Any]]:
+        """Una pasada de retencion y compactacion. Devuelve su informe (None si falla)."""
+        db = Session(bind=self.bind)
+        try:
+            self.last_report = self.store.enforce_retention(db)
+        except Exception as e:
+            db.rollback()
+            print(f"[ERROR] Fallo al aplicar la retencion de la memoria: {e}")
+            return None
+        finally:
+            db.close()
+        return self.last_report
+
+    def _run(self):
+        while self.running:
+            self.wake.wait(self.interval_seconds)
+            self.wake.clear()
+            if self.running:
+                self.run_once()
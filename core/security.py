@@ -2,6 +2,8 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 import os
 import json
+import hmac
+import hashlib
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -27,6 +29,13 @@ from cryptography.fernet import Fernet
 ENCRYPTION_KEY = config('MEA_ENCRYPTION_KEY', default=Fernet.generate_key().decode())
 fernet = Fernet(ENCRYPTION_KEY.encode())
 
+# Clave del indice ciego (tokens HMAC de las palabras de los datos cifrados). Si no se
+# configura, se deriva de la clave de cifrado para no reutilizarla directamente.
+BLIND_INDEX_KEY = config('MEA_BLIND_INDEX_KEY', default=None)
+_blind_index_key = (BLIND_INDEX_KEY.encode() if BLIND_INDEX_KEY
+                    else hmac.new(ENCRYPTION_KEY.encode(), b"mea-blind-index", hashlib.sha256).digest())
+BLIND_TOKEN_LENGTH = 16  # Caracteres hexadecimales (64 bits) por token
+
 # --- Clase de Auditoría de Seguridad ---
 
 class SecurityAuditor:
@@ -124,6 +133,14 @@ def encrypt_data(data: str) -> bytes:
     """Cifra una cadena de texto."""
     return fernet.encrypt(data.encode('utf-8'))
 
+def blind_token(term: str) -> str:
+    """
+    Token del indice ciego de una palabra: HMAC-SHA256 con la clave del indice, truncado.
+    Es determinista (la misma palabra da el mismo token), asi que permite buscar por
+    igualdad sin guardar la palabra; no se puede invertir sin la clave.
+    """
+    return hmac.new(_blind_index_key, term.encode('utf-8'), hashlib.sha256).hexdigest()[:BLIND_TOKEN_LENGTH]
+
 def decrypt_data(encrypted_data: bytes) -> str:
     """Descifra datos y los devuelve como cadena de texto."""
     try:
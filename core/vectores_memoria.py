@@ -0,0 +1,184 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ann_index import IVFIndex, normalize_rows
+
+# --- Recuperacion densa (por vectores) de la memoria episodica ---
+# Cada episodio a largo plazo recibe al escribirse un embedding (MeaEngine.encode del texto
+# de sus datos), que se guarda en la tabla episode_embeddings como un blob float32.
+# EpisodeVectorIndex mantiene esos vectores normalizados en una matriz NumPy y responde
+# consultas top-k por similitud de coseno: busqueda exacta (producto punto) mientras el
+# indice es pequeño y, a partir de 'ivf_threshold' episodios, un IVFIndex (ann_index).
+# El indice se actualiza de forma incremental al registrar o borrar episodios, se guarda
+# en un archivo .npz y, al cargarse, se sincroniza con la base de datos (que es la fuente
+# de verdad), de modo que un archivo antiguo o ausente solo cuesta leer los blobs que faltan.
+
+def vector_to_blob(vector: np.ndarray) -> bytes:
+    """Serializa un embedding como bytes float32 (embedding_dim * 4 bytes)."""
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+def blob_to_vector(blob: bytes) -> np.ndarray:
+    """Embedding guardado con vector_to_blob."""
+    return np.frombuffer(blob, dtype=np.float32)
+
+def episode_text(data: Any) -> str:
+    """Texto de los datos de un episodio para codificarlo: sus valores de texto, sin las claves."""
+    if isinstance(data, dict):
+        return " ".join(episode_text(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return " ".join(episode_text(value) for value in data)
+    return "" if data is None else str(data)
+
+class EpisodeVectorIndex:
+    """Indice en memoria (NumPy, plano o IVF) de los embeddings de los episodios."""
+
+    def __init__(self, ivf_threshold: int = 50_000, nlist: Optional[int] = None, nprobe: int = 8):
+        """
+        Args:
+            ivf_threshold (int): Episodios a partir de los cuales se entrena un IVFIndex.
+            nlist (int): Listas del IVF (por defecto, raiz cuadrada del numero de episodios).
+            nprobe (int): Listas que se consultan en cada busqueda IVF.
+        """
+        self.ivf_threshold = ivf_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.dim: Optional[int] = None
+        self.vectors = np.empty((0, 0), dtype=np.float32)  # Capacidad reservada; solo valen las 'size' primeras filas
+        self.alive = np.empty(0, dtype=bool)
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.size = 0
+        self.ivf: Optional[IVFIndex] = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, episode_id: str):
+        return episode_id in self.positions
+
+    def add(self, episode_ids: Sequence[str], vectors: np.ndarray):
+        """Añade (o reemplaza) los embeddings de varios episodios. Los vectores nulos se ignoran."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(episode_ids), -1)
+        keep = np.linalg.norm(vectors, axis=1) > 0
+        if not keep.any():
+            return
+        episode_ids = [episode_id for episode_id, k in zip(episode_ids, keep) if k]
+        vectors = normalize_rows(vectors[keep])
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self.vectors = np.empty((0, self.dim), dtype=np.float32)
+            elif vectors.shape[1] != self.dim:
+                raise Exception(f"Dimension de embedding {vectors.shape[1]} distinta de la del indice ({self.dim}).")
+            self._remove(episode_ids)
+            start = self.size
+            self._reserve(start + len(episode_ids))
+            self.vectors[start:start + len(episode_ids)] = vectors
+            self.alive[start:start + len(episode_ids)] = True
+            for offset, episode_id in enumerate(episode_ids):
+                self.positions[episode_id] = start + offset
+            self.ids.extend(episode_ids)
+            self.size += len(episode_ids)
+            if self.ivf is not None:
+                self.ivf.add(vectors, np.arange(start, self.size))
+            elif len(self.positions) >= self.ivf_threshold:
+                self._train_ivf()
+
+    def remove(self, episode_ids: Sequence[str]):
+        """Retira episodios del indice (se compacta cuando un cuarto de las filas estan borradas)."""
+        with self.lock:
+            self._remove(episode_ids)
+            if self.size - len(self.positions) > max(1024, self.size // 4):
+                self._compact()
+
+    def clear(self):
+        """Vacia el indice."""
+        with self.lock:
+            self.dim = None
+            self.vectors = np.empty((0, 0), dtype=np.float32)
+            self.alive = np.empty(0, dtype=bool)
+            self.ids, self.positions, self.size, self.ivf = [], {}, 0, None
+
+    def search(self, query: np.ndarray, k: int = 5) -> List[Tuple[str, float]]:
+        """(id, similitud de coseno) de los k episodios mas parecidos a la consulta, de mayor a menor."""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        with self.lock:
+            if not self.positions or k <= 0 or not np.linalg.norm(query) > 0 or query.shape[0] != self.dim:
+                return []
+            query = normalize_rows(query)
+            if self.ivf is not None:
+                # Las filas borradas siguen en las listas del IVF hasta la siguiente compactacion
+                deleted = self.size - len(self.positions)
+                positions, scores = self.ivf.search(query, k=k + deleted)
+                keep = self.alive[positions]
+                positions, scores = positions[keep][:k], scores[keep][:k]
+            else:
+                scores = self.vectors[:self.size] @ query
+                scores[~self.alive[:self.size]] = -np.inf
+                k = min(k, len(self.positions))
+                positions = np.argpartition(-scores, k - 1)[:k]
+                positions = positions[np.argsort(-scores[positions], kind="stable")]
+                scores = scores[positions]
+            return [(self.ids[p], float(s)) for p, s in zip(positions, scores)]
+
+    def save(self, file_path: str):
+        """Guarda los embeddings vivos en un .npz (escritura atomica: archivo temporal + rename)."""
+        with self.lock:
+            live = np.flatnonzero(self.alive[:self.size])
+            ids = np.array([self.ids[p] for p in live], dtype=str)
+            vectors = self.vectors[live] if self.dim is not None else np.empty((0, 0), dtype=np.float32)
+        directory = os.path.dirname(os.path.abspath(file_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, ids=ids, vectors=vectors)
+        os.replace(tmp_path, file_path)
+
+    def load(self, file_path: str) -> bool:
+        """Carga un indice guardado con save (reemplaza el contenido). Devuelve False si no existe."""
+        if not os.path.exists(file_path):
+            return False
+        with np.load(file_path) as data:
+            ids, vectors = data["ids"].tolist(), data["vectors"]
+        self.clear()
+        if ids:
+            self.add(ids, vectors)
+        return True
+
+    def _reserve(self, capacity: int):
+        """Amplia la matriz (duplicando la capacidad) para que quepan 'capacity' filas."""
+        if capacity <= len(self.vectors):
+            return
+        new_capacity = max(capacity, 2 * len(self.vectors), 64)
+        vectors = np.empty((new_capacity, self.dim), dtype=np.float32)
+        vectors[:self.size] = self.vectors[:self.size]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        self.vectors, self.alive = vectors, alive
+
+    def _remove(self, episode_ids: Sequence[str]):
+        for episode_id in episode_ids:
+            position = self.positions.pop(episode_id, None)
+            if position is not None:
+                self.alive[position] = False
+
+    def _compact(self):
+        """Reescribe la matriz solo con las filas vivas (y reentrena el IVF si lo hay)."""
+        live = np.flatnonzero(self.alive[:self.size])
+        self.vectors = self.vectors[live].copy()
+        self.alive = np.ones(len(live), dtype=bool)
+        self.ids = [self.ids[p] for p in live]
+        self.positions = {episode_id: p for p, episode_id in enumerate(self.ids)}
+        self.size = len(live)
+        self.ivf = None
+        if self.size >= self.ivf_threshold:
+            self._train_ivf()
+
+    def _train_ivf(self):
+        vectors = self.vectors[:self.size]
+        self.ivf = IVFIndex(nlist=self.nlist, nprobe=self.nprobe).train(vectors[self.alive[:self.size]])
+        self.ivf.add(vectors, np.arange(self.size))
@@ -0,0 +1,468 @@
+import glob
+import hashlib
+import json
+import os
+from array import array
+from collections import Counter
+
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset
+
+from engine import tokenize
+
+# --- Ingesta en streaming del corpus de entrenamiento ---
+# Nada de este modulo carga el corpus completo en memoria: los archivos se leen
+# linea a linea y los pares (objetivo, contexto) se generan por bloques de tokens.
+
+def list_corpus_files(data_path):
+    """Devuelve (en orden estable) los archivos .txt bajo la ruta indicada."""
+    return sorted(glob.glob(f"{data_path}/**/*.txt", recursive=True))
+
+def shard_byte_ranges(file_paths, shard):
+    """
+    Reparte el corpus entre procesos por rangos de bytes, antes de leerlo: los archivos se
+    ven como un unico flujo y el proceso 'rango' de 'num_procesos' recibe el tramo
+    [rango * total / num_procesos, (rango + 1) * total / num_procesos). Devuelve una lista
+    de (archivo, inicio, fin) con la parte de cada archivo que cae en el tramo.
+    """
+    rank, world_size = shard
+    sizes = [os.path.getsize(file_path) for file_path in file_paths]
+    total = sum(sizes)
+    shard_start, shard_end = rank * total // world_size, (rank + 1) * total // world_size
+    ranges, offset = [], 0
+    for file_path, size in zip(file_paths, sizes):
+        start, end = max(shard_start - offset, 0), min(shard_end - offset, size)
+        if start < end:
+            ranges.append((file_path, start, end))
+        offset += size
+    return ranges
+
+def iter_lines_range(file_path, start, end):
+    """
+    Lineas de un archivo que empiezan en el rango de bytes [start, end). Una linea que
+    cruza el limite pertenece al rango donde empieza, asi que rangos contiguos reparten
+    las lineas sin repetir ni perder ninguna.
+    """
+    with open(file_path, 'rb') as f:
+        if start > 0:
+            # Salta la linea que empezo antes del rango (la lee el rango anterior)
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            yield line.decode('utf-8')
+
+def iter_tokens(file_paths, shard=None):
+    """
+    Genera los tokens de todos los archivos, leyendolos linea a linea.
+    Con shard=(rango, num_procesos) solo lee y tokeniza las lineas de su rango de bytes.
+    """
+    if shard is None:
+        ranges = [(file_path, 0, None) for file_path in file_paths]
+    else:
+        ranges = shard_byte_ranges(file_paths, shard)
+    for file_path, start, end in ranges:
+        if end is None:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield from tokenize(line)
+        else:
+            for line in iter_lines_range(file_path, start, end):
+                yield from tokenize(line)
+
+def count_vocabulary(file_paths):
+    """Cuenta la frecuencia de cada palabra del corpus en una sola pasada."""
+    counts = Counter()
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                counts.update(tokenize(line))
+    return counts
+
+def iter_id_chunks(file_paths, vocab, chunk_tokens=65536, shard=None):
+    """
+    Convierte el flujo de tokens en bloques (arrays de NumPy) de indices de tamaño fijo.
+    Con shard=(rango, num_procesos) solo procesa el rango de bytes de ese proceso.
+    """
+    chunk = []
+    for token in iter_tokens(file_paths, shard):
+        chunk.append(token)
+        if len(chunk) >= chunk_tokens:
+            yield vocab.get_indices(chunk)
+            chunk = []
+    if chunk:
+        yield vocab.get_indices(chunk)
+
+def chunk_id_stream(id_arrays, chunk_tokens=65536):
+    """Reagrupa una secuencia de arrays de indices en bloques de chunk_tokens (el ultimo puede ser menor)."""
+    pending = []
+    pending_size = 0
+    for ids in id_arrays:
+        while len(ids) > 0:
+            take = min(chunk_tokens - pending_size, len(ids))
+            pending.append(ids[:take])
+            pending_size += take
+            ids = ids[take:]
+            if pending_size == chunk_tokens:
+                yield np.concatenate(pending)
+                pending, pending_size = [], 0
+    if pending_size:
+        yield np.concatenate(pending)
+
+# --- Cache del corpus pre-tokenizado ---
+# Un directorio con los tokens de cada archivo ya convertidos a identificadores uint32
+# (un archivo .u32 por contenido, que se lee mapeado en memoria), el diccionario de
+# palabras de la cache, sus frecuencias y un manifiesto con el hash de cada archivo.
+# Los identificadores de la cache son propios (no dependen de min_count): al entrenar se
+# traducen a indices del vocabulario con una tabla de correspondencia.
+
+CACHE_MANIFEST = "manifest.json"
+CACHE_WORDS = "words.txt"
+
+def file_sha256(file_path, block_size=1 << 20):
+    """Hash SHA-256 del contenido de un archivo."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class TokenCache:
+    """
+    Cache en disco del corpus tokenizado para reutilizarla entre ejecuciones de train.py.
+    update() solo vuelve a tokenizar los archivos nuevos o modificados (detectados por
+    tamaño y fecha, confirmados por hash de contenido); el resto se reutiliza tal cual.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.manifest = {"files": [], "num_words": 0, "counts_file": None, "generation": 0}
+        manifest_path = os.path.join(cache_dir, CACHE_MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    @property
+    def file_paths(self):
+        """Archivos de la cache, en el orden en que se entrenan."""
+        return [entry["path"] for entry in self.manifest["files"]]
+
+    def words(self):
+        """Diccionario de la cache: la palabra de cada identificador."""
+        words = []
+        words_path = os.path.join(self.cache_dir, CACHE_WORDS)
+        if os.path.exists(words_path):
+            with open(words_path, encoding="utf-8") as f:
+                for _, line in zip(range(self.manifest["num_words"]), f):
+                    words.append(line.rstrip("\n"))
+        return words
+
+    def counts(self):
+        """Frecuencia de cada identificador de la cache (array de tamaño num_words)."""
+        if not self.manifest["counts_file"]:
+            return np.zeros(0, dtype=np.int64)
+        return np.load(os.path.join(self.cache_dir, self.manifest["counts_file"]))
+
+    def word_counts(self):
+        """Frecuencias de las palabras del corpus cacheado (igual que count_vocabulary)."""
+        return Counter({word: int(count) for word, count in zip(self.words(), self.counts()) if count > 0})
+
+    def update(self, file_paths):
+        """
+        Sincroniza la cache con la lista de archivos. Devuelve un resumen
+        {"reused": n, "tokenized": n, "removed": n}.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        words = self.words()
+        word_ids = {word: i for i, word in enumerate(words)}
+        counts = self.counts()
+        old_entries = {entry["path"]: entry for entry in self.manifest["files"]}
+        entries, new_blobs = [], []
+        stats = {"reused": 0, "tokenized": 0, "removed": 0}
+
+        for file_path in file_paths:
+            info = os.stat(file_path)
+            entry = old_entries.pop(file_path, None)
+            if entry and entry["size"] == info.st_size and entry["mtime_ns"] == info.st_mtime_ns:
+                entries.append(entry)
+                stats["reused"] += 1
+                continue
+            sha256 = file_sha256(file_path)
+            if entry and entry["sha256"] == sha256:
+                # Solo ha cambiado la fecha: los tokens siguen siendo validos
+                entries.append(dict(entry, size=info.st_size, mtime_ns=info.st_mtime_ns))
+                stats["reused"] += 1
+                continue
+
+            if entry:
+                counts = self._subtract_blob(counts, entry)
+                stats["removed"] += 1
+            ids = array("I")
+            with open(file_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    for token in tokenize(line):
+                        token_id = word_ids.get(token)
+                        if token_id is None:
+                            token_id = word_ids[token] = len(words)
+                            words.append(token)
+                        ids.append(token_id)
+            ids = np.frombuffer(ids, dtype=np.uint32) if len(ids) else np.empty(0, dtype=np.uint32)
+            blob = f"{sha256[:32]}.u32"
+            self._write_atomic(blob, ids.tobytes())
+            new_blobs.append(blob)
+            counts = np.pad(counts, (0, len(words) - len(counts)))
+            counts += np.bincount(ids, minlength=len(words)).astype(np.int64)
+            entries.append({"path": file_path, "sha256": sha256, "size": info.st_size,
+                            "mtime_ns": info.st_mtime_ns, "tokens": len(ids), "blob": blob})
+            stats["tokenized"] += 1
+
+        # Archivos que ya no forman parte del corpus
+        for entry in old_entries.values():
+            counts = self._subtract_blob(counts, entry)
+            stats["removed"] += 1
+
+        if entries != self.manifest["files"]:
+            self._commit(entries, words, counts)
+        return stats
+
+    def iter_id_chunks(self, vocab, chunk_tokens=65536, shard=None):
+        """
+        Equivalente a iter_id_chunks(file_paths, vocab) pero leyendo los tokens de la cache:
+        produce exactamente los mismos bloques de indices del vocabulario.
+        Con shard=(rango, num_procesos) solo lee (del mapeo en memoria) el tramo de tokens
+        de ese proceso: [rango * total / num_procesos, (rango + 1) * total / num_procesos).
+        """
+        # Correspondencia identificador de la cache -> indice del vocabulario (<UNK> = 0)
+        remap = vocab.get_indices(self.words())
+        entries = self.manifest["files"]
+        if shard is None:
+            return chunk_id_stream((remap[self._load_blob(entry)] for entry in entries), chunk_tokens)
+
+        rank, world_size = shard
+        total = sum(entry["tokens"] for entry in entries)
+        shard_start, shard_end = rank * total // world_size, (rank + 1) * total // world_size
+        slices, offset = [], 0
+        for entry in entries:
+            start, end = max(shard_start - offset, 0), min(shard_end - offset, entry["tokens"])
+            if start < end:
+                slices.append((entry, start, end))
+            offset += entry["tokens"]
+        return chunk_id_stream((remap[self._load_blob(entry)[start:end]] for entry, start, end in slices),
+                               chunk_tokens)
+
+    def _load_blob(self, entry):
+        if entry["tokens"] == 0:
+            return np.empty(0, dtype=np.uint32)
+        return np.memmap(os.path.join(self.cache_dir, entry["blob"]), dtype=np.uint32, mode="r")
+
+    def _subtract_blob(self, counts, entry):
+        ids = self._load_blob(entry)
+        counts = counts.copy()
+        counts -= np.bincount(ids, minlength=len(counts)).astype(np.int64)
+        return counts
+
+    def _write_atomic(self, name, data):
+        path = os.path.join(self.cache_dir, name)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _commit(self, entries, words, counts):
+        """
+        Publica la nueva version de la cache. El manifiesto se escribe al final: si el
+        proceso se interrumpe antes, la version anterior sigue siendo valida.
+        """
+        previous = self.manifest
+        generation = previous.get("generation", 0) + 1
+        # El diccionario solo crece: los identificadores antiguos no cambian, asi que el
+        # manifiesto anterior (que lee sus primeras num_words lineas) sigue siendo valido
+        self._write_atomic(CACHE_WORDS, "".join(word + "\n" for word in words).encode("utf-8"))
+        counts_file = f"counts-{generation}.npy"
+        with open(os.path.join(self.cache_dir, counts_file), "wb") as f:
+            np.save(f, counts)
+        self.manifest = {"files": entries, "num_words": len(words),
+                         "counts_file": counts_file, "generation": generation}
+        self._write_atomic(CACHE_MANIFEST, json.dumps(self.manifest, indent=1).encode("utf-8"))
+
+        # Limpia los archivos que ya no referencia el manifiesto
+        referenced = {entry["blob"] for entry in entries} | {counts_file, CACHE_MANIFEST, CACHE_WORDS}
+        for name in os.listdir(self.cache_dir):
+            if name not in referenced and (name.endswith(".u32") or name.startswith("counts-")):
+                os.remove(os.path.join(self.cache_dir, name))
+
+def skipgram_pairs_loop(indexed_tokens, window_size, start=0, end=None):
+    """
+    Crea los pares (objetivo, contexto) de las palabras objetivo en [start, end).
+    El contexto puede caer fuera de ese rango, siempre que este dentro de indexed_tokens.
+    Implementacion de referencia con bucles de Python (ver skipgram_pairs).
+    """
+    end = len(indexed_tokens) if end is None else end
+    targets = []
+    contexts = []
+
+    for i in range(start, end):
+        target_idx = indexed_tokens[i]
+        # Ignoramos palabras desconocidas en el centro
+        if target_idx == 0:
+            continue
+
+        # Define la ventana de contexto alrededor de la palabra objetivo
+        lo = max(0, i - window_size)
+        hi = min(len(indexed_tokens), i + window_size + 1)
+
+        for j in range(lo, hi):
+            if i == j: # No queremos que la palabra sea su propio contexto
+                continue
+
+            context_idx = indexed_tokens[j]
+            # Ignoramos palabras de contexto desconocidas
+            if context_idx == 0:
+                continue
+
+            targets.append(target_idx)
+            contexts.append(context_idx)
+
+    return targets, contexts
+
+def skipgram_pairs(indexed_tokens, window_size, start=0, end=None, rng=None):
+    """
+    Version vectorizada de skipgram_pairs_loop: genera todos los desplazamientos de la
+    ventana con desplazamientos de arrays y mascaras. Devuelve dos arrays int64 con
+    exactamente los mismos pares y en el mismo orden.
+    Si se pasa un generador aleatorio (rng), cada palabra objetivo usa una ventana
+    dinamica de tamaño uniforme en [1, window_size], como en word2vec.
+    """
+    ids = np.asarray(indexed_tokens, dtype=np.int64)
+    end = len(ids) if end is None else end
+    positions = np.arange(start, end)
+
+    # Desplazamientos en el mismo orden que el bucle: -w..-1, +1..+w
+    offsets = np.concatenate([np.arange(-window_size, 0), np.arange(1, window_size + 1)])
+    context_positions = positions[:, None] + offsets[None, :]        # (n, 2w)
+    in_bounds = (context_positions >= 0) & (context_positions < len(ids))
+
+    target_ids = ids[positions]
+    context_ids = ids[np.clip(context_positions, 0, max(len(ids) - 1, 0))]
+
+    # Ignoramos palabras desconocidas tanto en el centro como en el contexto
+    mask = in_bounds & (context_ids != 0) & (target_ids[:, None] != 0)
+    if rng is not None:
+        reduced_windows = rng.integers(1, window_size + 1, size=len(positions))
+        mask &= np.abs(offsets)[None, :] <= reduced_windows[:, None]
+    targets = np.broadcast_to(target_ids[:, None], mask.shape)[mask]
+    return targets, context_ids[mask]
+
+def subsample_chunks(id_chunks, keep_probabilities, rng, stats=None):
+    """
+    Descarta tokens frecuentes de cada bloque segun su probabilidad de conservacion
+    precalculada por indice. Los tokens descartados desaparecen antes de formar las
+    ventanas, lo que ademas amplia el contexto efectivo (como en word2vec).
+    """
+    for chunk in id_chunks:
+        kept = chunk[rng.random(len(chunk)) < keep_probabilities[chunk]]
+        if stats is not None:
+            stats["tokens"] += len(chunk)
+            stats["kept_tokens"] += len(kept)
+        yield kept
+
+def iter_skipgram_pairs(id_chunks, window_size, rng=None):
+    """
+    Genera los pares Skip-gram bloque a bloque.
+    Conserva entre bloques solo los tokens necesarios para las ventanas, por lo que
+    los pares son exactamente los mismos que sobre el corpus concatenado.
+    Con rng se usan ventanas dinamicas (ver skipgram_pairs).
+    """
+    buffer = np.empty(0, dtype=np.int64)
+    start = 0  # Primera posicion del buffer cuyos pares aun no se han emitido
+    for chunk in id_chunks:
+        buffer = np.concatenate([buffer, chunk])
+        # Solo las palabras con contexto derecho completo pueden emitirse ya
+        end = len(buffer) - window_size
+        if end > start:
+            yield skipgram_pairs(buffer, window_size, start, end, rng)
+            cut = max(0, end - window_size)
+            buffer = buffer[cut:]
+            start = end - cut
+    if len(buffer) > start:
+        yield skipgram_pairs(buffer, window_size, start, len(buffer), rng)
+
+class SkipGramStream(IterableDataset):
+    """
+    Dataset iterable que produce lotes (objetivos, contextos) de tamaño fijo.
+    La memoria maxima depende del tamaño del bloque y del lote, no del corpus.
+    Los pares se barajan dentro de cada bloque de tokens.
+    Opcionalmente submuestrea palabras frecuentes (subsample = umbral t, 0 lo desactiva)
+    y usa ventanas dinamicas. Las estadisticas de la ultima pasada quedan en self.stats.
+    Con shard=(rango, num_procesos) cada proceso de entrenamiento lee, tokeniza y procesa
+    solo su tramo del corpus (ver shard_byte_ranges); se pierden unicamente los pares cuya
+    ventana cruza el limite entre dos tramos.
+    Con token_cache (TokenCache ya actualizada) los tokens se leen de la cache en lugar
+    de tokenizar los archivos de texto; los lotes son identicos.
+    """
+    def __init__(self, file_paths, vocab, window_size=2, batch_size=128,
+                 chunk_tokens=65536, shuffle=True, seed=0, subsample=0.0, dynamic_window=False,
+                 shard=None, token_cache=None):
+        super().__init__()
+        self.file_paths = list(file_paths)
+        self.vocab = vocab
+        self.window_size = window_size
+        self.batch_size = batch_size
+        self.chunk_tokens = chunk_tokens
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.dynamic_window = dynamic_window
+        self.shard = shard
+        self.token_cache = token_cache
+        # Decisiones de submuestreo precalculadas por indice del vocabulario
+        self.keep_probabilities = vocab.keep_probabilities(subsample) if subsample > 0 else None
+        self.stats = {"tokens": 0, "kept_tokens": 0, "pairs": 0}
+
+    def set_epoch(self, epoch):
+        """Cambia la semilla del barajado para cada epoca (reproducible)."""
+        self.epoch = epoch
+
+    def __iter__(self):
+        # Cada proceso usa su propia semilla (sus tramos del corpus ya son disjuntos)
+        rank = self.shard[0] if self.shard else 0
+        subsample_rng = np.random.default_rng([self.seed, self.epoch, rank, 1] if self.shard else [self.seed, self.epoch])
+        rng = np.random.default_rng([self.seed, self.epoch, rank])
+        self.stats = {"tokens": 0, "kept_tokens": 0, "pairs": 0}
+
+        pending_targets = torch.empty(0, dtype=torch.long)
+        pending_contexts = torch.empty(0, dtype=torch.long)
+        if self.token_cache is not None:
+            id_chunks = self.token_cache.iter_id_chunks(self.vocab, self.chunk_tokens, self.shard)
+        else:
+            id_chunks = iter_id_chunks(self.file_paths, self.vocab, self.chunk_tokens, self.shard)
+        if self.keep_probabilities is not None:
+            id_chunks = subsample_chunks(id_chunks, self.keep_probabilities, subsample_rng, self.stats)
+
+        window_rng = rng if self.dynamic_window else None
+        for targets, contexts in iter_skipgram_pairs(id_chunks, self.window_size, window_rng):
+            if len(targets) == 0:
+                continue
+            self.stats["pairs"] += len(targets)
+            if self.shuffle:
+                order = rng.permutation(len(targets))
+                targets, contexts = targets[order], contexts[order]
+            targets = torch.from_numpy(targets)
+            contexts = torch.from_numpy(contexts)
+
+            pending_targets = torch.cat([pending_targets, targets])
+            pending_contexts = torch.cat([pending_contexts, contexts])
+
+            # Emite todos los lotes completos y guarda el resto para el siguiente bloque
+            num_full = len(pending_targets) // self.batch_size * self.batch_size
+            for i in range(0, num_full, self.batch_size):
+                yield pending_targets[i:i + self.batch_size], pending_contexts[i:i + self.batch_size]
+            pending_targets = pending_targets[num_full:]
+            pending_contexts = pending_contexts[num_full:]
+
+        # Ultimo lote (incompleto)
+        if len(pending_targets) > 0:
+            yield pending_targets, pending_contexts
@@ -2,8 +2,68 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from collections import Counter
+import numpy as np
+from collections import Counter, OrderedDict
+import copy
+import json
+import operator
+import os
 import re
+import tempfile
+import threading
+
+from ann_index import IVFIndex, recall_at_k
+from quantization import QuantizedEmbeddings, QUANTIZED_DTYPES
+from subword import word_ngram_ids, gather_ngrams
+
+# Tokenizacion simple: minusculas y division por espacios/puntuacion
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+
+def tokenize(text):
+    """Funcion simple de tokenizacion."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def query_key(item):
+    """
+    Normaliza una consulta por lotes: las palabras se dejan tal cual y los indices
+    (int, enteros de NumPy o tensores 0-d) se convierten a int de Python.
+    """
+    return item if isinstance(item, str) else operator.index(item)
+
+def save_atomic(obj, file_path):
+    """
+    Guarda un objeto con torch.save de forma atomica: se escribe en un archivo temporal
+    del mismo directorio y se renombra. Un fallo a mitad de escritura nunca deja un
+    archivo truncado en lugar de uno valido.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(file_path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            torch.save(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def index_path(model_path):
+    """Ruta del indice aproximado que acompaña a un modelo (mea_engine.pth -> mea_engine.ivf.npz)."""
+    return os.path.splitext(model_path)[0] + ".ivf.npz"
+
+# --- Formato mapeado en memoria ---
+# Un directorio con la configuracion, el vocabulario en texto plano y los embeddings como
+# arrays .npy sin comprimir. Al cargarlo, los embeddings se mapean en memoria: todos los
+# procesos que cargan el mismo modelo comparten una sola copia en la cache de paginas.
+MMAP_CONFIG = "config.json"
+MMAP_VOCAB = "vocab.txt"
+MMAP_EMBEDDINGS = "embeddings.npy"
+MMAP_NORMALIZED = "embeddings_normalized.npy"
+MMAP_SCALES = "scales.npy"
+MMAP_NGRAMS = "ngrams.npy"
+MMAP_INDEX = "index.ivf.npz"
 
 # --- 1. Vocabulario ---
 # Gestiona el mapeo de palabras a IDs numericos y viceversa.
@@ -29,6 +89,33 @@ class Vocabulary:
             self.add_word(word)
 
         # Segundo, asigna indices solo a las palabras que cumplen con min_count
+        self._assign_indices(min_count)
+
+    def build_from_counts(self, word_counts, min_count=5):
+        """
+        Construye el vocabulario a partir de frecuencias ya contadas
+        (por ejemplo, en una pasada en streaming sobre el corpus).
+        """
+        self.word_counts.update(word_counts)
+        self._assign_indices(min_count)
+
+    def update_counts(self, word_counts, min_count=1):
+        """
+        Suma nuevas frecuencias al vocabulario ya construido y añade al final las palabras
+        nuevas que alcanzan min_count (los indices existentes no cambian).
+        Devuelve la lista de palabras añadidas.
+        """
+        self.word_counts.update(word_counts)
+        new_words = []
+        for word in word_counts:
+            if word not in self.word2idx and self.word_counts[word] >= min_count:
+                self.idx2word.append(word)
+                self.word2idx[word] = len(self.idx2word) - 1
+                new_words.append(word)
+        return new_words
+
+    def _assign_indices(self, min_count):
+        """Asigna indices a las palabras que alcanzan la frecuencia minima."""
         for word, count in self.word_counts.items():
             if count >= min_count:
                 if word not in self.word2idx:
@@ -39,23 +126,141 @@ class Vocabulary:
         """Obtiene el indice de una palabra, o el de <UNK> si no existe."""
         return self.word2idx.get(word, 0)
 
+    def get_indices(self, words):
+        """Convierte una secuencia de palabras en un array de indices (<UNK> = 0) de una vez."""
+        get = self.word2idx.get
+        return np.fromiter((get(word, 0) for word in words), dtype=np.int64, count=len(words))
+
+    def counts_by_index(self):
+        """Devuelve la frecuencia de cada palabra del vocabulario, ordenada por indice."""
+        # <UNK> no tiene frecuencia propia: nunca se usa como objetivo ni como contexto
+        return [0] + [self.word_counts.get(word, 0) for word in self.idx2word[1:]]
+
+    def keep_probabilities(self, threshold=1e-3):
+        """
+        Probabilidad de conservar cada indice al submuestrear palabras frecuentes (word2vec):
+        p(w) = (sqrt(f(w) / t) + 1) * t / f(w), con f(w) la frecuencia relativa de w.
+        Se precalcula por indice para que decidir por token sea un simple indexado.
+        """
+        counts = np.asarray(self.counts_by_index(), dtype=np.float64)
+        keep = np.ones_like(counts)
+        seen = counts > 0
+        freq = counts[seen] / counts.sum()
+        keep[seen] = np.minimum((np.sqrt(freq / threshold) + 1) * threshold / freq, 1.0)
+        return keep
+
+    def to_text(self):
+        """Vocabulario como texto 'palabra<TAB>frecuencia' por linea, en orden de indice."""
+        return "".join(f"{word}\t{self.word_counts.get(word, 0)}\n" for word in self.idx2word)
+
+    @staticmethod
+    def from_file(file_path):
+        """Carga un vocabulario guardado con to_text (los indices son los numeros de linea)."""
+        vocab = Vocabulary()
+        vocab.idx2word = []
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                word, count = line.rstrip("\n").split("\t")
+                vocab.idx2word.append(word)
+                vocab.word_counts[word] = int(count)
+        vocab.word2idx = {word: i for i, word in enumerate(vocab.idx2word)}
+        vocab.word_counts.pop("<UNK>", None)
+        return vocab
+
     def __len__(self):
         return len(self.idx2word)
 
 # --- 2. Modelo Skip-gram ---
 # La arquitectura de red neuronal para aprender los embeddings.
+# Objetivos de entrenamiento soportados:
+#   - "softmax": softmax completo sobre el vocabulario (coste O(vocabulario) por paso).
+#   - "negative": muestreo negativo (coste O(negativos) por paso).
+OBJECTIVES = ("softmax", "negative")
+
 class SkipGramModel(nn.Module):
-    def __init__(self, vocab_size, embedding_dim):
+    def __init__(self, vocab_size, embedding_dim, objective="softmax", ngram_buckets=0):
         super(SkipGramModel, self).__init__()
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Objetivo de entrenamiento desconocido: '{objective}'.")
         self.vocab_size = vocab_size
         self.embedding_dim = embedding_dim
+        self.objective = objective
+        self.ngram_buckets = ngram_buckets
 
         # Capa de Embeddings: el corazon del modelo.
         # Cada fila es el vector de una palabra.
-        self.embeddings = nn.Embedding(vocab_size, embedding_dim)
+        # Con muestreo negativo los gradientes son dispersos: solo se tocan las filas del lote.
+        sparse = objective == "negative"
+        self.embeddings = nn.Embedding(vocab_size, embedding_dim, sparse=sparse)
+
+        if objective == "softmax":
+            # Capa de salida: proyecta el embedding para predecir palabras de contexto.
+            self.output_layer = nn.Linear(embedding_dim, vocab_size)
+        else:
+            # Matriz de embeddings de contexto, separada de la de palabras objetivo.
+            self.context_embeddings = nn.Embedding(vocab_size, embedding_dim, sparse=sparse)
+            # Inicializacion estilo word2vec: objetivos pequeños y contextos a cero
+            bound = 0.5 / embedding_dim
+            nn.init.uniform_(self.embeddings.weight, -bound, bound)
+            nn.init.zeros_(self.context_embeddings.weight)
+
+        if ngram_buckets:
+            # Modo subpalabra: tabla de n-gramas de caracteres (ver subword.py). El vector de
+            # entrada de una palabra es la media de su fila y las filas de sus n-gramas.
+            self.ngram_embeddings = nn.EmbeddingBag(ngram_buckets, embedding_dim, mode="sum", sparse=sparse)
+            nn.init.uniform_(self.ngram_embeddings.weight, -1.0 / embedding_dim, 1.0 / embedding_dim)
+            # N-gramas de cada palabra del vocabulario (CSR). Se recalculan al cargar: no se guardan
+            self.register_buffer("word_ngram_ids", torch.empty(0, dtype=torch.long), persistent=False)
+            self.register_buffer("word_ngram_offsets", torch.zeros(vocab_size + 1, dtype=torch.long), persistent=False)
 
-        # Capa de salida: proyecta el embedding para predecir palabras de contexto.
-        self.output_layer = nn.Linear(embedding_dim, vocab_size)
+    def set_word_ngrams(self, ngram_ids, ngram_offsets):
+        """Fija los n-gramas (CSR de word_ngram_ids) de las palabras del vocabulario."""
+        device = self.embeddings.weight.device
+        self.word_ngram_ids = torch.as_tensor(ngram_ids, dtype=torch.long).to(device)
+        self.word_ngram_offsets = torch.as_tensor(ngram_offsets, dtype=torch.long).to(device)
+
+    def input_vectors(self, target_word_idx):
+        """Vectores de entrada de un lote de palabras (con sus n-gramas en modo subpalabra)."""
+        word_vecs = self.embeddings(target_word_idx)
+        if not self.ngram_buckets:
+            return word_vecs
+        ngram_ids, bag_offsets, lengths = gather_ngrams(self.word_ngram_ids, self.word_ngram_offsets, target_word_idx)
+        ngram_sum = self.ngram_embeddings(ngram_ids, bag_offsets)
+        return (word_vecs + ngram_sum) / (1 + lengths).unsqueeze(1)
+
+    def word_vectors(self, block_size=65536):
+        """Vectores de entrada de todo el vocabulario, calculados por bloques."""
+        with torch.no_grad():
+            return torch.cat([
+                self.input_vectors(torch.arange(start, min(start + block_size, self.vocab_size),
+                                                device=self.embeddings.weight.device))
+                for start in range(0, self.vocab_size, block_size)])
+
+    def resize(self, vocab_size):
+        """
+        Amplia las matrices del modelo a un vocabulario mayor conservando las filas existentes.
+        Las filas nuevas se inicializan como en __init__.
+        """
+        old_size = self.vocab_size
+        if vocab_size <= old_size:
+            return
+        grown = SkipGramModel(vocab_size, self.embedding_dim, self.objective, self.ngram_buckets)
+        with torch.no_grad():
+            grown.embeddings.weight[:old_size] = self.embeddings.weight
+            if self.ngram_buckets:
+                grown.ngram_embeddings.weight.copy_(self.ngram_embeddings.weight)
+            if self.objective == "softmax":
+                grown.output_layer.weight[:old_size] = self.output_layer.weight
+                grown.output_layer.bias[:old_size] = self.output_layer.bias
+            else:
+                grown.context_embeddings.weight[:old_size] = self.context_embeddings.weight
+        # Sustituye los submodulos (y sus parametros) por los ampliados.
+        # En modo subpalabra hay que volver a fijar los n-gramas (set_word_ngrams)
+        for name, module in grown.named_children():
+            setattr(self, name, module)
+        for name, buffer in grown.named_buffers():
+            setattr(self, name, buffer)
+        self.vocab_size = vocab_size
 
     def forward(self, target_word_idx):
         """
@@ -63,7 +268,7 @@ class SkipGramModel(nn.Module):
         y predice la probabilidad de cada palabra del vocabulario de ser su contexto.
         """
         # Obtiene el vector embedding de la palabra objetivo
-        word_embedding = self.embeddings(target_word_idx)
+        word_embedding = self.input_vectors(target_word_idx)
         
         # Calcula los scores para cada palabra del vocabulario
         scores = self.output_layer(word_embedding)
@@ -71,60 +276,319 @@ class SkipGramModel(nn.Module):
         # Devuelve los scores (la funcion de perdida aplicara Softmax)
         return scores
 
+    def negative_sampling_loss(self, target_word_idx, context_word_idx, negative_word_idx):
+        """
+        Perdida de muestreo negativo: acerca cada par (objetivo, contexto) real
+        y aleja la palabra objetivo de los K contextos de ruido.
+        negative_word_idx tiene forma (lote, K).
+        """
+        target_vecs = self.input_vectors(target_word_idx)                # (B, d)
+        context_vecs = self.context_embeddings(context_word_idx)         # (B, d)
+        negative_vecs = self.context_embeddings(negative_word_idx)       # (B, K, d)
+
+        positive_score = F.logsigmoid((target_vecs * context_vecs).sum(dim=1))
+        negative_score = torch.bmm(negative_vecs, target_vecs.unsqueeze(2)).squeeze(2)
+        negative_score = F.logsigmoid(-negative_score).sum(dim=1)
+
+        return -(positive_score + negative_score).mean()
+
+class InferenceModel(nn.Module):
+    """
+    Modelo de solo inferencia: unicamente la matriz de embeddings, sin capa de salida
+    ni embeddings de contexto. Envuelve el tensor recibido sin copiarlo (por ejemplo,
+    un array mapeado en memoria) y no se puede entrenar.
+    """
+    def __init__(self, embeddings, objective="softmax"):
+        super(InferenceModel, self).__init__()
+        self.vocab_size, self.embedding_dim = embeddings.shape
+        self.objective = objective
+        self.embeddings = nn.Embedding.from_pretrained(embeddings, freeze=True)
+
+    def forward(self, target_word_idx):
+        return self.embeddings(target_word_idx)
+
+# --- Muestreo de ruido para el objetivo "negative" ---
+class NegativeSampler:
+    """
+    Tabla de ruido unigrama^0.75 (como en word2vec).
+    Muestrear K negativos es un simple indexado aleatorio en la tabla: O(K), no O(vocabulario).
+    """
+    def __init__(self, vocab, power=0.75, table_size=1_000_000):
+        counts = torch.tensor(vocab.counts_by_index(), dtype=torch.float64)
+        if counts.sum() <= 0:
+            raise ValueError("El vocabulario no tiene frecuencias para construir la tabla de ruido.")
+        probs = counts.pow(power)
+        probs /= probs.sum()
+
+        # Cada indice ocupa en la tabla un numero de celdas proporcional a su probabilidad
+        repeats = torch.round(probs * table_size).long()
+        repeats[1:] = torch.maximum(repeats[1:], (counts[1:] > 0).long())
+        self.table = torch.repeat_interleave(torch.arange(len(counts)), repeats)
+
+    def sample(self, batch_size, num_negatives, generator=None):
+        """Devuelve un tensor (batch_size, num_negatives) de indices de ruido."""
+        positions = torch.randint(len(self.table), (batch_size, num_negatives), generator=generator)
+        return self.table[positions]
+
 # --- 3. Motor Principal ---
 # Une el vocabulario y el modelo, y gestiona el guardado/carga.
 class MeaEngine:
-    def __init__(self, embedding_dim=100, min_word_count=5):
+    def __init__(self, embedding_dim=100, min_word_count=5, objective="softmax",
+                 ngram_buckets=0, min_n=3, max_n=6):
+        # ngram_buckets > 0 activa el modo subpalabra (n-gramas de caracteres con hashing)
         self.config = {
             "embedding_dim": embedding_dim,
-            "min_word_count": min_word_count
+            "min_word_count": min_word_count,
+            "objective": objective,
+            "ngram_buckets": ngram_buckets,
+            "min_n": min_n,
+            "max_n": max_n
         }
         self.vocab = None
         self.model = None
+        self.index = None
+        # Embeddings cuantizados (solo inferencia, ver save_mmap): sustituyen al modelo
+        self.quantized = None
+        # Tabla de n-gramas de un modelo de solo inferencia en modo subpalabra
+        self._ngram_weights = None
+        self._normalized_cache = None
+        # Cache LRU de vectores de frases (ver encode), por texto normalizado
+        self.sentence_cache_size = 10_000
+        self.idf = None
+        self._sentence_cache = OrderedDict()
+        self._sentence_cache_key = None
+        self._sentence_cache_lock = threading.Lock()
+
+    def __getstate__(self):
+        # El cerrojo no se puede copiar; la cache de frases no se copia (se recalcula)
+        state = self.__dict__.copy()
+        del state["_sentence_cache_lock"]
+        state["_sentence_cache"] = OrderedDict()
+        state["_sentence_cache_key"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._sentence_cache_lock = threading.Lock()
 
     def build(self, text_corpus):
         """Construye el vocabulario a partir de un corpus de texto."""
         print("Construyendo vocabulario...")
         self.vocab = Vocabulary()
-        # Tokenizacion simple: minusculas y division por espacios/puntuacion
-        words = re.findall(r'\b\w+\b', text_corpus.lower())
+        words = tokenize(text_corpus)
         self.vocab.build_vocab(words, self.config["min_word_count"])
-        print(f"Vocabulario construido con {len(self.vocab)} palabras unicas.")
+        self._init_model()
+
+    def build_from_counts(self, word_counts):
+        """Construye el vocabulario a partir de frecuencias precontadas (sin cargar el corpus)."""
+        print("Construyendo vocabulario a partir de frecuencias...")
+        self.vocab = Vocabulary()
+        self.vocab.build_from_counts(word_counts, self.config["min_word_count"])
+        self._init_model()
 
-        # Inicializa el modelo con el tamaño del vocabulario
+    def _init_model(self):
+        """Inicializa el modelo con el tamaño del vocabulario."""
+        print(f"Vocabulario construido con {len(self.vocab)} palabras unicas.")
         self.model = SkipGramModel(
             vocab_size=len(self.vocab),
-            embedding_dim=self.config["embedding_dim"]
+            embedding_dim=self.config["embedding_dim"],
+            objective=self.config["objective"],
+            ngram_buckets=self.config["ngram_buckets"]
         )
+        self._refresh_word_ngrams()
+
+    def _refresh_word_ngrams(self):
+        """Recalcula los n-gramas de las palabras del vocabulario (solo en modo subpalabra)."""
+        if not self.config["ngram_buckets"] or not isinstance(self.model, SkipGramModel):
+            return
+        # <UNK> no tiene n-gramas
+        ngram_ids, offsets = self._word_ngrams(self.vocab.idx2word[1:])
+        self.model.set_word_ngrams(ngram_ids, np.concatenate([[0], offsets]))
+
+    def _word_ngrams(self, words):
+        """N-gramas (CSR) de una lista de palabras con la configuracion del motor."""
+        return word_ngram_ids(words, self.config["ngram_buckets"], self.config["min_n"], self.config["max_n"])
+
+    def update_online(self, texts, epochs=2, window_size=2, learning_rate=0.025, num_negatives=5,
+                      batch_size=1024, min_count=1, seed=None):
+        """
+        Actualizacion incremental con texto nuevo (por ejemplo, hechos recien aprendidos),
+        sin reentrenar sobre el corpus completo: amplia el vocabulario y las matrices del
+        modelo con las palabras nuevas y da unas pocas pasadas de SGD solo sobre los pares
+        de ese texto. Las ventanas no cruzan de un texto a otro.
+        Si habia un indice aproximado, solo se reemplazan en sus listas los vectores de las
+        palabras que han cambiado (los centroides no se reentrenan).
+        Devuelve {"new_words": [...], "pairs": int, "loss": float o None}.
+        """
+        if not isinstance(self.model, SkipGramModel) or not self.vocab:
+            raise Exception("Las actualizaciones en linea requieren un modelo entrenable (cargado desde .pth).")
+        # Importacion local: corpus importa tokenize de este modulo
+        from corpus import skipgram_pairs
+
+        if isinstance(texts, str):
+            texts = [texts]
+        token_lists = [tokenize(text) for text in texts]
+        old_size = len(self.vocab)
+        new_words = self.vocab.update_counts(Counter(token for tokens in token_lists for token in tokens), min_count)
+        self.model.resize(len(self.vocab))
+        if new_words:
+            self._refresh_word_ngrams()
+
+        pairs = [skipgram_pairs(self.vocab.get_indices(tokens), window_size) for tokens in token_lists if tokens]
+        stats = {"new_words": new_words, "pairs": sum(len(targets) for targets, _ in pairs), "loss": None}
+        trained = np.empty(0, dtype=np.int64)
+        if stats["pairs"] > 0:
+            targets = torch.from_numpy(np.concatenate([targets for targets, _ in pairs]))
+            contexts = torch.from_numpy(np.concatenate([contexts for _, contexts in pairs]))
+            generator = torch.Generator().manual_seed(seed) if seed is not None else None
+            sampler = NegativeSampler(self.vocab) if self.config["objective"] == "negative" else None
+            criterion = nn.CrossEntropyLoss()
+            # SGD simple: admite los gradientes dispersos del objetivo "negative"
+            optimizer = torch.optim.SGD(self.model.parameters(), lr=learning_rate)
+
+            self.model.train()
+            total_loss, num_batches = 0.0, 0
+            for _ in range(epochs):
+                order = torch.randperm(len(targets), generator=generator)
+                for start in range(0, len(order), batch_size):
+                    batch = order[start:start + batch_size]
+                    optimizer.zero_grad()
+                    if sampler is not None:
+                        negatives = sampler.sample(len(batch), num_negatives, generator=generator)
+                        loss = self.model.negative_sampling_loss(targets[batch], contexts[batch], negatives)
+                    else:
+                        loss = criterion(self.model(targets[batch]), contexts[batch])
+                    loss.backward()
+                    optimizer.step()
+                    total_loss += loss.item()
+                    num_batches += 1
+            self.model.eval()
+            stats["loss"] = total_loss / num_batches
+            trained = np.unique(targets.numpy())
+
+        if self.index is not None:
+            changed = self._changed_words(trained, old_size)
+            with torch.no_grad():
+                vectors = self.model.input_vectors(torch.from_numpy(changed)).cpu().numpy()
+            self.index.remove(changed).add(vectors, changed)
+        return stats
+
+    def _changed_words(self, trained, old_size):
+        """
+        Indices (sin <UNK>) cuyos vectores de entrada han cambiado en una actualizacion:
+        las palabras nuevas, las entrenadas como objetivo y, en modo subpalabra, las que
+        comparten algun n-grama con estas.
+        """
+        changed = np.union1d(trained, np.arange(old_size, len(self.vocab)))
+        if self.config["ngram_buckets"] and len(trained):
+            ngram_ids = self.model.word_ngram_ids.cpu().numpy()
+            offsets = self.model.word_ngram_offsets.cpu().numpy()
+            owner = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+            touched = np.concatenate([ngram_ids[offsets[i]:offsets[i + 1]] for i in trained])
+            changed = np.union1d(changed, owner[np.isin(ngram_ids, touched)])
+        return changed[changed > 0]
+
+    def copy_for_update(self):
+        """
+        Copia del motor para actualizarla con update_online mientras el original sigue
+        respondiendo consultas. Solo se copian el vocabulario y los tensores del modelo
+        (que el entrenamiento modifica in-place); las listas del indice se comparten
+        (update_online las sustituye, no las modifica) y las caches no se copian.
+        """
+        if not isinstance(self.model, SkipGramModel) or not self.vocab:
+            raise Exception("Las actualizaciones en linea requieren un modelo entrenable (cargado desde .pth).")
+        # copy.copy pasa por __getstate__: cerrojo nuevo y cache de frases vacia
+        updated = copy.copy(self)
+        updated._normalized_cache = None
+        updated.config = dict(self.config)
+        updated.vocab = Vocabulary()
+        updated.vocab.word2idx = dict(self.vocab.word2idx)
+        updated.vocab.idx2word = list(self.vocab.idx2word)
+        updated.vocab.word_counts = Counter(self.vocab.word_counts)
+        updated.model = copy.deepcopy(self.model)
+        updated.index = self.index.copy() if self.index is not None else None
+        return updated
 
     def get_trained_embeddings(self):
-        """Devuelve la matriz de embeddings entrenada."""
+        """
+        Devuelve la matriz de embeddings entrenada.
+        Con embeddings cuantizados devuelve una copia float32 (ya normalizada) de los mismos.
+        """
         if self.model:
+            if getattr(self.model, "ngram_buckets", 0):
+                # Modo subpalabra: el vector de cada palabra incluye sus n-gramas
+                return self.model.word_vectors()
             # .weight contiene la matriz de embeddings
             return self.model.embeddings.weight.data
+        if self.quantized is not None:
+            return torch.from_numpy(self.quantized.rows(slice(None)))
         return None
 
-    def find_similar_words(self, word, top_n=10):
+    def _is_loaded(self):
+        """Indica si hay vocabulario y embeddings (modelo o version cuantizada) con los que consultar."""
+        return bool(self.vocab) and (self.model is not None or self.quantized is not None)
+
+    def _query_vectors(self, query_ids):
+        """Vectores normalizados de las palabras indicadas (por indice)."""
+        if self.quantized is not None:
+            return torch.from_numpy(self.quantized.rows(query_ids))
+        return self.get_normalized_embeddings()[query_ids]
+
+    def _score_vectors(self, query_vectors):
+        """Similitud de coseno de vectores normalizados (consultas, d) contra todo el vocabulario."""
+        if self.quantized is not None:
+            # Se puntua directamente sobre la representacion cuantizada, por bloques
+            return torch.from_numpy(self.quantized.scores(query_vectors.numpy()))
+        return query_vectors @ self.get_normalized_embeddings().T
+
+    def _similarity_scores(self, query_ids):
+        """Similitud de coseno de las palabras indicadas contra todo el vocabulario: (consultas, vocabulario)."""
+        return self._score_vectors(self._query_vectors(query_ids))
+
+    def _ngram_table(self):
+        """Tabla de embeddings de n-gramas (None si el motor no esta en modo subpalabra)."""
+        if isinstance(self.model, SkipGramModel) and self.model.ngram_buckets:
+            return self.model.ngram_embeddings.weight.data
+        return self._ngram_weights
+
+    def _oov_vector(self, word):
+        """
+        Vector normalizado de una palabra fuera del vocabulario, compuesto por sus n-gramas.
+        None si el motor no esta en modo subpalabra o la palabra no tiene n-gramas.
+        """
+        table = self._ngram_table()
+        if table is None:
+            return None
+        ngram_ids, _ = self._word_ngrams([word.lower()])
+        if len(ngram_ids) == 0:
+            return None
+        vector = table[torch.from_numpy(ngram_ids)].float().mean(dim=0)
+        return F.normalize(vector, p=2, dim=0)
+
+    def find_similar_words(self, word, top_n=10, exact=False):
         """
         Encuentra las palabras mas similares a una dada usando similitud de coseno.
+        Si hay un indice aproximado construido (build_index) se usa, salvo con exact=True.
         """
-        if not self.model or not self.vocab:
+        if not self._is_loaded():
             raise Exception("El modelo no ha sido entrenado o cargado.")
 
         word_idx = self.vocab.get_index(word.lower())
         if word_idx == 0: # <UNK>
-            print(f"La palabra '{word}' no se encuentra en el vocabulario.")
-            return []
+            # En modo subpalabra las palabras desconocidas se componen con sus n-gramas
+            word_vec = self._oov_vector(word)
+            if word_vec is None:
+                print(f"La palabra '{word}' no se encuentra en el vocabulario.")
+                return []
+        else:
+            word_vec = self._query_vectors([word_idx])[0]
 
-        # Normaliza todos los embeddings para el calculo de similitud de coseno
-        embeddings = self.get_trained_embeddings()
-        embeddings_norm = F.normalize(embeddings, p=2, dim=1)
-        
-        # Obtiene el embedding de la palabra de interes
-        word_vec = embeddings_norm[word_idx]
+        if self.index is not None and not exact:
+            ids, scores = self.index.search(word_vec.cpu().numpy(), k=top_n, exclude=word_idx or None)
+            return [(self.vocab.idx2word[idx], float(score)) for idx, score in zip(ids, scores)]
 
         # Calcula la similitud de coseno (producto punto con vectores normalizados)
-        cosine_sim = torch.matmul(embeddings_norm, word_vec)
+        cosine_sim = self._score_vectors(word_vec.unsqueeze(0))[0]
 
         # Obtiene los indices y scores de las N palabras mas similares
         # El resultado incluye la propia palabra, por lo que pedimos top_n + 1
@@ -136,42 +600,438 @@ class MeaEngine:
             if idx.item() != word_idx:
                 similar_words.append((self.vocab.idx2word[idx.item()], score.item()))
         
-        return similar_words
+        return similar_words[:top_n]
 
-    def save_model(self, file_path):
-        """Guarda el motor (config, vocabulario, pesos del modelo) en un archivo."""
+    def get_normalized_embeddings(self):
+        """
+        Devuelve la matriz de embeddings normalizada (norma L2 = 1 por fila).
+        Se calcula una sola vez y se reutiliza mientras los pesos no cambien.
+        """
+        if self.model is None and self.quantized is not None:
+            # Los embeddings cuantizados ya se guardan normalizados
+            return self.get_trained_embeddings()
+        key = self._embeddings_version()
+        if self._normalized_cache is None or self._normalized_cache[0] != key:
+            self._normalized_cache = (key, F.normalize(self.get_trained_embeddings(), p=2, dim=1))
+        return self._normalized_cache[1]
+
+    def _embeddings_version(self):
+        """Identifica el estado actual de los pesos de los embeddings."""
+        parameters = [self.model.embeddings.weight]
+        if getattr(self.model, "ngram_buckets", 0):
+            parameters.append(self.model.ngram_embeddings.weight)
+        # _version del parametro cambia con cada modificacion in-place (entrenamiento)
+        return tuple((p.data_ptr(), p._version, tuple(p.shape)) for p in parameters)
+
+    def find_similar_words_batch(self, words, top_n=10, max_scores=16_000_000):
+        """
+        Encuentra las palabras mas similares para una lista de palabras (o indices) a la vez,
+        con un producto matriz-matriz y un unico topk por bloque de consultas.
+        Devuelve {"results": {consulta: [(palabra, score), ...]}, "oov": [consultas desconocidas]}.
+        max_scores limita el tamaño de la matriz de scores (consultas x vocabulario) por bloque.
+        """
+        if not self._is_loaded():
+            raise Exception("El modelo no ha sido entrenado o cargado.")
+
+        # En modo subpalabra las palabras desconocidas se consultan con su vector de n-gramas
+        queries, query_ids, oov_vectors, oov = [], [], {}, []
+        for item in map(query_key, words):
+            idx = self.vocab.get_index(item.lower()) if isinstance(item, str) else item
+            if 0 < idx < len(self.vocab):
+                queries.append(item)
+                query_ids.append(idx)
+                continue
+            vector = self._oov_vector(item) if isinstance(item, str) else None
+            if vector is None:
+                oov.append(item)
+            else:
+                queries.append(item)
+                query_ids.append(0)
+                oov_vectors[len(queries) - 1] = vector
+
+        results = {}
+        if query_ids:
+            vocab_size = len(self.vocab)
+            k = min(top_n, vocab_size - 1)
+            block = max(1, max_scores // vocab_size)
+            ids = torch.tensor(query_ids)
+
+            for start in range(0, len(ids), block):
+                block_ids = ids[start:start + block]
+                vectors = self._query_vectors(block_ids)
+                for row in range(len(block_ids)):
+                    if start + row in oov_vectors:
+                        vectors[row] = oov_vectors[start + row]
+                scores = self._score_vectors(vectors)
+                # La propia palabra no cuenta como similar a si misma
+                in_vocab = block_ids > 0
+                scores[torch.arange(len(block_ids))[in_vocab], block_ids[in_vocab]] = float("-inf")
+                top = torch.topk(scores, k=k, dim=1)
+                for row, query in enumerate(queries[start:start + block]):
+                    results[query] = [(self.vocab.idx2word[idx], score)
+                                      for idx, score in zip(top.indices[row].tolist(), top.values[row].tolist())]
+
+        return {"results": results, "oov": oov}
+
+    def get_word_vectors(self, words):
+        """
+        Vectores normalizados de una lista de palabras: devuelve (matriz float32 (n, d), mascara).
+        La mascara indica las palabras con vector; las desconocidas (salvo en modo subpalabra)
+        quedan a cero.
+        """
+        if not self._is_loaded():
+            raise Exception("El modelo no ha sido entrenado o cargado.")
+        ids = torch.from_numpy(self.vocab.get_indices([word.lower() for word in words]))
+        vectors = torch.zeros(len(words), self.config["embedding_dim"])
+        found = ids > 0
+        if found.any():
+            vectors[found] = self._query_vectors(ids[found]).float()
+        for position in torch.nonzero(~found).flatten().tolist():
+            vector = self._oov_vector(words[position])
+            if vector is not None:
+                vectors[position] = vector
+                found[position] = True
+        return vectors, found
+
+    def find_similar_vectors(self, vectors, top_n=10, exclude=None):
+        """
+        Palabras mas similares (por coseno) a cada vector de una matriz (n, d), en una sola
+        operacion por lotes. exclude es, opcionalmente, una lista con los indices a omitir
+        para cada fila. Devuelve (indices, scores), tensores (n, top_n).
+        """
+        vectors = F.normalize(torch.as_tensor(vectors, dtype=torch.float32), p=2, dim=1)
+        scores = self._score_vectors(vectors)
+        if exclude is not None:
+            rows = [row for row, ids in enumerate(exclude) for _ in ids]
+            columns = [idx for ids in exclude for idx in ids]
+            scores[rows, columns] = float("-inf")
+        top = torch.topk(scores, k=min(top_n, scores.size(1)), dim=1)
+        return top.indices, top.values
+
+    def fit_idf(self, documents):
+        """
+        Calcula el IDF de cada palabra del vocabulario sobre una coleccion de documentos
+        (por ejemplo, los hechos de la base de conocimiento), para encode(..., idf=True).
+        idf(w) = log((1 + N) / (1 + df(w))) + 1; las palabras que no aparecen reciben el maximo.
+        """
+        document_frequency = np.zeros(len(self.vocab), dtype=np.float64)
+        for document in documents:
+            document_frequency[np.unique(self.vocab.get_indices(tokenize(document)))] += 1
+        self.idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.idf[0] = 0.0  # <UNK> no aporta (salvo en modo subpalabra, ver encode)
+        self.clear_sentence_cache()
+        return self.idf
+
+    def clear_sentence_cache(self):
+        """Vacia la cache de vectores de frases."""
+        with self._sentence_cache_lock:
+            self._sentence_cache.clear()
+
+    def encode(self, texts, idf=False, normalize=True):
+        """
+        Codifica frases o documentos como la media (opcionalmente ponderada por IDF, ver
+        fit_idf) de los vectores normalizados de sus palabras. Devuelve una matriz float32
+        (textos, embedding_dim); un texto sin palabras conocidas da un vector nulo.
+        Las palabras desconocidas se ignoran, salvo en modo subpalabra (vector de n-gramas).
+        Los textos se tokenizan y agregan por lotes, y los resultados se guardan en una cache
+        LRU por texto normalizado que se invalida si cambian los pesos o el IDF.
+        """
+        if not self._is_loaded():
+            raise Exception("El modelo no ha sido entrenado o cargado.")
+        if idf and self.idf is None:
+            raise Exception("No hay IDF calculado. Llama primero a fit_idf.")
+        if isinstance(texts, str):
+            texts = [texts]
+
+        keys = [(" ".join(tokenize(text)), idf, normalize) for text in texts]
+        weights_key = self._embeddings_version() if self.model is not None else id(self.quantized)
+        with self._sentence_cache_lock:
+            if self._sentence_cache_key != weights_key:
+                self._sentence_cache.clear()
+                self._sentence_cache_key = weights_key
+            cached = {key: self._sentence_cache[key] for key in dict.fromkeys(keys) if key in self._sentence_cache}
+            for key in cached:
+                self._sentence_cache.move_to_end(key)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in cached]
+        if missing:
+            vectors = self._pool_word_vectors([key[0].split() for key in missing], idf, normalize)
+            computed = dict(zip(missing, vectors))
+            cached.update(computed)
+            with self._sentence_cache_lock:
+                self._sentence_cache.update(computed)
+                while len(self._sentence_cache) > self.sentence_cache_size:
+                    self._sentence_cache.popitem(last=False)
+
+        if not keys:
+            return np.zeros((0, self.config["embedding_dim"]), dtype=np.float32)
+        return np.stack([cached[key] for key in keys])
+
+    def _pool_word_vectors(self, token_lists, idf, normalize):
+        """Media (ponderada) de los vectores de palabras de cada lista de tokens, en una sola pasada."""
+        lengths = torch.tensor([len(tokens) for tokens in token_lists], dtype=torch.long)
+        tokens = [token for token_list in token_lists for token in token_list]
+        ids = torch.from_numpy(self.vocab.get_indices(tokens))
+        dim = self.config["embedding_dim"]
+
+        vectors = torch.zeros(len(tokens), dim)
+        known = ids > 0
+        if known.any():
+            vectors[known] = self._query_vectors(ids[known]).float()
+        weights = known.float()
+        if not known.all() and self._ngram_table() is not None:
+            # Modo subpalabra: un vector por palabra desconocida distinta
+            unknown_positions = torch.nonzero(~known).flatten().tolist()
+            oov_vectors = {word: self._oov_vector(word) for word in {tokens[p] for p in unknown_positions}}
+            for position in unknown_positions:
+                vector = oov_vectors[tokens[position]]
+                if vector is not None:
+                    vectors[position] = vector
+                    weights[position] = 1.0
+        if idf:
+            idf_weights = torch.from_numpy(self.idf)[ids]
+            # Las palabras desconocidas con vector de n-gramas reciben el IDF maximo
+            idf_weights[~known] = float(self.idf[1:].max()) if len(self.idf) > 1 else 1.0
+            weights = weights * idf_weights
+
+        owner = torch.repeat_interleave(torch.arange(len(token_lists)), lengths)
+        sums = torch.zeros(len(token_lists), dim).index_add_(0, owner, vectors * weights.unsqueeze(1))
+        totals = torch.zeros(len(token_lists)).index_add_(0, owner, weights)
+        pooled = sums / totals.clamp(min=1e-12).unsqueeze(1)
+        if normalize:
+            pooled = F.normalize(pooled, p=2, dim=1)
+        return pooled.numpy().astype(np.float32)
+
+    def build_index(self, nlist=None, nprobe=8, block_rows=65536):
+        """
+        Construye un indice aproximado (IVF-flat) sobre los embeddings entrenados.
+        Se construye una sola vez; find_similar_words lo usa a partir de ese momento.
+        Con embeddings cuantizados, las listas guardan los vectores con la misma precision
+        y se construyen leyendo la matriz por bloques, sin una copia float32 completa.
+        """
+        if self.quantized is not None:
+            rows, dtype, count = self.quantized.rows, self.quantized.dtype, self.quantized.shape[0]
+        else:
+            vectors = self.get_trained_embeddings().cpu().numpy()
+            rows, dtype, count = (lambda ids: vectors[ids]), "float32", len(vectors)
+        # <UNK> no forma parte del indice. k-means solo necesita una muestra de las filas
+        nlist = min(nlist or max(1, int(np.sqrt(count - 1))), count - 1)
+        sample = np.random.default_rng(0).choice(np.arange(1, count), min(count - 1, nlist * 256), replace=False)
+        self.index = IVFIndex(nlist=nlist, nprobe=nprobe, dtype=dtype).train(rows(np.sort(sample)))
+        for start in range(1, count, block_rows):
+            ids = np.arange(start, min(start + block_rows, count))
+            self.index.add(rows(ids), ids)
+        print(f"Indice IVF construido: {self.index.nlist} listas, nprobe={self.index.nprobe}.")
+        return self.index
+
+    def index_recall(self, k=10, num_queries=200, seed=0):
+        """Mide el recall@k del indice aproximado frente a la busqueda exacta."""
+        if self.index is None:
+            raise Exception("No hay indice aproximado. Llama primero a build_index.")
+        rng = np.random.default_rng(seed)
+        vocab_size = len(self.vocab)
+        query_ids = rng.choice(np.arange(1, vocab_size), min(num_queries, vocab_size - 1), replace=False)
+
+        query_vecs = self.get_normalized_embeddings()[torch.from_numpy(query_ids)]
+        exact_scores = self._similarity_scores(torch.from_numpy(query_ids))
+        exact_scores[:, 0] = float("-inf")  # <UNK> no esta en el indice
+        exact_scores[torch.arange(len(query_ids)), torch.from_numpy(query_ids)] = float("-inf")
+        exact_ids = torch.topk(exact_scores, k=min(k, vocab_size - 2), dim=1).indices.numpy()
+
+        approx_ids = [self.index.search(vec, k=k, exclude=idx)[0]
+                      for vec, idx in zip(query_vecs.numpy(), query_ids)]
+        return recall_at_k(approx_ids, exact_ids)
+
+    def tune_index(self, target_recall=0.95, k=10, num_queries=200):
+        """Aumenta nprobe hasta alcanzar el recall@k objetivo. Devuelve el recall final."""
+        recall = self.index_recall(k, num_queries)
+        while recall < target_recall and self.index.nprobe < self.index.nlist:
+            self.index.nprobe = min(self.index.nprobe * 2, self.index.nlist)
+            recall = self.index_recall(k, num_queries)
+        return recall
+
+    def to_dict(self):
+        """Serializa el motor (config, vocabulario, pesos del modelo) en un diccionario."""
         if not self.model or not self.vocab:
             raise Exception("No hay nada que guardar. Entrena el modelo primero.")
-        
-        model_data = {
+        if isinstance(self.model, InferenceModel) or self.quantized is not None:
+            raise Exception("Un modelo de solo inferencia no se puede guardar como .pth; usa save_mmap.")
+
+        return {
             "config": self.config,
             "word2idx": self.vocab.word2idx,
             "idx2word": self.vocab.idx2word,
+            "word_counts": {word: self.vocab.word_counts.get(word, 0) for word in self.vocab.idx2word},
             "model_state_dict": self.model.state_dict()
         }
-        torch.save(model_data, file_path)
+
+    def save_model(self, file_path):
+        """
+        Guarda el motor (config, vocabulario, pesos del modelo) en un archivo.
+        El indice aproximado, si existe, se guarda al lado (ver index_path).
+        """
+        save_atomic(self.to_dict(), file_path)
+        index_file = index_path(file_path)
+        if self.index is not None:
+            self.index.save(index_file)
+        elif os.path.exists(index_file):
+            # Un indice de un modelo anterior ya no corresponde a estos pesos
+            os.remove(index_file)
+            print(f"Indice obsoleto eliminado: {index_file}")
         print(f"Modelo guardado en {file_path}")
 
+    def save_mmap(self, directory, dtype="float32"):
+        """
+        Guarda el motor en el formato mapeado en memoria (un directorio, ver MMAP_*).
+        Solo se guardan los embeddings de palabras: el modelo cargado es de solo inferencia.
+        Tambien se guarda la matriz normalizada, que es la que usan las consultas de similitud.
+        Con dtype "float16" o "int8" (escala por fila) solo se guarda la matriz normalizada
+        cuantizada, y las consultas se resuelven directamente sobre ella.
+        """
+        if not self._is_loaded():
+            raise Exception("No hay nada que guardar. Entrena el modelo primero.")
+        if dtype != "float32" and dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Tipo de almacenamiento desconocido: '{dtype}'.")
+        os.makedirs(directory, exist_ok=True)
+
+        normalized = self.get_normalized_embeddings().cpu().numpy().astype(np.float32)
+        files = {
+            MMAP_VOCAB: lambda f: f.write(self.vocab.to_text().encode("utf-8")),
+            MMAP_CONFIG: lambda f: f.write(json.dumps(
+                dict(self.config, vocab_size=len(self.vocab), dtype=dtype), indent=2).encode("utf-8")),
+        }
+        if dtype == "float32":
+            embeddings = self.get_trained_embeddings().cpu().numpy().astype(np.float32)
+            files[MMAP_EMBEDDINGS] = lambda f: np.save(f, embeddings)
+            files[MMAP_NORMALIZED] = lambda f: np.save(f, normalized)
+        else:
+            quantized = QuantizedEmbeddings.from_vectors(normalized, dtype)
+            files[MMAP_NORMALIZED] = lambda f: np.save(f, quantized.codes)
+            if quantized.scales is not None:
+                files[MMAP_SCALES] = lambda f: np.save(f, quantized.scales)
+        ngram_table = self._ngram_table()
+        if ngram_table is not None:
+            # En los formatos cuantizados la tabla de n-gramas se guarda en float16
+            ngram_dtype = np.float32 if dtype == "float32" else np.float16
+            ngram_table = ngram_table.cpu().numpy().astype(ngram_dtype)
+            files[MMAP_NGRAMS] = lambda f: np.save(f, ngram_table)
+
+        # Los archivos se escriben con nombre temporal y se renombran al final
+        for name, write in files.items():
+            file_path = os.path.join(directory, name)
+            with open(file_path + ".tmp", "wb") as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(file_path + ".tmp", file_path)
+        # Archivos de un guardado anterior con otro tipo ya no corresponden a este modelo
+        for name in (MMAP_EMBEDDINGS, MMAP_SCALES, MMAP_NGRAMS):
+            if name not in files and os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+
+        index_file = os.path.join(directory, MMAP_INDEX)
+        if self.index is not None:
+            # El indice se guarda con la misma precision que los embeddings exportados
+            index = self.index if self.index.dtype == dtype else self.index.astype(dtype)
+            index.save(index_file)
+        elif os.path.exists(index_file):
+            os.remove(index_file)
+        print(f"Modelo guardado (formato mapeado en memoria, {dtype}) en {directory}")
+
     @staticmethod
-    def load_model(file_path):
-        """Carga un motor pre-entrenado desde un archivo."""
-        model_data = torch.load(file_path)
-        
+    def load_mmap(directory):
+        """
+        Carga un motor guardado con save_mmap. Los embeddings se mapean en memoria en
+        modo copia-en-escritura: no se leen hasta que se usan y, mientras no se modifiquen,
+        todos los procesos comparten las mismas paginas.
+        """
+        with open(os.path.join(directory, MMAP_CONFIG), encoding="utf-8") as f:
+            config = json.load(f)
+        engine = MeaEngine._from_config(config)
+
+        engine.vocab = Vocabulary.from_file(os.path.join(directory, MMAP_VOCAB))
+        expected_shape = (len(engine.vocab), config["embedding_dim"])
+
+        normalized_file = os.path.join(directory, MMAP_NORMALIZED)
+        if config.get("dtype", "float32") != "float32":
+            scales_file = os.path.join(directory, MMAP_SCALES)
+            scales = np.load(scales_file, mmap_mode="c") if os.path.exists(scales_file) else None
+            engine.quantized = QuantizedEmbeddings(np.load(normalized_file, mmap_mode="c"), scales)
+            if engine.quantized.shape != expected_shape:
+                raise Exception(f"Los embeddings de {directory} no coinciden con su vocabulario y configuracion.")
+        else:
+            embeddings = torch.from_numpy(np.load(os.path.join(directory, MMAP_EMBEDDINGS), mmap_mode="c"))
+            if embeddings.shape != expected_shape:
+                raise Exception(f"Los embeddings de {directory} no coinciden con su vocabulario y configuracion.")
+            engine.model = InferenceModel(embeddings, objective=engine.config["objective"])
+            engine.model.eval()
+
+            # La matriz normalizada tambien se mapea: get_normalized_embeddings no hace copia propia
+            if os.path.exists(normalized_file):
+                normalized = torch.from_numpy(np.load(normalized_file, mmap_mode="c"))
+                engine._normalized_cache = (engine._embeddings_version(), normalized)
+
+        # Tabla de n-gramas del modo subpalabra (para consultar palabras desconocidas)
+        ngrams_file = os.path.join(directory, MMAP_NGRAMS)
+        if engine.config["ngram_buckets"] and os.path.exists(ngrams_file):
+            engine._ngram_weights = torch.from_numpy(np.load(ngrams_file, mmap_mode="c"))
+
+        if os.path.exists(os.path.join(directory, MMAP_INDEX)):
+            engine.index = IVFIndex.load(os.path.join(directory, MMAP_INDEX))
+        return engine
+
+    @staticmethod
+    def _from_config(config):
+        """
+        Crea un motor vacio con una configuracion guardada. Los modelos antiguos no guardaban
+        el objetivo (eran siempre "softmax") ni las opciones del modo subpalabra (desactivado).
+        """
+        return MeaEngine(
+            embedding_dim=config["embedding_dim"],
+            min_word_count=config.get("min_word_count", 5),
+            objective=config.get("objective", "softmax"),
+            ngram_buckets=config.get("ngram_buckets", 0),
+            min_n=config.get("min_n", 3),
+            max_n=config.get("max_n", 6)
+        )
+
+    @staticmethod
+    def from_dict(model_data):
+        """Reconstruye un motor a partir del diccionario generado por to_dict."""
         # Reconstruye el motor con la configuracion guardada
-        engine = MeaEngine(embedding_dim=model_data["config"]["embedding_dim"])
+        engine = MeaEngine._from_config(model_data["config"])
         
         # Reconstruye el vocabulario
         engine.vocab = Vocabulary()
         engine.vocab.word2idx = model_data["word2idx"]
         engine.vocab.idx2word = model_data["idx2word"]
+        engine.vocab.word_counts = Counter(model_data.get("word_counts", {}))
         
         # Reconstruye el modelo y carga los pesos
         engine.model = SkipGramModel(
             vocab_size=len(engine.vocab),
-            embedding_dim=engine.config["embedding_dim"]
+            embedding_dim=engine.config["embedding_dim"],
+            objective=engine.config["objective"],
+            ngram_buckets=engine.config["ngram_buckets"]
         )
         engine.model.load_state_dict(model_data["model_state_dict"])
+        engine._refresh_word_ngrams()
         engine.model.eval() # Pone el modelo en modo de evaluacion
-        
+        return engine
+
+    @staticmethod
+    def load_model(file_path):
+        """
+        Carga un motor pre-entrenado desde un archivo .pth o desde un directorio
+        en formato mapeado en memoria (ver save_mmap).
+        """
+        if os.path.isdir(file_path):
+            engine = MeaEngine.load_mmap(file_path)
+            print(f"Modelo cargado (mapeado en memoria) desde {file_path}")
+            return engine
+        model_data = torch.load(file_path)
+        engine = MeaEngine.from_dict(model_data)
+        if os.path.exists(index_path(file_path)):
+            engine.index = IVFIndex.load(index_path(file_path))
         print(f"Modelo cargado desde {file_path}")
         return engine
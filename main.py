@@ -96,7 +96,10 @@ def main():
         logging.info("--- Entorno verificado. Iniciando IA... ---")
         from bots.cli_bot import CliBot
         bot = CliBot()
-        bot.run()
+        try:
+            bot.run()
+        finally:
+            bot.close()
 
     except FileNotFoundError as e:
         logging.error(f"Archivo crítico no encontrado: {e}. Asegúrate de que todos los archivos de configuración y datos estén en su lugar.")
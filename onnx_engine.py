@@ -0,0 +1,138 @@
+import json
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from engine import Vocabulary, MMAP_CONFIG, MMAP_VOCAB, query_key
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# --- Inferencia de similitud con ONNX Runtime ---
+# Se exporta el mismo calculo que MeaEngine.find_similar_words sobre la matriz normalizada:
+# busqueda de los vectores de las palabras (Gather), similitud de coseno contra todo el
+# vocabulario (MatMul) y las top_k mejores (TopK). La matriz normalizada va como constante
+# dentro del grafo, asi que la sesion de onnxruntime no necesita PyTorch para consultar.
+# Un modelo exportado es un directorio con el grafo, el vocabulario y la configuracion.
+
+ONNX_GRAPH = "similarity.onnx"
+ONNX_OPSET = 17
+
+class SimilarityGraph(nn.Module):
+    """Grafo exportable: indices de palabras (q,) -> (scores, indices) de sus top_k vecinos."""
+
+    def __init__(self, normalized_embeddings, top_k):
+        super().__init__()
+        self.register_buffer("normalized", normalized_embeddings.detach().float().contiguous())
+        self.top_k = min(top_k, normalized_embeddings.size(0))
+
+    def forward(self, word_ids):
+        queries = self.normalized[word_ids]
+        scores = queries @ self.normalized.T
+        return torch.topk(scores, k=self.top_k, dim=1)
+
+def export_onnx(engine, directory, top_k=51, opset_version=ONNX_OPSET):
+    """
+    Exporta el grafo de similitud de un MeaEngine a un directorio (ver ONNX_GRAPH).
+    top_k fija cuantos vecinos calcula el grafo; una consulta admite top_n < top_k
+    (el resultado incluye la propia palabra, que se descarta).
+    """
+    if not engine._is_loaded():
+        raise Exception("No hay nada que exportar. Entrena el modelo primero.")
+    if engine.quantized is not None:
+        raise Exception("La exportacion a ONNX necesita los embeddings en float32, no un modelo cuantizado.")
+    os.makedirs(directory, exist_ok=True)
+
+    graph = SimilarityGraph(engine.get_normalized_embeddings().cpu(), top_k)
+    graph.eval()
+    torch.onnx.export(
+        graph,
+        (torch.tensor([1], dtype=torch.long),),
+        os.path.join(directory, ONNX_GRAPH),
+        input_names=["word_ids"],
+        output_names=["scores", "indices"],
+        dynamic_axes={"word_ids": {0: "queries"}, "scores": {0: "queries"}, "indices": {0: "queries"}},
+        opset_version=opset_version,
+        do_constant_folding=True,
+        dynamo=False,
+    )
+    with open(os.path.join(directory, MMAP_VOCAB), "w", encoding="utf-8") as f:
+        f.write(engine.vocab.to_text())
+    with open(os.path.join(directory, MMAP_CONFIG), "w", encoding="utf-8") as f:
+        json.dump(dict(engine.config, vocab_size=len(engine.vocab), top_k=graph.top_k), f, indent=2)
+    print(f"Grafo de similitud exportado a ONNX en {directory}")
+
+class OnnxEngine:
+    """
+    Motor de solo inferencia sobre un modelo exportado con export_onnx. Ofrece la misma
+    interfaz de consulta que MeaEngine (find_similar_words y find_similar_words_batch).
+    """
+
+    def __init__(self, directory, num_threads=None):
+        """
+        Args:
+            directory (str): Directorio generado por export_onnx.
+            num_threads (int, opcional): Hilos de onnxruntime por consulta (por defecto, los de la CPU).
+        """
+        if onnxruntime is None:
+            raise ImportError("OnnxEngine necesita el paquete 'onnxruntime' (pip install onnxruntime).")
+        with open(os.path.join(directory, MMAP_CONFIG), encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.vocab = Vocabulary.from_file(os.path.join(directory, MMAP_VOCAB))
+        self.top_k = self.config["top_k"]
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(directory, ONNX_GRAPH), options, providers=["CPUExecutionProvider"])
+
+    def _run(self, word_ids, top_n):
+        """Ejecuta el grafo para los indices dados: devuelve (scores, indices) como arrays (q, top_k)."""
+        if top_n >= self.top_k:
+            raise ValueError(f"top_n debe ser menor que el top_k exportado ({self.top_k}).")
+        scores, indices = self.session.run(None, {"word_ids": np.asarray(word_ids, dtype=np.int64)})
+        return scores, indices
+
+    def _top_words(self, word_idx, scores, indices, top_n):
+        """Convierte una fila de resultados en [(palabra, score)], sin la palabra de la consulta."""
+        return [(self.vocab.idx2word[idx], float(score))
+                for score, idx in zip(scores, indices) if idx != word_idx][:top_n]
+
+    def find_similar_words(self, word, top_n=10):
+        """Encuentra las palabras mas similares a una dada (similitud de coseno), como MeaEngine."""
+        word_idx = self.vocab.get_index(word.lower())
+        if word_idx == 0:  # <UNK>
+            print(f"La palabra '{word}' no se encuentra en el vocabulario.")
+            return []
+        scores, indices = self._run([word_idx], top_n)
+        return self._top_words(word_idx, scores[0], indices[0], top_n)
+
+    def find_similar_words_batch(self, words, top_n=10, max_scores=16_000_000):
+        """
+        Vecinos de varias palabras (o indices), ejecutando el grafo por bloques de consultas.
+        Devuelve, como MeaEngine, {"results": {consulta: [(palabra, score), ...]}, "oov": [...]}.
+        max_scores limita el tamaño de la matriz de scores (consultas x vocabulario) por bloque.
+        """
+        queries, query_ids, oov = [], [], []
+        for item in map(query_key, words):
+            idx = self.vocab.get_index(item.lower()) if isinstance(item, str) else item
+            if 0 < idx < len(self.vocab):
+                queries.append(item)
+                query_ids.append(idx)
+            else:
+                oov.append(item)
+
+        results = {}
+        block = max(1, max_scores // len(self.vocab))
+        for start in range(0, len(query_ids), block):
+            block_ids = query_ids[start:start + block]
+            scores, indices = self._run(block_ids, top_n)
+            for row, query in enumerate(queries[start:start + block]):
+                results[query] = self._top_words(block_ids[row], scores[row], indices[row], top_n)
+        return {"results": results, "oov": oov}
@@ -0,0 +1,70 @@
+import numpy as np
+
+# --- Embeddings cuantizados para inferencia ---
+# Guardan la matriz de embeddings normalizada en float16 o en int8 con una escala por
+# fila (v ~= codigos * escala / 127). La similitud se calcula directamente sobre esta
+# representacion, convirtiendo a float32 solo un bloque de filas cada vez.
+
+QUANTIZED_DTYPES = ("float16", "int8")
+
+def quantize_int8(vectors):
+    """Cuantiza cada fila a int8 con escala propia (max |v| de la fila). Devuelve (codigos, escalas)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1)
+    safe_scales = np.where(scales > 0, scales, 1.0)
+    codes = np.rint(vectors / safe_scales[:, None] * 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+class QuantizedEmbeddings:
+    """Matriz de embeddings (normalizada) en float16 o int8 por filas, de solo lectura."""
+
+    def __init__(self, codes, scales=None):
+        if codes.dtype == np.int8 and scales is None:
+            raise ValueError("Los embeddings int8 necesitan una escala por fila.")
+        self.codes = codes
+        self.scales = scales
+
+    @staticmethod
+    def from_vectors(vectors, dtype):
+        """Cuantiza una matriz float32 al tipo indicado ('float16' o 'int8')."""
+        if dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Tipo de cuantizacion desconocido: '{dtype}'.")
+        if dtype == "float16":
+            return QuantizedEmbeddings(np.asarray(vectors, dtype=np.float16))
+        return QuantizedEmbeddings(*quantize_int8(vectors))
+
+    @property
+    def dtype(self):
+        return str(self.codes.dtype)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        """Bytes que ocupa la representacion cuantizada (codigos + escalas)."""
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def rows(self, ids):
+        """Devuelve las filas indicadas como float32."""
+        rows = self.codes[ids].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[ids, None] / 127
+        return rows
+
+    def scores(self, queries, block_rows=65536):
+        """
+        Producto punto de cada consulta float32 (q, d) contra todas las filas: devuelve (q, N).
+        Las filas se convierten a float32 por bloques, de modo que la memoria extra es
+        block_rows x d en lugar de una copia completa de la matriz.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        result = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), block_rows):
+            block = self.codes[start:start + block_rows].astype(np.float32)
+            block_scores = queries @ block.T
+            if self.scales is not None:
+                block_scores *= self.scales[start:start + block_rows] / 127
+            result[:, start:start + block_rows] = block_scores
+        return result
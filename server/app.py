@@ -24,7 +24,7 @@ models.Base.metadata.create_all(bind=engine)
 
 # 2. Instanciar componentes de la aplicación
 settings_manager = SettingsManager()
-memory_store = MemoryStore()
+memory_store = MemoryStore.from_settings(settings_manager.settings, bind=engine)
 # El KnowledgeManager ahora necesita una sesión para construir su índice inicial
 db_for_init = SessionLocal()
 knowledge_manager = KnowledgeManager(db_session=db_for_init)
@@ -117,6 +117,11 @@ def process_query(request: schemas.QueryRequest, db: Session = Depends(get_db),
     responses = brain.get_response(db, user_input=request.text)
     return {"responses": responses, "status": f"Consulta procesada para {current_user.username}"}
 
+@api_router.get("/memory/cache", tags=["Memory"])
+def read_memory_cache_stats(current_user: models.User = Depends(get_current_user)):
+    """Aciertos, fallos y tamaño de la caché de consultas de la memoria (monitorización)."""
+    return memory_store.cache_stats()
+
 # --- Eventos de Startup y Montaje ---
 
 @app.on_event("startup")
@@ -134,6 +139,13 @@ def on_startup():
     finally:
         db.close()
 
+@app.on_event("shutdown")
+def on_shutdown():
+    # Aplica los hechos pendientes al motor y escribe los episodios que aún estén en la
+    # cola de escritura diferida
+    brain.close()
+    memory_store.close()
+
 app.include_router(auth_router)
 app.include_router(api_router)
 
@@ -0,0 +1,56 @@
+import numpy as np
+import torch
+
+# --- N-gramas de caracteres con hashing (estilo fastText) ---
+# Cada palabra se rodea de '<' y '>' y se descompone en sus n-gramas de caracteres de
+# longitud min_n..max_n. Cada n-grama se asigna a una de 'buckets' filas de una tabla de
+# embeddings mediante un hash FNV-1a de 32 bits sobre sus puntos de codigo. El vector de
+# una palabra se compone sumando las filas de sus n-gramas, asi que cualquier cadena
+# (erratas, formas flexionadas) tiene vector aunque no este en el vocabulario.
+# El entrenamiento y la inferencia usan exactamente la misma funcion (word_ngram_ids).
+
+FNV_OFFSET = np.uint32(2166136261)
+FNV_PRIME = np.uint32(16777619)
+
+def word_ngram_ids(words, buckets, min_n=3, max_n=6):
+    """
+    Devuelve los buckets de los n-gramas de cada palabra en formato CSR: (ids, offsets),
+    donde los n-gramas de words[i] son ids[offsets[i]:offsets[i + 1]].
+    El hash se calcula vectorizado sobre todas las palabras y posiciones a la vez.
+    """
+    wrapped = [f"<{word}>" for word in words]
+    lengths = np.fromiter((len(word) for word in wrapped), dtype=np.int64, count=len(wrapped))
+    codes = np.frombuffer("".join(wrapped).encode("utf-32-le"), dtype=np.uint32)
+    ends = np.cumsum(lengths)
+    # Palabra a la que pertenece cada posicion del texto concatenado
+    owner = np.repeat(np.arange(len(wrapped)), lengths)
+
+    all_ids, all_owners = [], []
+    for n in range(min_n, max_n + 1):
+        starts = np.arange(len(codes))
+        starts = starts[starts + n <= ends[owner]]
+        hashes = np.full(len(starts), FNV_OFFSET, dtype=np.uint32)
+        for k in range(n):
+            hashes = (hashes ^ codes[starts + k]) * FNV_PRIME
+        all_ids.append((hashes % np.uint32(buckets)).astype(np.int64))
+        all_owners.append(owner[starts])
+
+    ids = np.concatenate(all_ids) if all_ids else np.empty(0, dtype=np.int64)
+    owners = np.concatenate(all_owners) if all_owners else np.empty(0, dtype=np.int64)
+    # Agrupa por palabra (orden estable: por longitud de n-grama y posicion)
+    order = np.argsort(owners, kind="stable")
+    counts = np.bincount(owners, minlength=len(wrapped))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return ids[order], offsets
+
+def gather_ngrams(ngram_ids, ngram_offsets, word_idx):
+    """
+    Selecciona (en tensores) los n-gramas de un lote de palabras a partir del CSR del vocabulario.
+    Devuelve (ids, bag_offsets, lengths), listos para nn.EmbeddingBag / index_add.
+    """
+    starts = ngram_offsets[word_idx]
+    lengths = ngram_offsets[word_idx + 1] - starts
+    bag_offsets = torch.cumsum(lengths, 0) - lengths
+    total = int(lengths.sum())
+    positions = torch.repeat_interleave(starts - bag_offsets, lengths) + torch.arange(total, device=starts.device)
+    return ngram_ids[positions], bag_offsets, lengths
@@ -13,24 +13,28 @@ def main(args):
 
     # Bucle interactivo para probar palabras
     print("\nMotor Mea-Core cargado. Escribe una palabra para encontrar terminos similares.")
+    print("Puedes consultar varias palabras a la vez separandolas con espacios.")
     print("Escribe 'exit()' o presiona Ctrl+C para salir.")
     
     while True:
         try:
-            # Solicita una palabra al usuario
-            input_word = input("\nPalabra a consultar > ")
-            if input_word.lower() == 'exit()':
+            # Solicita una o varias palabras al usuario
+            input_line = input("\nPalabra a consultar > ")
+            if input_line.lower() == 'exit()':
                 break
 
-            # Encuentra y muestra las palabras mas similares
-            similar_words = engine.find_similar_words(input_word, top_n=args.top_n)
-            
-            if similar_words:
+            # Encuentra las palabras mas similares para todas las palabras en una sola consulta
+            batch = engine.find_similar_words_batch(input_line.split(), top_n=args.top_n)
+
+            for input_word, similar_words in batch["results"].items():
                 print(f"\nPalabras mas similares a '{input_word}':")
                 # Imprime cada palabra similar y su puntuacion de similitud
                 for word, score in similar_words:
                     print(f"- {word} (similitud: {score:.4f})")
 
+            for input_word in batch["oov"]:
+                print(f"La palabra '{input_word}' no se encuentra en el vocabulario.")
+
         except KeyboardInterrupt:
             print("\nSaliendo del modo de prueba.")
             break
@@ -140,3 +140,26 @@ def test_rule_engine_mode_initialization(basic_responses, mock_dependencies):
     assert brain.mode == "rule_engine"
     assert brain.reasoning_engine is not None
     assert hasattr(brain.reasoning_engine, 'get_rules')
+
+def test_close_stops_engine_updater_with_flush(brain_instance):
+    """close() applies the pending facts (stop with flush) and is safe to call twice."""
+    updater = MagicMock()
+    brain_instance.engine_updater = updater
+    brain_instance.close()
+    updater.stop.assert_called_once_with(flush=True)
+    assert brain_instance.engine_updater is None
+    brain_instance.close()
+    updater.stop.assert_called_once()
+
+def test_vector_recall_encoder_follows_engine_swaps(basic_responses, mock_dependencies):
+    """The memory encoder resolves brain.engine on each call, so hot-swapped engines are used."""
+    settings = {"brain": {"mode": "rule"}, "memory": {"vector_recall": {"enabled": True}}}
+    old_engine, new_engine = MagicMock(), MagicMock()
+    with patch('core.cerebro.MeaEngine.load_model', return_value=old_engine):
+        brain = Brain(settings=settings, responses=basic_responses, **mock_dependencies)
+    encoder = brain.memory.enable_vector_recall.call_args[0][0]
+
+    brain.engine = new_engine  # As EngineUpdater does after each batch
+    encoder(["hola"])
+    new_engine.encode.assert_called_once_with(["hola"])
+    old_engine.encode.assert_not_called()
@@ -0,0 +1,484 @@
+import unittest
+import copy
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import numpy as np
+import torch
+
+# Añadir el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MeaEngine, SkipGramModel, InferenceModel, NegativeSampler, index_path
+from ann_index import IVFIndex, normalize_rows, recall_at_k
+from quantization import QuantizedEmbeddings
+from subword import word_ngram_ids
+
+CORPUS = " ".join([
+    "la inteligencia artificial aprende de los datos",
+    "los modelos de inteligencia artificial usan datos",
+    "el aprendizaje automatico entrena modelos con datos",
+] * 5)
+
+class TestMeaEngine(unittest.TestCase):
+
+    def setUp(self):
+        """Crea un directorio temporal para los modelos guardados."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmp_dir.name, "engine.pth")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _build_engine(self, objective="softmax"):
+        engine = MeaEngine(embedding_dim=8, min_word_count=2, objective=objective)
+        engine.build(CORPUS)
+        return engine
+
+    def test_negative_objective_has_context_embeddings(self):
+        """El modo de muestreo negativo usa una matriz de contexto en lugar de la capa de salida."""
+        engine = self._build_engine("negative")
+        self.assertTrue(hasattr(engine.model, "context_embeddings"))
+        self.assertFalse(hasattr(engine.model, "output_layer"))
+        self.assertTrue(engine.model.embeddings.sparse)
+
+    def test_negative_sampling_loss_backward(self):
+        """La perdida de muestreo negativo es finita y solo genera gradientes dispersos."""
+        model = SkipGramModel(vocab_size=20, embedding_dim=4, objective="negative")
+        targets = torch.tensor([1, 2, 3])
+        contexts = torch.tensor([4, 5, 6])
+        negatives = torch.randint(1, 20, (3, 5))
+        loss = model.negative_sampling_loss(targets, contexts, negatives)
+        loss.backward()
+        self.assertTrue(torch.isfinite(loss))
+        self.assertTrue(model.embeddings.weight.grad.is_sparse)
+
+    def test_noise_table_follows_unigram_power(self):
+        """La tabla de ruido nunca devuelve <UNK> y favorece palabras frecuentes."""
+        engine = self._build_engine("negative")
+        sampler = NegativeSampler(engine.vocab)
+        samples = sampler.sample(1000, 5)
+        self.assertEqual(tuple(samples.shape), (1000, 5))
+        self.assertFalse((samples == 0).any())
+        frequent = engine.vocab.get_index("datos")
+        rare = engine.vocab.get_index("entrena")
+        self.assertGreater((samples == frequent).sum(), (samples == rare).sum())
+
+    def test_save_and_load_preserves_objective(self):
+        """save_model/load_model conservan el objetivo, las frecuencias y los pesos."""
+        engine = self._build_engine("negative")
+        engine.save_model(self.model_path)
+        loaded = MeaEngine.load_model(self.model_path)
+        self.assertEqual(loaded.config["objective"], "negative")
+        self.assertEqual(loaded.vocab.word_counts["datos"], engine.vocab.word_counts["datos"])
+        self.assertTrue(torch.equal(loaded.get_trained_embeddings(), engine.get_trained_embeddings()))
+
+    def test_batch_similarity_matches_single_queries(self):
+        """La consulta por lotes devuelve lo mismo que consultas individuales e informa las OOV."""
+        engine = self._build_engine()
+        words = ["datos", "modelos", "palabra_inexistente"]
+        batch = engine.find_similar_words_batch(words + [engine.vocab.get_index("artificial")], top_n=3)
+
+        self.assertEqual(batch["oov"], ["palabra_inexistente"])
+        for word in ("datos", "modelos"):
+            expected = engine.find_similar_words(word, top_n=3, exact=True)
+            self.assertEqual([w for w, _ in batch["results"][word]], [w for w, _ in expected])
+        self.assertIn(engine.vocab.get_index("artificial"), batch["results"])
+
+    def test_batch_similarity_accepts_numpy_and_tensor_ids(self):
+        """Los indices de NumPy y los tensores 0-d se tratan como indices, igual que un int."""
+        engine = self._build_engine()
+        idx = engine.vocab.get_index("datos")
+        batch = engine.find_similar_words_batch([np.int64(idx), torch.tensor(idx), idx], top_n=3)
+        self.assertEqual(batch["oov"], [])
+        self.assertEqual(list(batch["results"]), [idx])
+        self.assertEqual([w for w, _ in batch["results"][idx]],
+                         [w for w, _ in engine.find_similar_words("datos", top_n=3, exact=True)])
+        self.assertEqual(engine.find_similar_words_batch([np.int64(0)], top_n=3)["oov"], [0])
+
+    def test_batch_similarity_in_small_blocks(self):
+        """Partir las consultas en bloques no cambia el resultado."""
+        engine = self._build_engine()
+        words = ["datos", "modelos", "artificial", "inteligencia"]
+        full = engine.find_similar_words_batch(words, top_n=2)
+        blocked = engine.find_similar_words_batch(words, top_n=2, max_scores=1)
+        self.assertEqual(full["oov"], blocked["oov"])
+        for word in words:
+            self.assertEqual([w for w, _ in full["results"][word]], [w for w, _ in blocked["results"][word]])
+            np.testing.assert_allclose([s for _, s in full["results"][word]],
+                                       [s for _, s in blocked["results"][word]], rtol=1e-5)
+
+    def test_normalized_embeddings_cache_invalidation(self):
+        """La matriz normalizada se reutiliza y se recalcula cuando cambian los pesos."""
+        engine = self._build_engine()
+        first = engine.get_normalized_embeddings()
+        self.assertIs(first, engine.get_normalized_embeddings())
+        with torch.no_grad():
+            engine.model.embeddings.weight.mul_(2.0).add_(1.0)
+        self.assertIsNot(first, engine.get_normalized_embeddings())
+
+    def test_index_round_trip_and_matches_exact(self):
+        """El indice se guarda junto al modelo, se recarga y, sondeando todo, coincide con la busqueda exacta."""
+        engine = self._build_engine()
+        engine.build_index(nlist=3, nprobe=3)
+        self.assertEqual(engine.index_recall(k=3), 1.0)
+        engine.save_model(self.model_path)
+        self.assertTrue(os.path.exists(index_path(self.model_path)))
+
+        loaded = MeaEngine.load_model(self.model_path)
+        self.assertIsNotNone(loaded.index)
+        approx = [w for w, _ in loaded.find_similar_words("datos", top_n=3)]
+        # El indice no contiene <UNK>; la busqueda exacta si puede devolverlo
+        exact = [w for w, _ in loaded.find_similar_words("datos", top_n=4, exact=True) if w != "<UNK>"][:3]
+        self.assertEqual(approx, exact)
+
+    def test_saving_without_index_removes_stale_index(self):
+        """Guardar un modelo sin indice elimina el indice de un modelo anterior."""
+        engine = self._build_engine()
+        engine.build_index(nlist=2)
+        engine.save_model(self.model_path)
+        engine.index = None
+        engine.save_model(self.model_path)
+        self.assertFalse(os.path.exists(index_path(self.model_path)))
+
+    def test_mmap_format_round_trip(self):
+        """El formato mapeado en memoria conserva vocabulario, pesos, indice y resultados."""
+        engine = self._build_engine("negative")
+        engine.build_index(nlist=2, nprobe=2)
+        mmap_dir = os.path.join(self.tmp_dir.name, "engine.mmap")
+        engine.save_mmap(mmap_dir)
+
+        loaded = MeaEngine.load_model(mmap_dir)
+        self.assertIsInstance(loaded.model, InferenceModel)
+        self.assertEqual(loaded.config["objective"], "negative")
+        self.assertEqual(loaded.vocab.idx2word, engine.vocab.idx2word)
+        self.assertEqual(loaded.vocab.word_counts["datos"], engine.vocab.word_counts["datos"])
+        self.assertTrue(torch.equal(loaded.get_trained_embeddings(), engine.get_trained_embeddings()))
+        self.assertIsNotNone(loaded.index)
+        self.assertEqual(loaded.find_similar_words("datos", top_n=3, exact=True),
+                         engine.find_similar_words("datos", top_n=3, exact=True))
+
+    def test_mmap_embeddings_are_not_copied(self):
+        """Los embeddings cargados son una vista del archivo mapeado, no una copia en memoria."""
+        engine = self._build_engine()
+        mmap_dir = os.path.join(self.tmp_dir.name, "engine.mmap")
+        engine.save_mmap(mmap_dir)
+        loaded = MeaEngine.load_model(mmap_dir)
+
+        with self.assertRaises(Exception):
+            loaded.save_model(self.model_path)
+        if not os.path.exists("/proc/self/maps"):
+            self.skipTest("Requiere /proc/self/maps (Linux).")
+
+        def mapped_file(tensor):
+            """Archivo cuya proyeccion en memoria contiene los datos del tensor (o None)."""
+            address = tensor.data_ptr()
+            with open("/proc/self/maps") as f:
+                for line in f:
+                    fields = line.split()
+                    start, end = (int(x, 16) for x in fields[0].split("-"))
+                    if start <= address < end and len(fields) > 5:
+                        return os.path.basename(fields[5])
+            return None
+
+        self.assertEqual(mapped_file(loaded.get_trained_embeddings()), "embeddings.npy")
+        # La matriz normalizada tambien sale del archivo, sin recalcularse
+        self.assertEqual(mapped_file(loaded.get_normalized_embeddings()), "embeddings_normalized.npy")
+
+    def test_quantized_export_matches_fp32(self):
+        """Los embeddings float16/int8 ocupan menos y dan (casi) los mismos vecinos que float32."""
+        engine = self._build_engine()
+        words = ["datos", "modelos", "inteligencia", "artificial"]
+        expected = engine.find_similar_words_batch(words, top_n=3)["results"]
+        fp32_bytes = engine.get_trained_embeddings().numel() * 4
+
+        for dtype in ("float16", "int8"):
+            mmap_dir = os.path.join(self.tmp_dir.name, f"engine_{dtype}.mmap")
+            engine.save_mmap(mmap_dir, dtype=dtype)
+            loaded = MeaEngine.load_model(mmap_dir)
+
+            self.assertIsNone(loaded.model)
+            self.assertEqual(loaded.quantized.dtype, dtype)
+            self.assertFalse(os.path.exists(os.path.join(mmap_dir, "embeddings.npy")))
+            self.assertLess(loaded.quantized.nbytes, fp32_bytes)
+            results = loaded.find_similar_words_batch(words, top_n=3)["results"]
+            approx = [[w for w, _ in results[word]] for word in words]
+            exact = [[w for w, _ in expected[word]] for word in words]
+            self.assertGreaterEqual(recall_at_k(approx, exact), 0.9)
+            self.assertEqual([w for w, _ in loaded.find_similar_words("datos", top_n=3)], approx[0])
+            with self.assertRaises(Exception):
+                loaded.save_model(self.model_path)
+
+    def test_quantized_export_keeps_index_precision(self):
+        """El indice de un modelo cuantizado guarda sus listas en float16/int8, no en float32."""
+        engine = self._build_engine()
+        engine.build_index(nlist=2, nprobe=2)
+        fp32_bytes = sum(vectors.nbytes for vectors in engine.index.list_vectors)
+
+        for dtype in ("float16", "int8"):
+            mmap_dir = os.path.join(self.tmp_dir.name, f"engine_{dtype}.mmap")
+            engine.save_mmap(mmap_dir, dtype=dtype)
+            loaded = MeaEngine.load_model(mmap_dir)
+            self.assertEqual(loaded.index.dtype, dtype)
+            self.assertLess(sum(vectors.nbytes for vectors in loaded.index.list_vectors), fp32_bytes)
+            approx = [w for w, _ in loaded.find_similar_words("datos", top_n=3)]
+            exact = [w for w, _ in loaded.find_similar_words("datos", top_n=4, exact=True) if w != "<UNK>"][:3]
+            self.assertEqual(approx, exact)
+
+            # Reconstruido sobre los embeddings cuantizados, el indice conserva su precision
+            rebuilt = loaded.build_index(nlist=2, nprobe=2)
+            self.assertEqual(rebuilt.dtype, dtype)
+            self.assertEqual(len(rebuilt), len(engine.vocab) - 1)
+        self.assertEqual(engine.index.dtype, "float32")
+
+    def test_online_update_grows_vocabulary(self):
+        """La actualizacion en linea añade palabras nuevas, conserva los indices y entrena solo lo tocado."""
+        for objective in ("softmax", "negative"):
+            engine = self._build_engine(objective)
+            old_size = len(engine.vocab)
+            untouched = engine.vocab.get_index("entrena")
+            before = engine.get_trained_embeddings().clone()
+
+            stats = engine.update_online(["los robots aprenden datos", "robots cuanticos"], seed=0)
+
+            self.assertEqual(stats["new_words"], ["robots", "aprenden", "cuanticos"])
+            self.assertGreater(stats["pairs"], 0)
+            self.assertEqual(len(engine.vocab), old_size + 3)
+            self.assertEqual(engine.get_trained_embeddings().shape, (old_size + 3, 8))
+            self.assertEqual(engine.vocab.word_counts["datos"], CORPUS.split().count("datos") + 1)
+            self.assertTrue(torch.equal(engine.get_trained_embeddings()[untouched], before[untouched]))
+            self.assertFalse(torch.equal(engine.get_trained_embeddings()[engine.vocab.get_index("datos")],
+                                         before[engine.vocab.get_index("datos")]))
+            self.assertIn("robots", [w for w, _ in engine.find_similar_words("cuanticos", top_n=old_size + 2)])
+
+    def test_online_update_updates_index_and_saves(self):
+        """Tras la actualizacion el indice incluye las palabras nuevas y el modelo se puede guardar y recargar."""
+        engine = self._build_engine("negative")
+        engine.build_index(nlist=2, nprobe=2)
+        engine.update_online("robots cuanticos")
+        self.assertEqual(len(engine.index), len(engine.vocab) - 1)
+
+        engine.save_model(self.model_path)
+        loaded = MeaEngine.load_model(self.model_path)
+        self.assertEqual(loaded.vocab.get_index("robots"), engine.vocab.get_index("robots"))
+        self.assertTrue(torch.equal(loaded.get_trained_embeddings(), engine.get_trained_embeddings()))
+
+    def test_online_update_replaces_only_changed_index_rows(self):
+        """El indice no se reentrena: solo se sustituyen los vectores de las palabras que han cambiado."""
+        for engine in (self._build_engine("softmax"), self._build_subword_engine()):
+            engine.build_index(nlist=2, nprobe=2)
+            centroids = engine.index.centroids
+            engine.update_online(["los robots aprenden datos", "robots cuanticos"], seed=0)
+
+            self.assertIs(engine.index.centroids, centroids)
+            self.assertEqual(len(engine.index), len(engine.vocab) - 1)
+            ids = np.concatenate(engine.index.list_ids)
+            indexed = np.concatenate(engine.index.list_vectors)[np.argsort(ids)]
+            expected = normalize_rows(engine.get_trained_embeddings().numpy()[1:])
+            np.testing.assert_allclose(indexed, expected, atol=1e-6)
+
+    def test_online_update_requires_trainable_model(self):
+        """Un motor de solo inferencia no admite actualizaciones en linea."""
+        engine = self._build_engine()
+        mmap_dir = os.path.join(self.tmp_dir.name, "engine.mmap")
+        engine.save_mmap(mmap_dir)
+        with self.assertRaises(Exception):
+            MeaEngine.load_model(mmap_dir).update_online("robots cuanticos")
+
+    def _build_subword_engine(self):
+        torch.manual_seed(0)
+        engine = MeaEngine(embedding_dim=16, min_word_count=2, objective="negative", ngram_buckets=2000)
+        engine.build(CORPUS)
+        return engine
+
+    def test_subword_oov_queries_use_ngrams(self):
+        """En modo subpalabra una errata obtiene vector por sus n-gramas y encuentra la palabra correcta."""
+        engine = self._build_subword_engine()
+        similar = engine.find_similar_words("datoss", top_n=3)
+        self.assertEqual(len(similar), 3)
+        self.assertEqual(similar[0][0], "datos")
+
+        batch = engine.find_similar_words_batch(["datoss", "inteligensia"], top_n=2)
+        self.assertEqual(batch["oov"], [])
+        self.assertEqual(batch["results"]["datoss"][0][0], "datos")
+        self.assertEqual(batch["results"]["inteligensia"][0][0], "inteligencia")
+
+        # Sin modo subpalabra las palabras desconocidas siguen sin resultados
+        self.assertEqual(self._build_engine().find_similar_words("datoss"), [])
+
+    def test_subword_training_updates_ngram_table(self):
+        """La perdida de muestreo negativo propaga gradientes dispersos a la tabla de n-gramas."""
+        engine = self._build_subword_engine()
+        targets = torch.tensor([engine.vocab.get_index("datos"), engine.vocab.get_index("modelos")])
+        loss = engine.model.negative_sampling_loss(targets, targets.flip(0), torch.randint(1, 10, (2, 3)))
+        loss.backward()
+        grad = engine.model.ngram_embeddings.weight.grad.coalesce()
+        expected, _ = word_ngram_ids(["datos", "modelos"], 2000)
+        self.assertEqual(set(grad.indices()[0].tolist()), set(expected.tolist()))
+
+    def test_subword_save_and_load(self):
+        """El modo subpalabra se conserva en .pth y en el formato mapeado en memoria."""
+        engine = self._build_subword_engine()
+        expected = engine.find_similar_words("datoss", top_n=3)
+        engine.save_model(self.model_path)
+        loaded = MeaEngine.load_model(self.model_path)
+        self.assertEqual(loaded.config["ngram_buckets"], 2000)
+        self.assertEqual(loaded.find_similar_words("datoss", top_n=3), expected)
+
+        for dtype in ("float32", "int8"):
+            mmap_dir = os.path.join(self.tmp_dir.name, f"subword_{dtype}.mmap")
+            engine.save_mmap(mmap_dir, dtype=dtype)
+            mapped = MeaEngine.load_model(mmap_dir)
+            self.assertEqual(mapped.find_similar_words("datoss", top_n=1)[0][0], "datos")
+
+    def test_encode_mean_pools_normalized_word_vectors(self):
+        """encode devuelve float32 con la media normalizada de los vectores de las palabras conocidas."""
+        engine = self._build_engine()
+        vectors = engine.encode(["Los datos", "palabra_inexistente", "datos modelos datos"])
+        self.assertEqual(vectors.dtype, np.float32)
+        self.assertEqual(vectors.shape, (3, 8))
+
+        normalized = engine.get_normalized_embeddings()
+        ids = [engine.vocab.get_index(w) for w in ("datos", "modelos", "datos")]
+        expected = normalize_rows(normalized[ids].mean(dim=0).numpy()[None])[0]
+        np.testing.assert_allclose(vectors[2], expected, rtol=1e-5, atol=1e-6)
+        self.assertFalse(vectors[1].any())
+        np.testing.assert_array_equal(engine.encode("los datos")[0], vectors[0])
+
+    def test_encode_lru_cache(self):
+        """La cache se indexa por texto normalizado, descarta lo menos usado y se invalida al entrenar."""
+        engine = self._build_engine("negative")
+        engine.sentence_cache_size = 2
+        with mock.patch.object(engine, "_pool_word_vectors", wraps=engine._pool_word_vectors) as pool:
+            engine.encode(["Los DATOS.", "modelos"])
+            engine.encode(["los   datos", "modelos"])
+            self.assertEqual(pool.call_count, 1)
+            engine.encode(["inteligencia artificial"])   # Expulsa "los datos"
+            engine.encode(["modelos"])
+            self.assertEqual(pool.call_count, 2)
+            engine.encode(["los datos"])
+            self.assertEqual(pool.call_count, 3)
+
+            before = engine.encode(["modelos"])
+            engine.update_online("modelos nuevos con datos nuevos", seed=0)
+            after = engine.encode(["modelos"])
+            self.assertEqual(pool.call_count, 4)
+            self.assertFalse(np.array_equal(before, after))
+
+    def test_encode_idf_weighting(self):
+        """Con IDF las palabras raras pesan mas que las que aparecen en todos los documentos."""
+        engine = self._build_engine()
+        with self.assertRaises(Exception):
+            engine.encode("datos", idf=True)
+        documents = ["los datos", "datos y modelos", "los datos de inteligencia"]
+        idf = engine.fit_idf(documents)
+        self.assertLess(idf[engine.vocab.get_index("datos")], idf[engine.vocab.get_index("modelos")])
+
+        plain, weighted = engine.encode("datos modelos"), engine.encode("datos modelos", idf=True)
+        modelos = engine.encode("modelos")[0]
+        self.assertGreater(weighted[0] @ modelos, plain[0] @ modelos)
+
+    def test_engine_copy_keeps_working_cache(self):
+        """Una copia del motor (como la del actualizador en linea) tiene su propia cache."""
+        engine = self._build_engine()
+        engine.encode("los datos")
+        copied = copy.deepcopy(engine)
+        self.assertEqual(len(copied._sentence_cache), 0)
+        np.testing.assert_array_equal(copied.encode("los datos"), engine.encode("los datos"))
+
+class TestSubwordHashing(unittest.TestCase):
+
+    def test_ngram_ids_layout(self):
+        """Cada palabra produce sus n-gramas de <palabra> en rangos CSR consecutivos y deterministas."""
+        ids, offsets = word_ngram_ids(["datos", "de", ""], buckets=1000, min_n=3, max_n=6)
+        # "<datos>" tiene 5 + 4 + 3 + 2 n-gramas de longitud 3..6; "<de>" 2 + 1; "<>" ninguno
+        self.assertEqual(offsets.tolist(), [0, 14, 17, 17])
+        self.assertTrue(((ids >= 0) & (ids < 1000)).all())
+        again, _ = word_ngram_ids(["de"], buckets=1000)
+        self.assertEqual(again.tolist(), ids[14:17].tolist())
+
+class TestQuantizedEmbeddings(unittest.TestCase):
+
+    def test_int8_scores_close_to_float(self):
+        """La puntuacion int8 por bloques aproxima el producto punto en float32."""
+        rng = np.random.default_rng(0)
+        vectors = normalize_rows(rng.standard_normal((300, 16)))
+        quantized = QuantizedEmbeddings.from_vectors(vectors, "int8")
+        self.assertEqual(quantized.codes.dtype, np.int8)
+        self.assertEqual(quantized.nbytes, 300 * 16 + 300 * 4)
+
+        scores = quantized.scores(vectors[:5], block_rows=64)
+        np.testing.assert_allclose(scores, vectors[:5] @ vectors.T, atol=0.02)
+        np.testing.assert_allclose(quantized.rows([3]), vectors[[3]], atol=0.01)
+
+    def test_zero_rows_and_unknown_dtype(self):
+        """Las filas nulas se cuantizan a cero y los tipos desconocidos se rechazan."""
+        quantized = QuantizedEmbeddings.from_vectors(np.zeros((2, 4)), "int8")
+        self.assertFalse(quantized.rows([0, 1]).any())
+        with self.assertRaises(ValueError):
+            QuantizedEmbeddings.from_vectors(np.zeros((2, 4)), "int4")
+
+class TestIVFIndex(unittest.TestCase):
+
+    def test_search_finds_nearest_neighbours(self):
+        """Con vectores bien agrupados, el indice devuelve los vecinos exactos."""
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((5, 16))
+        vectors = normalize_rows(centers[rng.integers(0, 5, 500)] + 0.1 * rng.standard_normal((500, 16)))
+        index = IVFIndex(nlist=5, nprobe=2).train(vectors)
+        index.add(vectors, np.arange(500))
+        self.assertEqual(len(index), 500)
+
+        ids, scores = index.search(vectors[7], k=5, exclude=7)
+        exact = np.argsort(-(vectors @ vectors[7]))[1:6]
+        self.assertNotIn(7, ids)
+        self.assertEqual(set(ids), set(exact))
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_incremental_add(self):
+        """Se pueden añadir vectores a un indice ya construido."""
+        rng = np.random.default_rng(1)
+        vectors = rng.standard_normal((50, 8))
+        index = IVFIndex(nlist=4).train(vectors)
+        index.add(vectors[:40], np.arange(40))
+        index.add(vectors[40:], np.arange(40, 50))
+        ids, _ = index.search(vectors[45], k=1, nprobe=4)
+        self.assertEqual(ids[0], 45)
+
+    def test_quantized_lists(self):
+        """Las listas en float16/int8 dan los mismos vecinos y sobreviven a save/load."""
+        rng = np.random.default_rng(3)
+        vectors = normalize_rows(rng.standard_normal((200, 16)))
+        index = IVFIndex(nlist=4, nprobe=4).train(vectors).add(vectors, np.arange(200))
+        exact = np.argsort(-(vectors @ vectors[9]))[1:4]
+        for dtype in ("float16", "int8"):
+            quantized = index.astype(dtype)
+            self.assertEqual(quantized.list_vectors[0].dtype, np.dtype(dtype))
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "modelo.ivf.npz")
+                quantized.save(path)
+                loaded = IVFIndex.load(path)
+            self.assertEqual(loaded.dtype, dtype)
+            ids, _ = loaded.search(vectors[9], k=3, exclude=9)
+            self.assertEqual(set(ids), set(exact))
+        with self.assertRaises(ValueError):
+            IVFIndex(dtype="int4")
+
+    def test_failed_save_keeps_previous_index(self):
+        """Un fallo al guardar no deja un indice truncado ni archivos temporales."""
+        rng = np.random.default_rng(2)
+        vectors = rng.standard_normal((50, 8))
+        index = IVFIndex(nlist=4).train(vectors).add(vectors, np.arange(50))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "modelo.ivf.npz")
+            index.save(path)
+            with mock.patch("ann_index.np.savez", side_effect=OSError("disco lleno")):
+                with self.assertRaises(OSError):
+                    index.save(path)
+            self.assertEqual(os.listdir(tmp_dir), ["modelo.ivf.npz"])
+            self.assertEqual(len(IVFIndex.load(path)), 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import torch
+
+# Añadir el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MeaEngine
+from core.actualizador_motor import EngineUpdater
+
+CORPUS = " ".join([
+    "la inteligencia artificial aprende de los datos",
+    "los modelos de inteligencia artificial usan datos",
+] * 5)
+
+class TestEngineUpdater(unittest.TestCase):
+
+    def setUp(self):
+        """Crea un cerebro minimo con un motor entrenable."""
+        engine = MeaEngine(embedding_dim=8, min_word_count=2, objective="negative")
+        engine.build(CORPUS)
+        self.brain = SimpleNamespace(engine=engine)
+
+    def test_flush_swaps_in_updated_copy(self):
+        """El lote se aplica sobre una copia; el motor anterior queda intacto."""
+        original = self.brain.engine
+        before = original.get_trained_embeddings().clone()
+        updater = EngineUpdater(self.brain, batch_size=8, seed=0)
+        updater.submit("los robots aprenden datos")
+        updater.submit("   ")
+
+        stats = updater.flush()
+
+        self.assertIsNot(self.brain.engine, original)
+        self.assertEqual(stats["new_words"], ["robots", "aprenden"])
+        self.assertEqual(original.vocab.get_index("robots"), 0)
+        self.assertTrue(torch.equal(original.get_trained_embeddings(), before))
+        self.assertNotEqual(self.brain.engine.vocab.get_index("robots"), 0)
+        self.assertEqual(updater.updates, 1)
+
+    def test_update_copy_shares_index_lists(self):
+        """La copia del motor no duplica el indice: comparte sus listas y el original no cambia."""
+        original = self.brain.engine
+        original.build_index(nlist=2, nprobe=2)
+        lists = list(original.index.list_vectors)
+        updater = EngineUpdater(self.brain, seed=0)
+        updater.submit("los robots aprenden datos")
+        updater.flush()
+
+        updated = self.brain.engine
+        self.assertIsNot(updated.index, original.index)
+        self.assertIs(updated.index.centroids, original.index.centroids)
+        self.assertTrue(all(a is b for a, b in zip(original.index.list_vectors, lists)))
+        self.assertEqual(len(original.index), len(original.vocab) - 1)
+        self.assertEqual(len(updated.index), len(updated.vocab) - 1)
+        self.assertIsNot(updated.model.embeddings.weight, original.model.embeddings.weight)
+
+    def test_background_thread_batches_texts(self):
+        """El hilo de fondo agrupa los textos encolados y publica el motor actualizado."""
+        updater = EngineUpdater(self.brain, batch_size=2, interval_seconds=0.05)
+        updater.start()
+        for text in ("robots cuanticos", "drones autonomos", "redes neuronales"):
+            updater.submit(text)
+
+        deadline = time.monotonic() + 10
+        while updater.updates < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        updater.stop()
+
+        self.assertEqual(updater.updates, 2)
+        for word in ("robots", "drones", "neuronales"):
+            self.assertNotEqual(self.brain.engine.vocab.get_index(word), 0)
+
+    def test_failed_update_keeps_current_engine(self):
+        """Si la actualizacion falla, el cerebro sigue con el motor anterior."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.brain.engine.save_mmap(os.path.join(tmp_dir, "engine.mmap"))
+            inference_only = MeaEngine.load_model(os.path.join(tmp_dir, "engine.mmap"))
+        self.brain.engine = inference_only
+        updater = EngineUpdater(self.brain)
+        updater.submit("robots cuanticos")
+        self.assertIsNone(updater.flush())
+        self.assertIs(self.brain.engine, inference_only)
+
+if __name__ == '__main__':
+    unittest.main()
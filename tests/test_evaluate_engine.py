@@ -0,0 +1,113 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import torch
+
+# Añadir el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MeaEngine
+from tools import evaluate_engine
+
+CORPUS = " ".join([
+    "la inteligencia artificial aprende de los datos",
+    "los modelos de inteligencia artificial usan datos",
+    "el aprendizaje automatico entrena modelos con datos",
+] * 5)
+
+class TestEvaluateEngine(unittest.TestCase):
+
+    def setUp(self):
+        """Crea un motor pequeno guardado y un directorio temporal para las suites."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model_path = os.path.join(self.tmp_dir.name, "engine.pth")
+        self.engine = MeaEngine(embedding_dim=8, min_word_count=2, objective="softmax")
+        self.engine.build(CORPUS)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def test_spearman_with_ties(self):
+        """Spearman usa rangos medios en los empates y detecta el orden inverso."""
+        np.testing.assert_allclose(evaluate_engine.rank([10, 20, 20, 30]), [1, 2.5, 2.5, 4])
+        self.assertAlmostEqual(evaluate_engine.spearman([1, 2, 3, 4], [10, 20, 30, 40]), 1.0)
+        self.assertAlmostEqual(evaluate_engine.spearman([1, 2, 3, 4], [4, 3, 2, 1]), -1.0)
+        self.assertIsNone(evaluate_engine.spearman([1], [2]))
+
+    def test_suite_loaders(self):
+        """Los cargadores ignoran comentarios y agrupan las analogias por seccion."""
+        similarity = self._write("sim.txt", "# comentario\nDatos modelos 7.5\n\nlos,la,2\nincompleta\n")
+        analogy = self._write("ana.txt", ": uno\na b c d\n: dos\ne f g h\nx y z\n")
+        self.assertEqual(evaluate_engine.load_similarity_suite(similarity),
+                         [("datos", "modelos", 7.5), ("los", "la", 2.0)])
+        self.assertEqual(evaluate_engine.load_analogy_suite(analogy),
+                         {"uno": [("a", "b", "c", "d")], "dos": [("e", "f", "g", "h")]})
+
+    def test_similarity_reports_coverage(self):
+        """Los pares con palabras desconocidas no cuentan para la correlacion."""
+        pairs = [("datos", "modelos", 5.0), ("datos", "los", 3.0), ("los", "modelos", 1.0),
+                 ("datos", "inexistente", 9.0)]
+        result = evaluate_engine.evaluate_similarity(self.engine, pairs)
+        self.assertEqual((result["pairs"], result["covered"]), (4, 3))
+        self.assertTrue(-1.0 <= result["spearman"] <= 1.0)
+
+    def test_analogies_use_3cosadd_and_exclude_question_words(self):
+        """Con embeddings construidos a mano, d = b - a + c se resuelve de forma exacta."""
+        words = ["datos", "modelos", "inteligencia", "artificial"]
+        ids = [self.engine.vocab.get_index(word) for word in words]
+        weights = torch.randn(len(self.engine.vocab), 8) * 0.01
+        basis = torch.eye(8)
+        weights[ids[0]] = basis[0]
+        weights[ids[1]] = basis[0] + basis[1]
+        weights[ids[2]] = basis[2]
+        weights[ids[3]] = basis[2] + basis[1]
+        with torch.no_grad():
+            self.engine.model.embeddings.weight.copy_(weights)
+
+        sections = {"prueba": [tuple(words), ("datos", "modelos", "inexistente", "los")]}
+        results = evaluate_engine.evaluate_analogies(self.engine, sections)
+        self.assertEqual(results["prueba"], {"questions": 2, "covered": 1, "accuracy": 1.0})
+        self.assertEqual(results["total"]["accuracy"], 1.0)
+
+    def test_main_writes_json_and_gates_on_baseline(self):
+        """El informe JSON incluye latencias y carga; una referencia mejor provoca codigo de salida 1."""
+        self.engine.save_model(self.model_path)
+        similarity = self._write("sim.txt", "datos modelos 5\ndatos los 3\nlos modelos 1\n")
+        analogy = self._write("ana.txt", "datos modelos inteligencia artificial\n")
+        report_path = os.path.join(self.tmp_dir.name, "informe.json")
+        args = evaluate_engine.build_parser().parse_args([
+            "--model_path", self.model_path, "--similarity", similarity, "--analogy", analogy,
+            "--num_queries", "5", "--load_repeats", "1", "--output", report_path,
+        ])
+        self.assertEqual(evaluate_engine.main(args), 0)
+        with open(report_path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        self.assertEqual(report["vocab_size"], len(self.engine.vocab))
+        self.assertIn("p99", report["latency_ms"]["exact"])
+        self.assertIn("batch_per_query", report["latency_ms"])
+        self.assertGreater(report["load_seconds"], 0)
+        self.assertIn("sim.txt", report["similarity"])
+
+        # Una referencia con mejor calidad y latencias imposibles marca regresiones
+        baseline = json.loads(json.dumps(report))
+        baseline["similarity"]["sim.txt"]["spearman"] = 2.0
+        baseline["latency_ms"]["exact"]["p99"] = 1e-9
+        self.assertEqual(len(evaluate_engine.find_regressions(report, baseline)), 2)
+        self.assertEqual(evaluate_engine.find_regressions(report, report), [])
+
+        baseline_path = self._write("referencia.json", json.dumps(baseline))
+        args.baseline = baseline_path
+        self.assertEqual(evaluate_engine.main(args), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -25,6 +25,7 @@ class TestGoalManager(unittest.TestCase):
 
     def tearDown(self):
         """Cierra la conexión a la base de datos."""
+        self.memory.close()
         self.db_session.close()
 
     def test_add_and_get_goal(self):
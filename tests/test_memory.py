@@ -1,16 +1,18 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 import os
+import time
 import sys
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, delete, text
+from sqlalchemy.orm import Session, sessionmaker
 
 # Añadir el directorio raíz al path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.memoria import MemoryStore
-from core import models
+from core import memoria, models
+from core.security import blind_token
 
 class TestMemoryStore(unittest.TestCase):
 
@@ -24,6 +26,7 @@ class TestMemoryStore(unittest.TestCase):
 
     def tearDown(self):
         """Cierra la conexión a la DB después de cada prueba."""
+        self.mem.close()
         self.db_session.close()
 
     def test_log_and_get_episode(self):
@@ -59,5 +62,205 @@ class TestMemoryStore(unittest.TestCase):
         memories_after_reset = self.db_session.query(models.EpisodicMemory).all()
         self.assertEqual(len(memories_after_reset), 0)
 
+    def test_search_finds_old_episodes_through_index(self):
+        """La búsqueda usa el índice de texto completo: encuentra episodios más allá de los 1000 más recientes."""
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "La Canción más antigua"})
+        for i in range(1100):
+            self.mem.log_episode(self.db_session, type="test", source="test", data={"info": f"relleno {i}"})
+
+        results = self.mem.get_memory(self.db_session, query="cancion mas")
+        self.assertEqual([r['data'] for r in results], [{"info": "La Canción más antigua"}])
+        self.assertEqual(self.mem.get_memory(self.db_session, query="mas cancion"), [])
+
+    def test_only_results_are_decrypted(self):
+        """Solo se descifran los episodios devueltos, no toda la tabla."""
+        for i in range(20):
+            self.mem.log_episode(self.db_session, type="test", source="test", data={"info": f"valor {i % 2}"})
+        with patch.object(memoria, "decrypt_data", wraps=memoria.decrypt_data) as decrypt:
+            results = self.mem.get_memory(self.db_session, query="valor 1", top_n=3)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(decrypt.call_count, 3)
+
+    def test_ranking_by_priority_then_match(self):
+        """Los episodios prioritarios puntúan aunque no coincidan, por detrás de las coincidencias."""
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "alerta general"}, priority=1)
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "tema buscado"})
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "otro tema"})
+
+        results = self.mem.get_memory(self.db_session, query="tema buscado", top_n=5)
+        self.assertEqual([r['data']['info'] for r in results], ["tema buscado", "alerta general"])
+        everything = self.mem.get_memory(self.db_session, query="", top_n=5)
+        self.assertEqual(everything[0]['data']['info'], "alerta general")
+        self.assertEqual(len(everything), 3)
+
+    def test_deleted_episodes_leave_the_index(self):
+        """Borrar un episodio (por ejemplo, al actualizar una meta) elimina su entrada del índice."""
+        episode = self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "efimero"})
+        self.db_session.execute(delete(models.EpisodicMemory).where(models.EpisodicMemory.id == episode['id']))
+        self.db_session.commit()
+        self.assertEqual(self.mem.get_memory(self.db_session, query="efimero"), [])
+        remaining = self.db_session.execute(text("SELECT count(*) FROM episode_tokens_ids")).scalar()
+        self.assertEqual(remaining, 0)
+
+    def test_access_counts_are_batched_and_reads_never_commit(self):
+        """get_memory solo acumula los accesos; se escriben después con un único UPDATE por bloque."""
+        first = self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "popular"})
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "popular tambien"})
+        with patch.object(self.db_session, "commit") as commit:
+            for _ in range(3):
+                results = self.mem.get_memory(self.db_session, query="popular")
+            commit.assert_not_called()
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['access_count'], 3)
+
+        with patch.object(self.mem.access_counts, "chunk_size", 1):
+            self.assertEqual(self.mem.access_counts.flush(), 2)
+        self.db_session.expire_all()
+        row = self.db_session.get(models.EpisodicMemory, first['id'])
+        self.assertEqual(row.access_count, 3)
+        self.assertEqual(self.mem.access_counts.flush(), 0)
+
+    def test_cached_access_count_survives_flush(self):
+        """Tras escribir los accesos, una consulta cacheada no devuelve un access_count menor."""
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "popular"})
+        counts = [self.mem.get_memory(self.db_session, query="popular")[0]['access_count'] for _ in range(2)]
+        self.mem.access_counts.flush()
+        counts += [self.mem.get_memory(self.db_session, query="popular")[0]['access_count'] for _ in range(2)]
+        self.assertEqual(counts, [1, 2, 3, 4])
+
+    def test_failed_access_count_flush_keeps_hits(self):
+        """Si el UPDATE falla, los accesos siguen acumulados; los sumados durante la escritura no se pierden."""
+        episode = self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "popular"})
+        tracker = self.mem.access_counts
+        bind = self.db_session.get_bind()
+        for _ in range(3):
+            self.mem.get_memory(self.db_session, query="popular")
+
+        class FailingSession(Session):
+            def commit(self):
+                raise Exception("base de datos bloqueada")
+        with patch("core.escritor_memoria.Session", FailingSession):
+            self.assertEqual(tracker.flush(), 0)
+        self.assertEqual(tracker.pending(bind, episode['id']), 3)
+
+        class ConcurrentSession(Session):
+            def commit(self):
+                # Un acceso que llega mientras se escribe el bloque
+                tracker.record(bind, [episode['id']])
+                super().commit()
+        with patch("core.escritor_memoria.Session", ConcurrentSession):
+            self.assertEqual(tracker.flush(), 1)
+        self.assertEqual(tracker.pending(bind, episode['id']), 1)
+        tracker.flush()
+        self.db_session.expire_all()
+        self.assertEqual(self.db_session.get(models.EpisodicMemory, episode['id']).access_count, 4)
+
+    def test_short_term_hits_update_in_memory(self):
+        """Los accesos a la memoria a corto plazo se cuentan directamente en el episodio."""
+        episode = self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "efimero"}, long_term=False)
+        self.mem.get_memory(self.db_session, query="efimero")
+        self.assertEqual(episode['access_count'], 1)
+        self.assertEqual(self.mem.access_counts.counts, {})
+
+    def test_query_cache_hits_and_write_invalidation(self):
+        """Las consultas repetidas (normalizadas) salen de la caché hasta la siguiente escritura."""
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "clima de hoy"})
+        first = self.mem.get_memory(self.db_session, query="Clima de hoy")
+        with patch.object(self.mem, "_search_memory") as search:
+            second = self.mem.get_memory(self.db_session, query="  clima, DE hoy ")
+            search.assert_not_called()
+        self.assertEqual([r['id'] for r in second], [r['id'] for r in first])
+        self.assertEqual(second[0]['access_count'], 2)
+        self.assertEqual(self.mem.cache_stats()['hits'], 1)
+        self.assertEqual(self.mem.cache_stats()['misses'], 1)
+
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "clima de hoy soleado"})
+        self.assertEqual(len(self.mem.get_memory(self.db_session, query="clima de hoy")), 2)
+        self.assertEqual(self.mem.cache_stats()['misses'], 2)
+
+        self.mem.reset_memory(self.db_session)
+        self.assertEqual(self.mem.get_memory(self.db_session, query="clima de hoy"), [])
+
+    def test_query_cache_ttl_and_size(self):
+        """Las entradas caducan tras cache_ttl_seconds y la caché no supera su tamaño."""
+        mem = MemoryStore(lru_cache_size=2, cache_ttl_seconds=60)
+        try:
+            for query in ("uno", "dos", "tres"):
+                mem.get_memory(self.db_session, query=query)
+            self.assertEqual(mem.cache_stats()['size'], 2)
+            mem.get_memory(self.db_session, query="uno")  # Desalojada (la menos usada)
+            self.assertEqual(mem.cache_stats()['hits'], 0)
+            with patch("core.memoria.time.monotonic", return_value=time.monotonic() + 61):
+                mem.get_memory(self.db_session, query="tres")
+            self.assertEqual(mem.cache_stats()['hits'], 0)
+            mem.get_memory(self.db_session, query="tres")
+            self.assertEqual(mem.cache_stats()['hits'], 1)
+        finally:
+            mem.close()
+
+    def test_iter_episodes_keyset_pagination_and_filters(self):
+        """iter_episodes recorre por páginas (incluso con timestamps repetidos) y filtra en la DB."""
+        ids = []
+        for i in range(7):
+            episode = self.mem.log_episode(self.db_session, type="conversation" if i % 2 == 0 else "goal",
+                                           source="bot" if i < 5 else "otro", data={"i": i})
+            ids.append(episode['id'])
+        # Varios episodios con el mismo timestamp: la clave (timestamp, id) los desempata
+        for row in self.db_session.query(models.EpisodicMemory).filter(models.EpisodicMemory.id.in_(ids)):
+            row.timestamp = 1000.0 + ids.index(row.id) // 3
+        self.db_session.commit()
+
+        newest = list(self.mem.iter_episodes(self.db_session, batch_size=2))
+        self.assertEqual(len(newest), 7)
+        self.assertEqual(len({e['id'] for e in newest}), 7)
+        self.assertEqual([e['timestamp'] for e in newest], sorted((e['timestamp'] for e in newest), reverse=True))
+        oldest = list(self.mem.iter_episodes(self.db_session, newest_first=False, batch_size=3))
+        self.assertEqual([e['id'] for e in oldest], [e['id'] for e in newest][::-1])
+
+        conversations = list(self.mem.iter_episodes(self.db_session, type="conversation", source="bot", batch_size=1))
+        self.assertEqual(sorted(e['data']['i'] for e in conversations), [0, 2, 4])
+        in_range = list(self.mem.iter_episodes(self.db_session, since=1001.0, until=1002.0))
+        self.assertEqual(sorted(e['data']['i'] for e in in_range), [3, 4, 5])
+
+    def test_iter_episodes_decrypts_lazily(self):
+        """Solo se descifran los episodios que el consumidor llega a pedir."""
+        for i in range(10):
+            self.mem.log_episode(self.db_session, type="conversation", source="test", data={"i": i})
+        with patch.object(memoria, "decode_episode_data", wraps=memoria.decode_episode_data) as decode:
+            iterator = self.mem.iter_episodes(self.db_session, batch_size=4)
+            first = next(iterator)
+            self.assertEqual(decode.call_count, 1)
+            iterator.close()
+        self.assertEqual(first['data'], {"i": 9})
+
+    def test_blind_index_stores_no_plaintext(self):
+        """El índice solo contiene tokens HMAC: ni los datos ni las palabras quedan en claro en la DB."""
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "clave secreta"})
+        stored = self.db_session.execute(text("SELECT tokens FROM episode_tokens")).scalar()
+        self.assertNotIn("secreta", stored)
+        self.assertIn(blind_token("secreta"), stored.split())
+        row = self.db_session.query(models.EpisodicMemory).one()
+        self.assertNotIn("secreta", row.data)
+        self.assertEqual(len(self.mem.get_memory(self.db_session, query="Clave SECRETA")), 1)
+
+    def test_plaintext_index_is_replaced(self):
+        """Las tablas de la versión anterior del índice (términos en claro) se eliminan al migrar."""
+        self.db_session.execute(text("CREATE VIRTUAL TABLE episode_fts USING fts5(terms)"))
+        self.db_session.execute(text("INSERT INTO episode_fts (terms) VALUES ('info clave secreta')"))
+        self.db_session.commit()
+        self.mem.log_episode(self.db_session, type="test", source="test", data={"info": "clave secreta"})
+        tables = {row[0] for row in self.db_session.execute(text("SELECT name FROM sqlite_master"))}
+        self.assertNotIn("episode_fts", tables)
+
+    def test_existing_episodes_are_indexed_on_first_use(self):
+        """Los episodios guardados antes de existir el índice se indexan la primera vez que se usa."""
+        self.db_session.add(models.EpisodicMemory(
+            id="antiguo", timestamp=1.0, type="test", source="test",
+            data=memoria.encode_episode_data({"info": "recuerdo previo"}), priority=0, access_count=0))
+        self.db_session.commit()
+
+        results = self.mem.get_memory(self.db_session, query="recuerdo previo")
+        self.assertEqual([r['id'] for r in results], ["antiguo"])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,101 @@
+import unittest
+import os
+import sys
+import time
+import gzip
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Añadir el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memoria import MemoryStore
+from core.archivo_memoria import ArchiveCompactor, SegmentArchive, partition_key
+from core import models
+
+DAY = 86400
+
+class TestMemoryArchive(unittest.TestCase):
+
+    def setUp(self):
+        """Base de datos en memoria y archivo frío en un directorio temporal."""
+        self.engine = create_engine("sqlite:///:memory:")
+        models.Base.metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        self.db_session = Session()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.mem = MemoryStore()
+        self.mem.enable_archive(self.tmp_dir.name, min_age_days=30, max_priority=0, max_access_count=1)
+
+    def tearDown(self):
+        self.mem.close()
+        self.db_session.close()
+        self.tmp_dir.cleanup()
+
+    def _log_old(self, data, days_ago, now, **kwargs):
+        episode = self.mem.log_episode(self.db_session, source="test", data=data, **kwargs)
+        row = self.db_session.get(models.EpisodicMemory, episode['id'])
+        row.timestamp = now - days_ago * DAY
+        self.db_session.commit()
+        return episode
+
+    def test_cold_episodes_move_to_segments(self):
+        """Solo los episodios antiguos, sin prioridad y poco consultados salen de la tabla."""
+        now = time.time()
+        cold = self._log_old({"texto": "conversacion antigua"}, 90, now, type="conversation")
+        self._log_old({"texto": "conversacion reciente"}, 1, now, type="conversation")
+        self._log_old({"texto": "importante antigua"}, 90, now, type="conversation", priority=2)
+        self._log_old({"texto": "objetivo antiguo"}, 90, now, type="goal")
+
+        self.assertEqual(self.mem.archive_cold_episodes(self.db_session, now=now), 1)
+        self.assertIsNone(self.db_session.get(models.EpisodicMemory, cold['id']))
+        self.assertEqual(self.db_session.query(models.EpisodicMemory).count(), 3)
+
+        partition = partition_key(now - 90 * DAY)
+        self.assertEqual(self.mem.archive.partitions(), [partition])
+        segment = os.listdir(os.path.join(self.tmp_dir.name, partition))[0]
+        with gzip.open(os.path.join(self.tmp_dir.name, partition, segment), "rt", encoding="utf-8") as f:
+            content = f.read()
+        self.assertIn(cold['id'], content)
+        self.assertNotIn("antigua", content)  # Datos cifrados y tokens ciegos
+        self.assertEqual(self.mem.archive_cold_episodes(self.db_session, now=now), 0)
+
+    def test_get_memory_reads_archive_on_demand(self):
+        """El archivo solo se consulta con include_archive y devuelve los datos descifrados."""
+        now = time.time()
+        self._log_old({"texto": "el viaje a lisboa"}, 400, now, type="conversation")
+        self._log_old({"texto": "otro viaje a lisboa"}, 45, now, type="conversation")
+        self.mem.archive_cold_episodes(self.db_session, now=now)
+        self.assertEqual(len(self.mem.archive.partitions()), 2)
+
+        self.assertEqual(self.mem.get_memory(self.db_session, query="viaje a lisboa"), [])
+        results = self.mem.get_memory(self.db_session, query="viaje a lisboa", include_archive=True)
+        self.assertEqual([r['data']['texto'] for r in results], ["otro viaje a lisboa", "el viaje a lisboa"])
+        self.assertEqual(self.mem.get_memory(self.db_session, query="lisboa viaje", include_archive=True), [])
+
+    def test_segments_are_append_only(self):
+        """Cada pasada escribe un segmento nuevo; los anteriores no cambian."""
+        archive = SegmentArchive(self.tmp_dir.name)
+        timestamp = time.time()
+        first = archive.append([{"id": "a", "timestamp": timestamp, "tokens": ""}])[0]
+        with open(first, "rb") as f:
+            before = f.read()
+        second = archive.append([{"id": "b", "timestamp": timestamp, "tokens": ""}])[0]
+        self.assertNotEqual(first, second)
+        with open(first, "rb") as f:
+            self.assertEqual(f.read(), before)
+        self.assertEqual(archive.count(), 2)
+
+    def test_compactor_pass(self):
+        """El compactor archiva los episodios fríos con su propia sesión."""
+        self._log_old({"texto": "muy antigua"}, 60, time.time(), type="manual_log")
+        compactor = ArchiveCompactor(self.mem, self.engine)
+        self.assertEqual(compactor.run_once(), 1)
+        self.assertEqual(compactor.archived, 1)
+        self.db_session.expire_all()
+        self.assertEqual(self.db_session.query(models.EpisodicMemory).count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
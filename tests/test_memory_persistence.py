@@ -1,14 +1,16 @@
 import unittest
 import os
 import sys
+from unittest import mock
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 # Añadir el directorio raíz al path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from core.memoria import MemoryStore
+from core.objetivos import GoalManager
 from core import models
 
 class TestMemoryPersistence(unittest.TestCase):
@@ -45,6 +47,7 @@ class TestMemoryPersistence(unittest.TestCase):
         retrieved_memories = mem2.get_memory(session2, query="datos persistentes")
         self.assertEqual(len(retrieved_memories), 1)
         self.assertEqual(retrieved_memories[0]['data'], test_data)
+        mem2.close()
         session2.close()
 
     def test_reset_memory_clears_db_file(self):
@@ -61,6 +64,7 @@ class TestMemoryPersistence(unittest.TestCase):
         # Resetear la memoria
         mem1.reset_memory(session1)
         self.assertEqual(len(mem1.get_memory(session1, query="datos a borrar")), 0)
+        mem1.close()
         session1.close()
 
         # --- Segunda Instancia: Verificar que la DB está vacía ---
@@ -69,5 +73,90 @@ class TestMemoryPersistence(unittest.TestCase):
         self.assertEqual(len(memories_after_reset), 0)
         session2.close()
 
+    def test_write_behind_batches_commits(self):
+        """Con escritura diferida los episodios se ven al instante y se escriben en un solo lote."""
+        session = self.Session()
+        mem = MemoryStore(write_behind=True, write_batch_size=100, write_interval_seconds=60)
+        try:
+            for i in range(10):
+                mem.log_episode(session, type="conversation", source="test", data={"info": f"turno {i}"})
+            # Lectura de lo propio escrito a través del búfer de pendientes
+            self.assertEqual(mem.get_memory(session, query="turno 3")[0]['data'], {"info": "turno 3"})
+            self.assertEqual(session.query(models.EpisodicMemory).count(), 0)
+
+            mem.flush()
+            self.assertEqual(mem.writer.batches, 1)
+            self.assertEqual(mem.writer.written, 10)
+            session.rollback()  # Nueva transacción para ver lo escrito por el hilo
+            self.assertEqual(session.query(models.EpisodicMemory).count(), 10)
+            results = mem.get_memory(session, query="turno 3")
+            self.assertEqual([r['data'] for r in results], [{"info": "turno 3"}])
+        finally:
+            mem.close()
+            session.close()
+
+    def test_write_behind_close_flushes_pending(self):
+        """Al cerrar (apagado) se escriben los episodios que quedaban en la cola."""
+        session = self.Session()
+        mem = MemoryStore(write_behind=True, write_batch_size=100, write_interval_seconds=60)
+        mem.log_episode(session, type="conversation", source="test", data={"info": "ultimo turno"})
+        mem.close()
+        self.assertIsNone(mem.writer)
+        self.assertEqual(session.query(models.EpisodicMemory).count(), 1)
+        self.assertEqual(len(mem.get_memory(session, query="ultimo turno")), 1)
+        mem.close()
+        session.close()
+
+    def test_write_behind_failed_commit_loses_nothing(self):
+        """Si el commit de un lote falla, sus episodios siguen pendientes y se escriben al reintentar."""
+        class FailingSession(Session):
+            failing = True
+            def commit(self):
+                if FailingSession.failing:
+                    raise Exception("disco lleno")
+                super().commit()
+
+        session = self.Session()
+        mem = MemoryStore(write_behind=True, write_batch_size=100, write_interval_seconds=60)
+        try:
+            for i in range(10):
+                mem.log_episode(session, type="conversation", source="test", data={"info": f"turno {i}"})
+            with mock.patch("core.escritor_memoria.Session", FailingSession):
+                mem.flush()  # Falla el lote y tambien su reintento inmediato
+                self.assertEqual(len(mem.writer.retry), 10)
+                self.assertEqual(session.query(models.EpisodicMemory).count(), 0)
+                self.assertEqual(mem.get_memory(session, query="turno 3")[0]['data'], {"info": "turno 3"})
+
+                FailingSession.failing = False
+                mem.flush()
+            self.assertEqual(mem.writer.retry, [])
+            self.assertEqual(mem.writer.written, 10)
+            session.rollback()
+            self.assertEqual(session.query(models.EpisodicMemory).count(), 10)
+            self.assertEqual(len(mem.get_memory(session, query="turno 3")), 1)
+        finally:
+            mem.close()
+            session.close()
+
+    def test_write_behind_complete_task_updates_goal(self):
+        """complete_task con escritura diferida: el borrado se confirma y la meta actualizada se escribe."""
+        session = self.Session()
+        mem = MemoryStore(write_behind=True, write_batch_size=100, write_interval_seconds=60)
+        goals = GoalManager(mem)
+        try:
+            goals.add_goal(session, "Mudanza", "Cambiar de piso", ["cajas", "camion"])
+            self.assertTrue(goals.complete_task(session, "Mudanza", "cajas"))
+            mem.flush()
+            self.assertEqual(mem.writer.written, 2)
+            self.assertEqual(mem.writer.retry, [])
+
+            session.rollback()
+            self.assertEqual(session.query(models.EpisodicMemory).count(), 1)
+            goal, _ = goals.get_goal(session, "Mudanza")
+            self.assertEqual(goal['progress'], 50.0)
+        finally:
+            mem.close()
+            session.close()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
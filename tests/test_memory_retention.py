@@ -0,0 +1,113 @@
+import unittest
+import os
+import sys
+import time
+import json
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Añadir el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memoria import MemoryStore
+from core.retencion_memoria import RetentionPolicy, RetentionCompactor
+from core.objetivos import GoalManager
+from core import models
+
+DAY = 86400
+
+class TestMemoryRetention(unittest.TestCase):
+
+    def setUp(self):
+        """Base de datos SQLite en un archivo temporal (para medir su tamaño)."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp_dir.name, 'memoria.db')}")
+        models.Base.metadata.create_all(self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+        self.db_session = self.Session()
+        self.mem = MemoryStore()
+
+    def tearDown(self):
+        self.mem.close()
+        self.db_session.close()
+        self.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    def _log(self, type, days_ago, now, priority=0, access_count=0, data=None):
+        episode = self.mem.log_episode(self.db_session, type=type, source="test", data=data or {"n": days_ago}, priority=priority)
+        row = self.db_session.get(models.EpisodicMemory, episode['id'])
+        row.timestamp = now - days_ago * DAY
+        row.access_count = access_count
+        self.db_session.commit()
+        return episode['id']
+
+    def test_decay_score_rewards_use_and_recency(self):
+        """Un episodio muy consultado puntúa más que uno reciente sin accesos."""
+        policy = RetentionPolicy(half_life_days=10)
+        self.assertAlmostEqual(policy.decay_score(0, 10 * DAY), 0.5)
+        self.assertGreater(policy.decay_score(9, 20 * DAY), policy.decay_score(0, 1 * DAY))
+        self.assertTrue(RetentionPolicy(min_priority=2).protects(3))
+        self.assertFalse(RetentionPolicy().protects(3))
+
+    def test_max_age_and_min_priority(self):
+        """Se borran los episodios antiguos del tipo, salvo los protegidos por prioridad y los de otros tipos."""
+        now = time.time()
+        old = self._log("conversation", 100, now)
+        kept = [self._log("conversation", 5, now), self._log("conversation", 100, now, priority=2),
+                self._log("goal", 100, now)]
+        self.mem.enable_retention({"conversation": RetentionPolicy(max_age_days=30, min_priority=1)}, vacuum=False)
+
+        report = self.mem.enforce_retention(self.db_session, now=now)
+        self.assertEqual(report['deleted'], {"conversation": 1})
+        self.assertIsNone(self.db_session.get(models.EpisodicMemory, old))
+        self.assertEqual(sorted(id for (id,) in self.db_session.query(models.EpisodicMemory.id)), sorted(kept))
+
+    def test_max_count_uses_decay_score(self):
+        """Por encima de max_count se borran los episodios de menor puntuación de decaimiento."""
+        now = time.time()
+        used = self._log("manual_log", 40, now, access_count=20)
+        recent = self._log("manual_log", 1, now)
+        self._log("manual_log", 20, now)
+        self._log("manual_log", 30, now, access_count=1)
+        self.mem.enable_retention({"manual_log": RetentionPolicy(max_count=2, half_life_days=10)},
+                                  batch_size=1, vacuum=False)
+
+        report = self.mem.enforce_retention(self.db_session, now=now)
+        self.assertEqual(report['rows_reclaimed'], 2)
+        self.assertEqual(sorted(id for (id,) in self.db_session.query(models.EpisodicMemory.id)), sorted([used, recent]))
+
+    def test_shipped_policies_keep_old_pending_goals(self):
+        """Las políticas de settings.json no borran metas antiguas aún activas (GoalManager las guarda con prioridad 0)."""
+        with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "settings.json")) as f:
+            policies = json.load(f)["memory"]["retention"]["policies"]
+        now = time.time()
+        goals = GoalManager(self.mem)
+        goals.add_goal(self.db_session, "aprender", "Meta pendiente", ["leer"])
+        row = self.db_session.query(models.EpisodicMemory).filter_by(type="goal").one()
+        row.timestamp = now - 3 * 365 * DAY
+        self.db_session.commit()
+        self.mem.enable_retention({type: RetentionPolicy.from_dict(policy) for type, policy in policies.items()}, vacuum=False)
+
+        report = self.mem.enforce_retention(self.db_session, now=now)
+
+        self.assertEqual(report["rows_reclaimed"], 0)
+        self.assertEqual([goal["name"] for goal in goals.list_goals(self.db_session)], ["aprender"])
+
+    def test_compaction_reports_size_change(self):
+        """Tras los borrados, VACUUM reduce el archivo y el informe lo refleja."""
+        now = time.time()
+        for i in range(300):
+            self._log("conversation", 100, now, data={"texto": "relleno " * 50 + str(i)})
+        self.mem.enable_retention({"conversation": RetentionPolicy(max_age_days=30)})
+
+        report = RetentionCompactor(self.mem, self.engine).run_once()
+        self.assertEqual(report['rows_reclaimed'], 300)
+        self.assertLess(report['size_after'], report['size_before'])
+        self.assertEqual(report['size_change'], report['size_after'] - report['size_before'])
+        self.db_session.expire_all()
+        self.assertEqual(self.db_session.query(models.EpisodicMemory).count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
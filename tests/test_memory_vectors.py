@@ -0,0 +1,139 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Añadir el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.memoria import MemoryStore
+from core.vectores_memoria import EpisodeVectorIndex, blob_to_vector
+from core import models
+
+# Codificador de prueba: cada palabra aporta el vector de su concepto (sinonimos comparten concepto)
+CONCEPTS = {"coche": 0, "automovil": 0, "vehiculo": 0, "perro": 1, "mascota": 1, "lluvia": 2, "tormenta": 2}
+
+def concept_encoder(texts):
+    vectors = np.zeros((len(texts), 4), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            if word in CONCEPTS:
+                vectors[row, CONCEPTS[word]] += 1.0
+    return vectors
+
+class TestEpisodeVectorIndex(unittest.TestCase):
+
+    def test_flat_search_remove_and_persistence(self):
+        """La busqueda exacta devuelve los mas parecidos; los borrados desaparecen y el indice se guarda y carga."""
+        index = EpisodeVectorIndex()
+        index.add(["a", "b", "c"], np.array([[1, 0], [0.9, 0.1], [0, 1]], dtype=np.float32))
+        index.add(["nulo"], np.zeros((1, 2), dtype=np.float32))  # Los vectores nulos no se indexan
+        self.assertEqual([i for i, _ in index.search(np.array([1.0, 0.0]), k=2)], ["a", "b"])
+        self.assertNotIn("nulo", index)
+
+        index.remove(["a"])
+        self.assertEqual([i for i, _ in index.search(np.array([1.0, 0.0]), k=2)], ["b", "c"])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "vectores.npz")
+            index.save(path)
+            loaded = EpisodeVectorIndex()
+            self.assertTrue(loaded.load(path))
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(loaded.search(np.array([0.0, 1.0]), k=1)[0][0], "c")
+
+    def test_ivf_matches_flat_search(self):
+        """Por encima del umbral se usa un IVF, que devuelve el mismo vecino mas cercano."""
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(400, 8)).astype(np.float32)
+        ids = [f"e{i}" for i in range(400)]
+        flat, ivf = EpisodeVectorIndex(), EpisodeVectorIndex(ivf_threshold=100, nprobe=20)
+        flat.add(ids, vectors)
+        ivf.add(ids[:200], vectors[:200])
+        ivf.add(ids[200:], vectors[200:])  # Actualizacion incremental del IVF ya entrenado
+        self.assertIsNone(flat.ivf)
+        self.assertIsNotNone(ivf.ivf)
+        for i in (3, 250, 399):
+            self.assertEqual(ivf.search(vectors[i], k=1)[0][0], f"e{i}")
+            self.assertEqual(flat.search(vectors[i], k=1)[0][0], f"e{i}")
+
+class TestMemoryVectorRecall(unittest.TestCase):
+
+    def setUp(self):
+        """Base de datos en un archivo temporal (la sincroniza un hilo) y almacén con recuperación por vectores."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp_dir.name, 'memoria.db')}")
+        models.Base.metadata.create_all(self.engine)
+        Session = sessionmaker(bind=self.engine)
+        self.db_session = Session()
+        self.mem = MemoryStore()
+        self.mem.enable_vector_recall(concept_encoder)
+        self.mem.start_vector_sync(self.engine).join()
+
+    def tearDown(self):
+        self.mem.close()
+        self.db_session.close()
+        self.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    def test_embedding_stored_as_float32_blob(self):
+        """Cada episodio a largo plazo guarda su embedding como blob float32."""
+        episode = self.mem.log_episode(self.db_session, type="conversation", source="test", data={"texto": "mi coche es rojo"})
+        row = self.db_session.get(models.EpisodeEmbedding, episode['id'])
+        np.testing.assert_allclose(blob_to_vector(row.vector), [1, 0, 0, 0])
+
+    def test_paraphrase_found_and_fused_with_keywords(self):
+        """Una consulta con sinonimos encuentra el recuerdo; el que coincide en palabras y significado va primero."""
+        self.mem.log_episode(self.db_session, type="conversation", source="test", data={"texto": "aparque el coche"})
+        self.mem.log_episode(self.db_session, type="conversation", source="test", data={"texto": "paseo al perro"})
+        self.mem.log_episode(self.db_session, type="conversation", source="test", data={"texto": "el automovil nuevo"})
+
+        results = self.mem.get_memory(self.db_session, query="vehiculo", top_n=5)
+        self.assertEqual(sorted(r['data']['texto'] for r in results), ["aparque el coche", "el automovil nuevo"])
+
+        results = self.mem.get_memory(self.db_session, query="automovil", top_n=5)
+        self.assertEqual(results[0]['data']['texto'], "el automovil nuevo")
+        self.assertEqual(results[1]['data']['texto'], "aparque el coche")
+
+    def test_existing_episodes_indexed_on_enable_and_deleted(self):
+        """Los episodios anteriores se codifican en segundo plano, sin commits en las lecturas; los borrados salen del índice."""
+        plain = MemoryStore()
+        old = plain.log_episode(self.db_session, type="conversation", source="test", data={"texto": "llega la tormenta"})
+        plain.close()
+
+        self.mem.close()
+        self.mem = MemoryStore()
+        self.mem.enable_vector_recall(concept_encoder)
+        with patch.object(self.db_session, "commit") as commit:
+            self.mem.get_memory(self.db_session, query="lluvia")
+            commit.assert_not_called()
+        for thread in self.mem.vector_syncs:
+            thread.join()
+
+        results = self.mem.get_memory(self.db_session, query="lluvia")
+        self.assertEqual([r['id'] for r in results], [old['id']])
+        self.assertIsNotNone(self.db_session.get(models.EpisodeEmbedding, old['id']))
+
+        self.mem.delete_episode(self.db_session, old['id'])
+        self.db_session.commit()
+        self.assertEqual(self.mem.get_memory(self.db_session, query="lluvia"), [])
+
+    def test_from_settings_store_syncs_at_startup(self):
+        """Con la base de datos conocida, la sincronización se lanza al activar la recuperación."""
+        old = self.mem.log_episode(self.db_session, type="conversation", source="test", data={"texto": "mi perro"})
+        mem = MemoryStore.from_settings({}, bind=self.engine)
+        try:
+            mem.enable_vector_recall(concept_encoder)
+            self.assertEqual(len(mem.vector_syncs), 1)
+            mem.vector_syncs[0].join()
+            self.assertIn(old['id'], mem._vector_indexes[self.engine])
+        finally:
+            mem.close()
+
+if __name__ == '__main__':
+    unittest.main()
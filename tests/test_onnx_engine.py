@@ -0,0 +1,78 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Añadir el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MeaEngine
+from onnx_engine import export_onnx, OnnxEngine, ONNX_GRAPH
+
+try:
+    import onnx  # noqa: F401 (necesario para torch.onnx.export)
+    import onnxruntime  # noqa: F401
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+CORPUS = " ".join([
+    "la inteligencia artificial aprende de los datos",
+    "los modelos de inteligencia artificial usan datos",
+    "el aprendizaje automatico entrena modelos con datos",
+] * 5)
+
+@unittest.skipUnless(ONNX_AVAILABLE, "onnx/onnxruntime no estan instalados")
+class TestOnnxEngine(unittest.TestCase):
+
+    def setUp(self):
+        """Entrena un motor pequeno y lo exporta a un directorio temporal."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.onnx_dir = os.path.join(self.tmp_dir.name, "engine.onnx")
+        self.engine = MeaEngine(embedding_dim=8, min_word_count=2, objective="negative")
+        self.engine.build(CORPUS)
+        export_onnx(self.engine, self.onnx_dir, top_k=6)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_export_writes_graph_and_vocabulary(self):
+        """El directorio exportado contiene el grafo y el vocabulario en el mismo orden de indices."""
+        self.assertTrue(os.path.exists(os.path.join(self.onnx_dir, ONNX_GRAPH)))
+        onnx_engine = OnnxEngine(self.onnx_dir)
+        self.assertEqual(onnx_engine.vocab.idx2word, self.engine.vocab.idx2word)
+        self.assertEqual(onnx_engine.top_k, 6)
+
+    def test_find_similar_words_matches_pytorch(self):
+        """Las consultas por onnxruntime devuelven las mismas palabras y scores que PyTorch."""
+        onnx_engine = OnnxEngine(self.onnx_dir, num_threads=1)
+        for word in ("datos", "Modelos", "inteligencia"):
+            expected = self.engine.find_similar_words(word, top_n=5, exact=True)
+            found = onnx_engine.find_similar_words(word, top_n=5)
+            self.assertEqual([w for w, _ in found], [w for w, _ in expected])
+            np.testing.assert_allclose([s for _, s in found], [s for _, s in expected], rtol=1e-5, atol=1e-6)
+        self.assertEqual(onnx_engine.find_similar_words("inexistente"), [])
+        with self.assertRaises(ValueError):
+            onnx_engine.find_similar_words("datos", top_n=6)
+
+    def test_batch_matches_single_queries(self):
+        """La consulta por lotes coincide con las individuales e informa las palabras desconocidas."""
+        onnx_engine = OnnxEngine(self.onnx_dir)
+        batch = onnx_engine.find_similar_words_batch(["datos", "inexistente", "modelos"], top_n=3, max_scores=1)
+        self.assertEqual(batch["oov"], ["inexistente"])
+        for word in ("datos", "modelos"):
+            self.assertEqual([w for w, _ in batch["results"][word]],
+                             [w for w, _ in onnx_engine.find_similar_words(word, top_n=3)])
+
+    def test_batch_accepts_numpy_ids(self):
+        """Un indice de NumPy (como los de la evaluacion) se consulta como indice, no como palabra."""
+        onnx_engine = OnnxEngine(self.onnx_dir)
+        idx = onnx_engine.vocab.get_index("datos")
+        batch = onnx_engine.find_similar_words_batch([np.int64(idx)], top_n=3)
+        self.assertEqual([w for w, _ in batch["results"][idx]],
+                         [w for w, _ in onnx_engine.find_similar_words("datos", top_n=3)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,325 @@
+import unittest
+import argparse
+import os
+import sys
+import tempfile
+from collections import Counter
+from unittest import mock
+
+import numpy as np
+import torch
+
+# Añadir el directorio raíz al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MeaEngine, tokenize
+from corpus import (list_corpus_files, count_vocabulary, skipgram_pairs, skipgram_pairs_loop, SkipGramStream, TokenCache,
+                    iter_id_chunks, shard_byte_ranges)
+import train
+from engine import save_atomic
+from train import create_skipgram_dataset, train_hogwild, build_parser, EarlyStopping
+
+TEXTS = [
+    "La inteligencia artificial aprende de los datos.\nLos datos entrenan modelos de IA.",
+    "Los modelos de inteligencia artificial usan datos; el aprendizaje automatico usa modelos.",
+    "Datos, modelos y aprendizaje: la base de la inteligencia artificial moderna.",
+]
+
+class TestStreamingCorpus(unittest.TestCase):
+
+    def setUp(self):
+        """Escribe un pequeño corpus de prueba en un directorio temporal."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        for i, text in enumerate(TEXTS):
+            with open(os.path.join(self.tmp_dir.name, f"doc_{i}.txt"), "w", encoding="utf-8") as f:
+                f.write(text)
+        self.file_paths = list_corpus_files(self.tmp_dir.name)
+        self.full_corpus = "".join(open(p, encoding="utf-8").read() + "\n" for p in self.file_paths)
+
+        self.engine = MeaEngine(embedding_dim=8, min_word_count=2)
+        self.engine.build_from_counts(count_vocabulary(self.file_paths))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_count_vocabulary_matches_full_tokenization(self):
+        """El conteo en streaming coincide con tokenizar el corpus concatenado."""
+        self.assertEqual(count_vocabulary(self.file_paths), Counter(tokenize(self.full_corpus)))
+
+    def test_stream_pairs_match_materialized_pairs(self):
+        """Los pares generados por bloques son identicos a los del corpus completo."""
+        expected_targets, expected_contexts = create_skipgram_dataset(
+            tokenize(self.full_corpus), self.engine.vocab, window_size=2)
+
+        # Bloques diminutos para forzar ventanas que cruzan los limites de bloque
+        stream = SkipGramStream(self.file_paths, self.engine.vocab, window_size=2,
+                                batch_size=7, chunk_tokens=3, shuffle=False)
+        batches = list(stream)
+        targets = torch.cat([t for t, _ in batches])
+        contexts = torch.cat([c for _, c in batches])
+
+        self.assertTrue(all(len(t) == 7 for t, _ in batches[:-1]))
+        self.assertTrue(torch.equal(targets, expected_targets))
+        self.assertTrue(torch.equal(contexts, expected_contexts))
+
+    def test_shuffled_stream_is_a_permutation(self):
+        """El barajado por bloques conserva exactamente los mismos pares."""
+        stream = SkipGramStream(self.file_paths, self.engine.vocab, window_size=2, batch_size=5, chunk_tokens=4)
+        pairs = Counter((t.item(), c.item()) for tb, cb in stream for t, c in zip(tb, cb))
+        stream.shuffle = False
+        expected = Counter((t.item(), c.item()) for tb, cb in stream for t, c in zip(tb, cb))
+        self.assertEqual(pairs, expected)
+
+    def test_subsampling_shrinks_dataset(self):
+        """El submuestreo descarta tokens frecuentes y lo refleja en las estadisticas."""
+        stream = SkipGramStream(self.file_paths, self.engine.vocab, window_size=2, batch_size=8, subsample=1e-2)
+        num_pairs = sum(len(t) for t, _ in stream)
+        self.assertLess(stream.stats["kept_tokens"], stream.stats["tokens"])
+        self.assertEqual(stream.stats["pairs"], num_pairs)
+
+    def test_keep_probabilities_favor_rare_words(self):
+        """Las palabras frecuentes tienen menor probabilidad de conservarse; <UNK> siempre se conserva."""
+        vocab = self.engine.vocab
+        keep = vocab.keep_probabilities(1e-2)
+        self.assertEqual(keep[0], 1.0)
+        self.assertTrue(((keep > 0) & (keep <= 1)).all())
+        self.assertLess(keep[vocab.get_index("de")], keep[vocab.get_index("aprendizaje")])
+
+    def test_shards_split_the_corpus_before_tokenizing(self):
+        """Cada proceso lee solo su tramo del corpus; los tramos juntos son el corpus completo, sin repetir."""
+        vocab = self.engine.vocab
+        full = np.concatenate(list(iter_id_chunks(self.file_paths, vocab, chunk_tokens=5)))
+        for world_size in (2, 3, 7):
+            shards = [np.concatenate(list(iter_id_chunks(self.file_paths, vocab, 5, (rank, world_size))) or [np.empty(0, dtype=np.int64)])
+                      for rank in range(world_size)]
+            np.testing.assert_array_equal(np.concatenate(shards), full)
+        ranges = shard_byte_ranges(self.file_paths, (1, 3))
+        self.assertLess(sum(end - start for _, start, end in ranges),
+                        sum(os.path.getsize(path) for path in self.file_paths))
+
+        cache = TokenCache(os.path.join(self.tmp_dir.name, "cache"))
+        cache.update(self.file_paths)
+        cached = [np.concatenate(list(cache.iter_id_chunks(vocab, 5, (rank, 3)))) for rank in range(3)]
+        self.assertTrue(all(len(shard) for shard in cached))
+        np.testing.assert_array_equal(np.concatenate(cached), full)
+
+    def test_shard_pairs_come_from_the_full_dataset(self):
+        """Los pares de cada proceso son pares del dataset completo (solo faltan los que cruzan tramos)."""
+        def pairs_of(shard):
+            stream = SkipGramStream(self.file_paths, self.engine.vocab, window_size=2, batch_size=4,
+                                    chunk_tokens=5, shuffle=False, shard=shard)
+            return Counter((t.item(), c.item()) for tb, cb in stream for t, c in zip(tb, cb))
+
+        full = pairs_of(None)
+        shards = [pairs_of((rank, 3)) for rank in range(3)]
+        self.assertTrue(all(shards))
+        merged = sum(shards, Counter())
+        self.assertEqual(merged - full, Counter())
+        self.assertLessEqual(sum((full - merged).values()), 2 * 2 * 2 * 2)  # 2 limites, ventana 2
+
+    def test_hogwild_training_updates_shared_model(self):
+        """El entrenamiento multiproceso escribe en los parametros compartidos del modelo."""
+        engine = MeaEngine(embedding_dim=8, min_word_count=1, objective="negative")
+        engine.build_from_counts(count_vocabulary(self.file_paths))
+        before = engine.get_trained_embeddings().clone()
+        args = argparse.Namespace(
+            epochs=1, batch_size=4, learning_rate=0.01, window_size=2, negatives=2, seed=0,
+            subsample=0.0, dynamic_window=False, workers=2, threads_per_worker=1)
+
+        summaries = train_hogwild(engine, self.file_paths, args)
+
+        self.assertEqual(len(summaries), 1)
+        self.assertGreater(summaries[0]["pairs"], 0)
+        self.assertFalse(torch.equal(before, engine.get_trained_embeddings()))
+
+    def test_hogwild_fails_instead_of_hanging_when_a_worker_dies(self):
+        """Si un proceso muere, el entrenamiento termina con un error y no deja procesos vivos."""
+        engine = MeaEngine(embedding_dim=8, min_word_count=1, objective="negative")
+        engine.build_from_counts(count_vocabulary(self.file_paths))
+        args = argparse.Namespace(
+            epochs=1, batch_size=4, learning_rate=0.01, window_size=2, negatives=2, seed=0,
+            subsample=0.0, dynamic_window=False, workers=2, threads_per_worker=1)
+        # Un archivo inexistente hace fallar a los procesos al leer el corpus
+        file_paths = self.file_paths + [os.path.join(self.tmp_dir.name, "borrado.txt")]
+        with self.assertRaises(Exception) as error:
+            train_hogwild(engine, file_paths, args)
+        self.assertIn("termino inesperadamente", str(error.exception))
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        """Escribe el corpus de prueba y prepara el directorio de la cache."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        os.makedirs(self.data_dir)
+        for i, text in enumerate(TEXTS):
+            self._write(f"doc_{i}.txt", text)
+        self.file_paths = list_corpus_files(self.data_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, text):
+        with open(os.path.join(self.data_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_cached_stream_matches_text_stream(self):
+        """La cache da las mismas frecuencias y exactamente los mismos lotes que el texto."""
+        cache = TokenCache(self.cache_dir)
+        cache.update(self.file_paths)
+        self.assertEqual(cache.word_counts(), count_vocabulary(self.file_paths))
+
+        engine = MeaEngine(embedding_dim=8, min_word_count=2)
+        engine.build_from_counts(cache.word_counts())
+        options = dict(window_size=2, batch_size=5, chunk_tokens=4, subsample=1e-2, dynamic_window=True)
+        from_text = list(SkipGramStream(self.file_paths, engine.vocab, **options))
+        from_cache = list(SkipGramStream(self.file_paths, engine.vocab, token_cache=TokenCache(self.cache_dir), **options))
+        self.assertEqual(len(from_text), len(from_cache))
+        for (t1, c1), (t2, c2) in zip(from_text, from_cache):
+            self.assertTrue(torch.equal(t1, t2))
+            self.assertTrue(torch.equal(c1, c2))
+
+    def test_update_only_retokenizes_changed_files(self):
+        """Los archivos sin cambios se reutilizan; los modificados o eliminados actualizan las frecuencias."""
+        cache = TokenCache(self.cache_dir)
+        self.assertEqual(cache.update(self.file_paths), {"reused": 0, "tokenized": 3, "removed": 0})
+        self.assertEqual(TokenCache(self.cache_dir).update(self.file_paths), {"reused": 3, "tokenized": 0, "removed": 0})
+
+        # Cambia la fecha pero no el contenido: se reutiliza
+        os.utime(self.file_paths[0], ns=(0, 0))
+        self.assertEqual(TokenCache(self.cache_dir).update(self.file_paths)["tokenized"], 0)
+
+        self._write("doc_1.txt", "robots nuevos y datos nuevos")
+        os.remove(self.file_paths[2])
+        file_paths = list_corpus_files(self.data_dir)
+        cache = TokenCache(self.cache_dir)
+        self.assertEqual(cache.update(file_paths), {"reused": 1, "tokenized": 1, "removed": 2})
+        self.assertEqual(cache.word_counts(), count_vocabulary(file_paths))
+        self.assertEqual(cache.file_paths, file_paths)
+        # Solo quedan los archivos de tokens que usa el manifiesto
+        blobs = [name for name in os.listdir(self.cache_dir) if name.endswith(".u32")]
+        self.assertEqual(len(blobs), 2)
+
+    def test_training_with_cache_matches_text(self):
+        """Entrenar con --cache_dir da el mismo modelo que leyendo el texto."""
+        def run(name, *extra):
+            path = os.path.join(self.tmp_dir.name, name + ".pth")
+            torch.manual_seed(0)
+            train.main(build_parser().parse_args([
+                "--data_path", self.data_dir, "--model_path", path, "--embedding_dim", "8",
+                "--min_count", "1", "--batch_size", "8", "--epochs", "1", *extra]))
+            return torch.load(path)["model_state_dict"]
+
+        expected = run("text")
+        for name in ("cached_first", "cached_second"):
+            state = run(name, "--cache_dir", self.cache_dir)
+            for key, tensor in expected.items():
+                self.assertTrue(torch.equal(tensor, state[key]), key)
+
+class TestCheckpoints(unittest.TestCase):
+
+    def setUp(self):
+        """Escribe el corpus de prueba y prepara las rutas de salida."""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        os.makedirs(self.data_dir)
+        for i, text in enumerate(TEXTS):
+            with open(os.path.join(self.data_dir, f"doc_{i}.txt"), "w", encoding="utf-8") as f:
+                f.write(text * 3)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _args(self, name, *extra):
+        path = os.path.join(self.tmp_dir.name, name)
+        return build_parser().parse_args([
+            "--data_path", self.data_dir, "--model_path", path + ".pth",
+            "--checkpoint_path", path + ".ckpt", "--embedding_dim", "8", "--min_count", "1",
+            "--batch_size", "8", "--epochs", "2", "--objective", "negative", *extra])
+
+    def test_resume_reproduces_uninterrupted_run(self):
+        """Reanudar tras una caida a mitad de epoca da exactamente el mismo modelo."""
+        torch.manual_seed(0)
+        train.main(self._args("full"))
+        expected = torch.load(os.path.join(self.tmp_dir.name, "full.pth"))["model_state_dict"]
+
+        # Simula una caida en el lote 7 de la segunda epoca, con checkpoints cada 3 lotes
+        calls = {"n": 0}
+        real_compute_loss = train.compute_loss
+        def crashing_compute_loss(*args, **kwargs):
+            calls["n"] += 1
+            if calls["n"] == 100:
+                raise RuntimeError("caida simulada")
+            return real_compute_loss(*args, **kwargs)
+
+        torch.manual_seed(0)
+        args = self._args("crash", "--checkpoint_every", "3")
+        with mock.patch.object(train, "compute_loss", crashing_compute_loss):
+            with self.assertRaises(RuntimeError):
+                train.main(args)
+        self.assertFalse(os.path.exists(args.model_path))
+
+        args.resume = args.checkpoint_path
+        train.main(args)
+        resumed = torch.load(args.model_path)["model_state_dict"]
+        for name, tensor in expected.items():
+            self.assertTrue(torch.equal(tensor, resumed[name]), name)
+
+    def test_failed_save_keeps_previous_file(self):
+        """Una escritura fallida no reemplaza ni corrompe el archivo anterior."""
+        path = os.path.join(self.tmp_dir.name, "model.pth")
+        save_atomic({"ok": torch.ones(3)}, path)
+        with self.assertRaises(Exception):
+            save_atomic({"bad": lambda: None}, path)
+        self.assertTrue(torch.equal(torch.load(path)["ok"], torch.ones(3)))
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ["data", "model.pth"])
+
+    def test_early_stopping_on_plateau(self):
+        """La parada temprana se activa tras 'patience' epocas sin mejora."""
+        stopper = EarlyStopping(patience=2, min_delta=0.01)
+        self.assertFalse(stopper.step(1.0))
+        self.assertFalse(stopper.step(0.5))
+        self.assertFalse(stopper.step(0.499))
+        self.assertTrue(stopper.step(0.498))
+        self.assertFalse(EarlyStopping(patience=0).step(10.0))
+
+    def test_subword_training_end_to_end(self):
+        """train.py entrena el modo subpalabra y el modelo guardado responde a palabras desconocidas."""
+        args = self._args("subword", "--ngram_buckets", "500", "--epochs", "1")
+        train.main(args)
+        engine = MeaEngine.load_model(args.model_path)
+        self.assertEqual(engine.config["ngram_buckets"], 500)
+        self.assertTrue(engine.find_similar_words("inteligensia", top_n=3))
+
+class TestVectorizedPairs(unittest.TestCase):
+
+    def test_numpy_pairs_match_loop(self):
+        """El generador vectorizado produce los mismos pares, en el mismo orden, que el bucle."""
+        rng = np.random.default_rng(42)
+        ids = rng.integers(0, 6, size=200)  # Incluye muchos <UNK> (indice 0)
+        for window_size in (1, 2, 5):
+            for start, end in ((0, None), (3, 150), (190, 200)):
+                targets, contexts = skipgram_pairs(ids, window_size, start, end)
+                expected_targets, expected_contexts = skipgram_pairs_loop(list(ids), window_size, start, end)
+                self.assertEqual(targets.tolist(), expected_targets)
+                self.assertEqual(contexts.tolist(), expected_contexts)
+
+    def test_dynamic_window_is_subset_of_full_window(self):
+        """Las ventanas dinamicas nunca superan window_size e incluyen siempre los vecinos inmediatos."""
+        ids = np.arange(1, 51)
+        full = set(zip(*skipgram_pairs(ids, 4)))
+        targets, contexts = skipgram_pairs(ids, 4, rng=np.random.default_rng(0))
+        dynamic = set(zip(targets.tolist(), contexts.tolist()))
+        self.assertTrue(dynamic <= full)
+        self.assertLess(len(dynamic), len(full))
+        self.assertTrue(all((i, i + 1) in dynamic for i in range(1, 50)))
+
+    def test_numpy_pairs_empty_input(self):
+        """Una secuencia vacia no produce pares."""
+        targets, contexts = skipgram_pairs([], 2)
+        self.assertEqual(len(targets), 0)
+        self.assertEqual(len(contexts), 0)
+
+if __name__ == '__main__':
+    unittest.main()
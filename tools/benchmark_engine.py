@@ -0,0 +1,377 @@
+# tools/benchmark_engine.py
+
+"""
+Microbenchmarks del motor de embeddings (MeaEngine) y de su entrenamiento.
+
+Uso:
+    python tools/benchmark_engine.py objectives --vocab_sizes 1000 10000 100000
+    python tools/benchmark_engine.py pairs --num_tokens 1000000 --window_size 5
+    python tools/benchmark_engine.py workers --workers 1 2 4 8 --objective negative
+    python tools/benchmark_engine.py index --vocab_size 1000000 --nprobe 4 8 16 32
+    python tools/benchmark_engine.py load --vocab_size 1000000 --processes 4
+    python tools/benchmark_engine.py quantize --vocab_size 200000 --k 10
+    python tools/benchmark_engine.py cache --num_files 8 --tokens_per_file 1000000
+    python tools/benchmark_engine.py onnx --vocab_size 200000 --k 10
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+import torch
+
+# Permite importar los modulos de la raiz del proyecto (engine, train)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MeaEngine, SkipGramModel, InferenceModel, NegativeSampler, Vocabulary, OBJECTIVES
+from train import build_optimizer, compute_loss, train_hogwild
+from ann_index import IVFIndex, normalize_rows, recall_at_k
+from quantization import QUANTIZED_DTYPES
+from onnx_engine import export_onnx, OnnxEngine
+from corpus import list_corpus_files, count_vocabulary, skipgram_pairs, skipgram_pairs_loop, iter_id_chunks, TokenCache
+
+def synthetic_vocab(vocab_size):
+    """Crea un vocabulario sintetico con frecuencias tipo Zipf."""
+    vocab = Vocabulary()
+    for i in range(1, vocab_size):
+        word = f"w{i}"
+        vocab.idx2word.append(word)
+        vocab.word2idx[word] = i
+    vocab.word_counts = Counter({f"w{i}": max(1, 1_000_000 // i) for i in range(1, vocab_size)})
+    return vocab
+
+def bench_objectives(args):
+    """Mide pares/seg de un paso de entrenamiento para cada objetivo y tamaño de vocabulario."""
+    torch.manual_seed(0)
+    print(f"{'vocabulario':>12} | {'objetivo':>9} | {'pares/seg':>12}")
+    for vocab_size in args.vocab_sizes:
+        vocab = synthetic_vocab(vocab_size)
+        sampler = NegativeSampler(vocab)
+        for objective in OBJECTIVES:
+            model = SkipGramModel(vocab_size, args.embedding_dim, objective=objective)
+            optimizer = build_optimizer(model, 0.001)
+            criterion = torch.nn.CrossEntropyLoss()
+            targets = torch.randint(1, vocab_size, (args.steps, args.batch_size))
+            contexts = torch.randint(1, vocab_size, (args.steps, args.batch_size))
+
+            start = time.perf_counter()
+            for step in range(args.steps):
+                optimizer.zero_grad()
+                loss = compute_loss(model, targets[step], contexts[step], criterion, sampler, args.negatives)
+                loss.backward()
+                optimizer.step()
+            elapsed = time.perf_counter() - start
+
+            pairs_per_sec = args.steps * args.batch_size / elapsed
+            print(f"{vocab_size:>12} | {objective:>9} | {pairs_per_sec:>12.0f}")
+
+def bench_pairs(args):
+    """Compara el generador de pares con bucles de Python contra la version vectorizada."""
+    rng = np.random.default_rng(0)
+    vocab = synthetic_vocab(args.vocab_size)
+    words = [vocab.idx2word[i] for i in rng.integers(0, args.vocab_size, args.num_tokens)]
+
+    start = time.perf_counter()
+    loop_ids = [vocab.get_index(word) for word in words]
+    loop_targets, loop_contexts = skipgram_pairs_loop(loop_ids, args.window_size)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ids = vocab.get_indices(words)
+    targets, contexts = skipgram_pairs(ids, args.window_size)
+    numpy_time = time.perf_counter() - start
+
+    assert np.array_equal(targets, loop_targets) and np.array_equal(contexts, loop_contexts)
+    print(f"Tokens: {args.num_tokens}, ventana: {args.window_size}, pares: {len(targets)}")
+    print(f"Bucle Python: {loop_time:.3f}s | NumPy: {numpy_time:.3f}s | Aceleracion: {loop_time / numpy_time:.1f}x")
+
+def write_synthetic_corpus(directory, num_files, tokens_per_file, vocab_size, seed=0):
+    """Escribe archivos .txt con palabras sinteticas de frecuencia tipo Zipf."""
+    rng = np.random.default_rng(seed)
+    for i in range(num_files):
+        ids = np.minimum(rng.zipf(1.3, tokens_per_file), vocab_size)
+        with open(os.path.join(directory, f"synthetic_{i}.txt"), "w", encoding="utf-8") as f:
+            f.write(" ".join(f"w{j}" for j in ids))
+
+def bench_workers(args):
+    """Mide la escalabilidad del entrenamiento Hogwild con 1/2/4/8 procesos."""
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_synthetic_corpus(data_dir, args.num_files, args.tokens_per_file, args.vocab_size)
+        file_paths = list_corpus_files(data_dir)
+        word_counts = count_vocabulary(file_paths)
+
+        print(f"{'procesos':>8} | {'pares/seg':>12} | {'aceleracion':>11}")
+        baseline = None
+        for workers in args.workers:
+            torch.manual_seed(0)
+            engine = MeaEngine(embedding_dim=args.embedding_dim, min_word_count=1, objective=args.objective)
+            engine.build_from_counts(word_counts)
+            train_args = argparse.Namespace(
+                epochs=args.epochs, batch_size=args.batch_size, learning_rate=0.001,
+                window_size=2, negatives=5, seed=0, subsample=0.0, dynamic_window=False,
+                workers=workers, threads_per_worker=1)
+            summaries = train_hogwild(engine, file_paths, train_args)
+
+            pairs_per_sec = sum(s["pairs"] for s in summaries) / sum(s["seconds"] for s in summaries)
+            baseline = baseline or pairs_per_sec
+            print(f"{workers:>8} | {pairs_per_sec:>12.0f} | {pairs_per_sec / baseline:>10.2f}x")
+
+def clustered_vectors(num_vectors, dim, num_clusters=1000, seed=0):
+    """Genera vectores agrupados en torno a centros aleatorios (parecido a embeddings reales)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, num_clusters, num_vectors)]
+    vectors += 0.5 * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+    return vectors
+
+def bench_index(args):
+    """Latencia y recall@k del indice IVF frente a la busqueda exacta."""
+    vectors = normalize_rows(clustered_vectors(args.vocab_size, args.embedding_dim))
+    ids = np.arange(len(vectors))
+
+    start = time.perf_counter()
+    index = IVFIndex(nlist=args.nlist).train(vectors)
+    index.add(vectors, ids)
+    print(f"Vectores: {len(vectors)}, dim: {args.embedding_dim}, listas: {index.nlist}, "
+          f"construccion: {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(1)
+    query_ids = rng.choice(len(vectors), args.num_queries, replace=False)
+    queries = vectors[query_ids]
+
+    start = time.perf_counter()
+    exact_ids = []
+    for query, query_id in zip(queries, query_ids):
+        scores = vectors @ query
+        scores[query_id] = -np.inf
+        exact_ids.append(np.argpartition(-scores, args.k)[:args.k])
+    exact_ms = (time.perf_counter() - start) * 1000 / args.num_queries
+    print(f"Busqueda exacta: {exact_ms:.3f} ms/consulta")
+
+    print(f"{'nprobe':>6} | {'media ms':>8} | {'p99 ms':>8} | {'recall@' + str(args.k):>9}")
+    for nprobe in args.nprobe:
+        latencies, approx_ids = [], []
+        for query, query_id in zip(queries, query_ids):
+            start = time.perf_counter()
+            found, _ = index.search(query, k=args.k, nprobe=nprobe, exclude=query_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+            approx_ids.append(found)
+        recall = recall_at_k(approx_ids, exact_ids)
+        print(f"{nprobe:>6} | {np.mean(latencies):>8.3f} | {np.percentile(latencies, 99):>8.3f} | {recall:>9.3f}")
+
+def private_memory_mb():
+    """Memoria anonima (privada) del proceso en MB, segun /proc (solo Linux; None si no existe)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _load_and_query(model_path, queue):
+    """Proceso hijo: carga el modelo, hace una consulta y reporta tiempo y memoria privada."""
+    before = private_memory_mb()
+    start = time.perf_counter()
+    engine = MeaEngine.load_model(model_path)
+    load_time = time.perf_counter() - start
+    engine.find_similar_words("w1", top_n=10, exact=True)
+    after = private_memory_mb()
+    queue.put((load_time, time.perf_counter() - start, None if before is None else after - before))
+
+def bench_load(args):
+    """Tiempo de carga y memoria privada por proceso: .pth (torch.load) vs formato mapeado en memoria."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = MeaEngine(embedding_dim=args.embedding_dim, min_word_count=1)
+        engine.vocab = synthetic_vocab(args.vocab_size)
+        engine.model = InferenceModel(torch.randn(args.vocab_size, args.embedding_dim))
+        mmap_path = os.path.join(tmp_dir, "engine.mmap")
+        engine.save_mmap(mmap_path)
+        # El .pth contiene el modelo completo (con capa de salida), como lo guarda train.py
+        pth_path = os.path.join(tmp_dir, "engine.pth")
+        engine.model = SkipGramModel(args.vocab_size, args.embedding_dim)
+        engine.save_model(pth_path)
+        del engine
+
+        context = mp.get_context("spawn")
+        print(f"Vocabulario: {args.vocab_size}, dim: {args.embedding_dim}, procesos: {args.processes}")
+        print(f"{'formato':>8} | {'carga s':>8} | {'carga+consulta s':>16} | {'MB privados/proceso':>19}")
+        for name, path in (("pth", pth_path), ("mmap", mmap_path)):
+            queue = context.Queue()
+            processes = [context.Process(target=_load_and_query, args=(path, queue)) for _ in range(args.processes)]
+            for p in processes:
+                p.start()
+            results = [queue.get() for _ in processes]
+            for p in processes:
+                p.join()
+            load_time = np.mean([r[0] for r in results])
+            total_time = np.mean([r[1] for r in results])
+            memory = [r[2] for r in results if r[2] is not None]
+            memory = f"{np.mean(memory):.1f}" if memory else "n/d"
+            print(f"{name:>8} | {load_time:>8.3f} | {total_time:>16.3f} | {memory:>19}")
+
+def bench_quantize(args):
+    """Memoria, latencia y coincidencia del top-k de los embeddings float16/int8 frente a float32."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = MeaEngine(embedding_dim=args.embedding_dim, min_word_count=1)
+        engine.vocab = synthetic_vocab(args.vocab_size)
+        engine.model = InferenceModel(torch.from_numpy(clustered_vectors(args.vocab_size, args.embedding_dim)))
+
+        rng = np.random.default_rng(1)
+        query_ids = rng.choice(np.arange(1, args.vocab_size), args.num_queries, replace=False).tolist()
+        start = time.perf_counter()
+        reference = engine.find_similar_words_batch(query_ids, top_n=args.k)["results"]
+        reference_ms = (time.perf_counter() - start) * 1000 / args.num_queries
+        exact_ids = [[w for w, _ in reference[q]] for q in query_ids]
+
+        # Modelo completo en memoria segun train.py: embeddings + capa de salida (pesos y sesgo)
+        full_mb = (2 * args.vocab_size * args.embedding_dim + args.vocab_size) * 4 / 2**20
+        print(f"Vocabulario: {args.vocab_size}, dim: {args.embedding_dim}, consultas: {args.num_queries}")
+        print(f"Modelo completo (.pth, con capa de salida): {full_mb:.1f} MB")
+        print(f"{'tipo':>8} | {'MB':>8} | {'ms/consulta':>11} | {'top-' + str(args.k) + ' vs fp32':>13}")
+        print(f"{'float32':>8} | {engine.get_trained_embeddings().numel() * 4 / 2**20:>8.1f} | "
+              f"{reference_ms:>11.3f} | {1.0:>13.3f}")
+
+        for dtype in QUANTIZED_DTYPES:
+            path = os.path.join(tmp_dir, f"engine_{dtype}.mmap")
+            engine.save_mmap(path, dtype=dtype)
+            quantized = MeaEngine.load_model(path)
+
+            start = time.perf_counter()
+            results = quantized.find_similar_words_batch(query_ids, top_n=args.k)["results"]
+            elapsed_ms = (time.perf_counter() - start) * 1000 / args.num_queries
+            agreement = recall_at_k([[w for w, _ in results[q]] for q in query_ids], exact_ids)
+            print(f"{dtype:>8} | {quantized.quantized.nbytes / 2**20:>8.1f} | {elapsed_ms:>11.3f} | {agreement:>13.3f}")
+
+def bench_onnx(args):
+    """Latencia de find_similar_words en CPU: PyTorch (MeaEngine) vs el grafo exportado en onnxruntime."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = MeaEngine(embedding_dim=args.embedding_dim, min_word_count=1)
+        engine.vocab = synthetic_vocab(args.vocab_size)
+        engine.model = InferenceModel(torch.from_numpy(clustered_vectors(args.vocab_size, args.embedding_dim)))
+        onnx_dir = os.path.join(tmp_dir, "engine.onnx")
+        export_onnx(engine, onnx_dir, top_k=args.k + 1)
+        start = time.perf_counter()
+        onnx_engine = OnnxEngine(onnx_dir)
+        load_s = time.perf_counter() - start
+
+        rng = np.random.default_rng(1)
+        query_ids = rng.choice(np.arange(1, args.vocab_size), args.num_queries, replace=False).tolist()
+        words = [engine.vocab.idx2word[i] for i in query_ids]
+        print(f"Vocabulario: {args.vocab_size}, dim: {args.embedding_dim}, consultas: {args.num_queries}, "
+              f"hilos torch: {torch.get_num_threads()}, carga ONNX: {load_s:.2f}s")
+        print(f"{'motor':>8} | {'media ms':>8} | {'p50 ms':>8} | {'p99 ms':>8} | {'lote ms/consulta':>16} | {'top-' + str(args.k):>6}")
+
+        reference = None
+        for name, runner in (("pytorch", engine), ("onnx", onnx_engine)):
+            runner.find_similar_words(words[0], top_n=args.k)  # Calentamiento
+            latencies, found = [], []
+            for word in words:
+                start = time.perf_counter()
+                found.append([w for w, _ in runner.find_similar_words(word, top_n=args.k)])
+                latencies.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            runner.find_similar_words_batch(words, top_n=args.k)
+            batch_ms = (time.perf_counter() - start) * 1000 / len(words)
+            reference = reference or found
+            agreement = recall_at_k(found, reference)
+            print(f"{name:>8} | {np.mean(latencies):>8.3f} | {np.percentile(latencies, 50):>8.3f} | "
+                  f"{np.percentile(latencies, 99):>8.3f} | {batch_ms:>16.3f} | {agreement:>6.3f}")
+
+def bench_cache(args):
+    """Tiempo de arranque (vocabulario) y de una pasada por los tokens: texto vs cache pre-tokenizada."""
+    with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as cache_dir:
+        write_synthetic_corpus(data_dir, args.num_files, args.tokens_per_file, args.vocab_size)
+        file_paths = list_corpus_files(data_dir)
+        print(f"Archivos: {len(file_paths)}, tokens: {args.num_files * args.tokens_per_file}")
+
+        start = time.perf_counter()
+        word_counts = count_vocabulary(file_paths)
+        print(f"Texto: conteo de vocabulario {time.perf_counter() - start:.2f}s")
+        vocab = synthetic_vocab(args.vocab_size)
+        start = time.perf_counter()
+        sum(len(chunk) for chunk in iter_id_chunks(file_paths, vocab))
+        print(f"Texto: pasada por los tokens {time.perf_counter() - start:.2f}s")
+
+        for run in ("primera ejecucion", "segunda ejecucion"):
+            start = time.perf_counter()
+            cache = TokenCache(cache_dir)
+            cache.update(file_paths)
+            assert cache.word_counts() == word_counts
+            print(f"Cache ({run}): arranque {time.perf_counter() - start:.2f}s")
+        start = time.perf_counter()
+        sum(len(chunk) for chunk in cache.iter_id_chunks(vocab))
+        print(f"Cache: pasada por los tokens {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del motor de Mea-Core.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    objectives_parser = subparsers.add_parser("objectives", help="Pares/seg de softmax completo vs muestreo negativo.")
+    objectives_parser.add_argument("--vocab_sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    objectives_parser.add_argument("--embedding_dim", type=int, default=100)
+    objectives_parser.add_argument("--batch_size", type=int, default=128)
+    objectives_parser.add_argument("--steps", type=int, default=50)
+    objectives_parser.add_argument("--negatives", type=int, default=5)
+    objectives_parser.set_defaults(func=bench_objectives)
+
+    pairs_parser = subparsers.add_parser("pairs", help="Generacion de pares Skip-gram: bucles vs NumPy.")
+    pairs_parser.add_argument("--num_tokens", type=int, default=1_000_000)
+    pairs_parser.add_argument("--vocab_size", type=int, default=10_000)
+    pairs_parser.add_argument("--window_size", type=int, default=2)
+    pairs_parser.set_defaults(func=bench_pairs)
+
+    workers_parser = subparsers.add_parser("workers", help="Escalabilidad del entrenamiento Hogwild multiproceso.")
+    workers_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    workers_parser.add_argument("--objective", type=str, default="negative", choices=OBJECTIVES)
+    workers_parser.add_argument("--num_files", type=int, default=8)
+    workers_parser.add_argument("--tokens_per_file", type=int, default=100_000)
+    workers_parser.add_argument("--vocab_size", type=int, default=10_000)
+    workers_parser.add_argument("--embedding_dim", type=int, default=100)
+    workers_parser.add_argument("--batch_size", type=int, default=512)
+    workers_parser.add_argument("--epochs", type=int, default=1)
+    workers_parser.set_defaults(func=bench_workers)
+
+    index_parser = subparsers.add_parser("index", help="Latencia y recall del indice aproximado IVF.")
+    index_parser.add_argument("--vocab_size", type=int, default=200_000)
+    index_parser.add_argument("--embedding_dim", type=int, default=100)
+    index_parser.add_argument("--nlist", type=int, default=None)
+    index_parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    index_parser.add_argument("--num_queries", type=int, default=200)
+    index_parser.add_argument("--k", type=int, default=10)
+    index_parser.set_defaults(func=bench_index)
+
+    load_parser = subparsers.add_parser("load", help="Tiempo de carga y memoria: .pth vs formato mapeado en memoria.")
+    load_parser.add_argument("--vocab_size", type=int, default=500_000)
+    load_parser.add_argument("--embedding_dim", type=int, default=100)
+    load_parser.add_argument("--processes", type=int, default=4)
+    load_parser.set_defaults(func=bench_load)
+
+    quantize_parser = subparsers.add_parser("quantize", help="Memoria y precision de los embeddings float16/int8.")
+    quantize_parser.add_argument("--vocab_size", type=int, default=200_000)
+    quantize_parser.add_argument("--embedding_dim", type=int, default=100)
+    quantize_parser.add_argument("--num_queries", type=int, default=200)
+    quantize_parser.add_argument("--k", type=int, default=10)
+    quantize_parser.set_defaults(func=bench_quantize)
+
+    cache_parser = subparsers.add_parser("cache", help="Arranque del entrenamiento: texto vs cache pre-tokenizada.")
+    cache_parser.add_argument("--num_files", type=int, default=8)
+    cache_parser.add_argument("--tokens_per_file", type=int, default=1_000_000)
+    cache_parser.add_argument("--vocab_size", type=int, default=100_000)
+    cache_parser.set_defaults(func=bench_cache)
+
+    onnx_parser = subparsers.add_parser("onnx", help="Latencia de similitud: PyTorch vs onnxruntime en CPU.")
+    onnx_parser.add_argument("--vocab_size", type=int, default=200_000)
+    onnx_parser.add_argument("--embedding_dim", type=int, default=100)
+    onnx_parser.add_argument("--num_queries", type=int, default=200)
+    onnx_parser.add_argument("--k", type=int, default=10)
+    onnx_parser.set_defaults(func=bench_onnx)
+
+    args = parser.parse_args()
+    args.func(args)
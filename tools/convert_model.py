@@ -0,0 +1,46 @@
+# tools/convert_model.py
+
+"""
+Convierte un modelo MeaEngine guardado como .pth (torch.save) al formato mapeado en memoria.
+
+Uso:
+    python tools/convert_model.py mea_engine.pth mea_engine.mmap
+    python tools/convert_model.py mea_engine.pth mea_engine_int8.mmap --dtype int8
+
+El directorio resultante se puede pasar a MeaEngine.load_model en lugar del .pth.
+"""
+
+import argparse
+import os
+import sys
+
+# Permite importar los modulos de la raiz del proyecto (engine)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MeaEngine
+from quantization import QUANTIZED_DTYPES
+
+def convert(pth_path, output_dir, dtype="float32"):
+    """
+    Carga el .pth (con su indice, si existe) y lo guarda en formato mapeado en memoria.
+    Con dtype "float16" o "int8" los embeddings se cuantizan para inferencia.
+    """
+    if not os.path.exists(pth_path):
+        print(f"[Error] No se encontró el modelo '{pth_path}'.")
+        return False
+    engine = MeaEngine.load_model(pth_path)
+    engine.save_mmap(output_dir, dtype=dtype)
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte un modelo .pth al formato mapeado en memoria.")
+    parser.add_argument("pth_path", type=str, help="Ruta al modelo .pth existente.")
+    parser.add_argument("output_dir", type=str, nargs="?", default=None,
+                        help="Directorio de salida (por defecto, la misma ruta con extension .mmap).")
+    parser.add_argument("--dtype", type=str, default="float32", choices=("float32",) + QUANTIZED_DTYPES,
+                        help="Tipo de almacenamiento de los embeddings.")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or os.path.splitext(args.pth_path)[0] + ".mmap"
+    if not convert(args.pth_path, output_dir, args.dtype):
+        sys.exit(1)
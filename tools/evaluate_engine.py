@@ -0,0 +1,253 @@
+# tools/evaluate_engine.py
+
+"""
+Evaluacion no interactiva de un modelo MeaEngine: calidad y velocidad, con salida JSON.
+
+Uso:
+    python tools/evaluate_engine.py --model_path mea_engine.pth \
+        --similarity data/eval/similitud_es.txt --analogy data/eval/analogias_es.txt \
+        --output informe.json
+    python tools/evaluate_engine.py --model_path nuevo.pth --similarity data/eval/similitud_es.txt \
+        --baseline informe.json   # sale con codigo 1 si hay regresiones
+
+Formatos de los conjuntos de prueba (las lineas vacias y las que empiezan por '#' se ignoran):
+    - Similitud: "palabra1 palabra2 puntuacion" por linea (separado por espacios, tabuladores o comas).
+    - Analogias: "a b c d" por linea (a es a b como c es a d); las lineas ": nombre" abren una seccion.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import torch
+
+# Permite importar los modulos de la raiz del proyecto (engine)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import MeaEngine
+
+SEPARATORS = re.compile(r"[\s,;]+")
+
+def read_lines(file_path):
+    """Lineas utiles de un archivo de evaluacion (sin vacias ni comentarios)."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+def load_similarity_suite(file_path):
+    """Carga pares (palabra1, palabra2, puntuacion humana)."""
+    pairs = []
+    for line in read_lines(file_path):
+        fields = SEPARATORS.split(line)
+        if len(fields) >= 3:
+            pairs.append((fields[0].lower(), fields[1].lower(), float(fields[2])))
+    return pairs
+
+def load_analogy_suite(file_path):
+    """Carga analogias (a, b, c, d) agrupadas por seccion."""
+    sections = {}
+    section = "general"
+    for line in read_lines(file_path):
+        if line.startswith(":"):
+            section = line[1:].strip() or "general"
+            continue
+        fields = SEPARATORS.split(line.lower())
+        if len(fields) == 4:
+            sections.setdefault(section, []).append(tuple(fields))
+    return sections
+
+def rank(values):
+    """Rangos (empezando en 1) con la media de los rangos para los empates."""
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(values, kind="stable")
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    sums = np.bincount(inverse, weights=ranks)
+    return sums[inverse] / counts[inverse]
+
+def spearman(x, y):
+    """Correlacion de Spearman (Pearson sobre los rangos)."""
+    if len(x) < 2:
+        return None
+    rx, ry = rank(x), rank(y)
+    rx, ry = rx - rx.mean(), ry - ry.mean()
+    denominator = np.sqrt((rx ** 2).sum() * (ry ** 2).sum())
+    return float((rx * ry).sum() / denominator) if denominator > 0 else None
+
+def evaluate_similarity(engine, pairs):
+    """Correlacion de Spearman entre el coseno del modelo y las puntuaciones humanas."""
+    words_a = [a for a, _, _ in pairs]
+    words_b = [b for _, b, _ in pairs]
+    vectors_a, found_a = engine.get_word_vectors(words_a)
+    vectors_b, found_b = engine.get_word_vectors(words_b)
+    covered = (found_a & found_b).numpy()
+    cosine = (vectors_a * vectors_b).sum(dim=1).numpy()
+    gold = np.array([score for _, _, score in pairs])
+    return {
+        "pairs": len(pairs),
+        "covered": int(covered.sum()),
+        "spearman": spearman(cosine[covered], gold[covered]),
+    }
+
+def evaluate_analogies(engine, sections, batch_size=512):
+    """
+    Precision@1 de analogias con 3CosAdd (d ~ b - a + c), resueltas por lotes con una sola
+    busqueda matricial por lote. Solo se evaluan las analogias con las cuatro palabras en el vocabulario.
+    """
+    results = {}
+    total_correct = total_covered = total = 0
+    for section, quads in sections.items():
+        ids = np.array([engine.vocab.get_indices(list(quad)) for quad in quads]).reshape(-1, 4)
+        covered = ids[(ids > 0).all(axis=1)]
+        correct = 0
+        for start in range(0, len(covered), batch_size):
+            block = torch.from_numpy(covered[start:start + batch_size])
+            a, b, c = (engine._query_vectors(block[:, i]).float() for i in range(3))
+            # Ni las palabras de la pregunta ni <UNK> pueden ser la respuesta
+            exclude = [[0] + row for row in block[:, :3].tolist()]
+            predicted, _ = engine.find_similar_vectors(b - a + c, top_n=1, exclude=exclude)
+            correct += int((predicted[:, 0] == block[:, 3]).sum())
+        results[section] = {"questions": len(quads), "covered": len(covered),
+                            "accuracy": correct / len(covered) if len(covered) else None}
+        total_correct += correct
+        total_covered += len(covered)
+        total += len(quads)
+    results["total"] = {"questions": total, "covered": total_covered,
+                        "accuracy": total_correct / total_covered if total_covered else None}
+    return results
+
+def percentiles(latencies_ms):
+    """Resumen de latencias en milisegundos."""
+    latencies_ms = np.asarray(latencies_ms)
+    return {
+        "mean": float(latencies_ms.mean()),
+        "p50": float(np.percentile(latencies_ms, 50)),
+        "p90": float(np.percentile(latencies_ms, 90)),
+        "p99": float(np.percentile(latencies_ms, 99)),
+    }
+
+def measure_latency(engine, num_queries=200, top_n=10, batch_size=64, seed=0):
+    """Latencia por consulta de find_similar_words (exacta y, si hay indice, aproximada) y por lotes."""
+    rng = np.random.default_rng(seed)
+    query_ids = rng.choice(np.arange(1, len(engine.vocab)), min(num_queries, len(engine.vocab) - 1), replace=False)
+    words = [engine.vocab.idx2word[i] for i in query_ids]
+    top_n = max(1, min(top_n, len(engine.vocab) - 2))  # Vocabularios diminutos
+    engine.find_similar_words(words[0], top_n=top_n, exact=True)  # Calentamiento (caches)
+
+    report = {}
+    modes = [("exact", True)] + ([("index", False)] if engine.index is not None else [])
+    for name, exact in modes:
+        latencies = []
+        for word in words:
+            start = time.perf_counter()
+            engine.find_similar_words(word, top_n=top_n, exact=exact)
+            latencies.append((time.perf_counter() - start) * 1000)
+        report[name] = percentiles(latencies)
+
+    latencies = []
+    for start_query in range(0, len(words), batch_size):
+        start = time.perf_counter()
+        engine.find_similar_words_batch(words[start_query:start_query + batch_size], top_n=top_n)
+        latencies.append((time.perf_counter() - start) * 1000 / len(words[start_query:start_query + batch_size]))
+    report["batch_per_query"] = percentiles(latencies)
+    return report
+
+def measure_load_time(model_path, repeats=3):
+    """Tiempo de carga del modelo (mediana de varias cargas) y el motor cargado."""
+    times = []
+    engine = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        engine = MeaEngine.load_model(model_path)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), engine
+
+def evaluate(args):
+    """Ejecuta todas las evaluaciones pedidas y devuelve el informe (diccionario serializable)."""
+    load_seconds, engine = measure_load_time(args.model_path, args.load_repeats)
+    report = {
+        "model_path": args.model_path,
+        "vocab_size": len(engine.vocab),
+        "embedding_dim": engine.config["embedding_dim"],
+        "load_seconds": load_seconds,
+        "similarity": {},
+        "analogy": {},
+    }
+    for file_path in args.similarity:
+        report["similarity"][os.path.basename(file_path)] = evaluate_similarity(engine, load_similarity_suite(file_path))
+    for file_path in args.analogy:
+        report["analogy"][os.path.basename(file_path)] = evaluate_analogies(engine, load_analogy_suite(file_path))
+    if args.num_queries > 0:
+        report["latency_ms"] = measure_latency(engine, args.num_queries, args.top_n)
+    return report
+
+def find_regressions(report, baseline, max_quality_drop=0.01, max_latency_increase=0.25):
+    """
+    Compara un informe con otro de referencia. Devuelve la lista de regresiones:
+    caidas de calidad mayores que max_quality_drop (absoluta) y aumentos de latencia
+    o de tiempo de carga mayores que max_latency_increase (relativo).
+    """
+    regressions = []
+    for suite, result in report["similarity"].items():
+        old = baseline.get("similarity", {}).get(suite, {}).get("spearman")
+        if old is not None and (result["spearman"] is None or result["spearman"] < old - max_quality_drop):
+            regressions.append(f"similitud {suite}: spearman {result['spearman']} < {old}")
+    for suite, result in report["analogy"].items():
+        old = baseline.get("analogy", {}).get(suite, {}).get("total", {}).get("accuracy")
+        new = result["total"]["accuracy"]
+        if old is not None and (new is None or new < old - max_quality_drop):
+            regressions.append(f"analogias {suite}: precision {new} < {old}")
+
+    timings = [("carga", report.get("load_seconds"), baseline.get("load_seconds"))]
+    for mode, stats in report.get("latency_ms", {}).items():
+        timings.append((f"latencia {mode} p99", stats["p99"], baseline.get("latency_ms", {}).get(mode, {}).get("p99")))
+    for name, new, old in timings:
+        if new is not None and old and new > old * (1 + max_latency_increase):
+            regressions.append(f"{name}: {new:.4f} > {old:.4f} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+def build_parser():
+    """Crea el parser de argumentos de la linea de comandos."""
+    parser = argparse.ArgumentParser(description="Evalua la calidad y la velocidad de un modelo MeaEngine (salida JSON).")
+    parser.add_argument("--model_path", type=str, default="mea_engine.pth", help="Modelo a evaluar (.pth o directorio mapeado en memoria).")
+    parser.add_argument("--similarity", type=str, nargs="*", default=[], help="Archivos de similitud de palabras.")
+    parser.add_argument("--analogy", type=str, nargs="*", default=[], help="Archivos de analogias.")
+    parser.add_argument("--num_queries", type=int, default=200, help="Consultas para medir la latencia (0 la omite).")
+    parser.add_argument("--top_n", type=int, default=10, help="Vecinos por consulta al medir la latencia.")
+    parser.add_argument("--load_repeats", type=int, default=3, help="Cargas del modelo para medir el tiempo de carga.")
+    parser.add_argument("--output", type=str, default=None, help="Archivo JSON de salida (por defecto, la salida estandar).")
+    parser.add_argument("--baseline", type=str, default=None, help="Informe JSON de referencia: sale con codigo 1 si hay regresiones.")
+    parser.add_argument("--max_quality_drop", type=float, default=0.01, help="Caida absoluta maxima de spearman/precision.")
+    parser.add_argument("--max_latency_increase", type=float, default=0.25, help="Aumento relativo maximo de latencia p99 y tiempo de carga.")
+    return parser
+
+def main(args):
+    """Evalua, escribe el informe JSON y devuelve el codigo de salida (1 si hay regresiones)."""
+    # Los mensajes del motor van a stderr para que la salida estandar sea solo el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = evaluate(args)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["regressions"] = find_regressions(report, json.load(f), args.max_quality_drop, args.max_latency_increase)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    for regression in report.get("regressions", []):
+        print(f"[Regresion] {regression}", file=sys.stderr)
+    return 1 if report.get("regressions") else 0
+
+if __name__ == "__main__":
+    sys.exit(main(build_parser().parse_args()))
@@ -1,127 +1,431 @@
 
 import torch
+import torch.multiprocessing as mp
 import torch.optim as optim
-from torch.utils.data import DataLoader, TensorDataset
+from torch.utils.data import DataLoader
+import numpy as np
 import argparse
-import glob
-import re
-from engine import MeaEngine
-
-def tokenize(text):
-    """Funcion simple de tokenizacion."""
-    return re.findall(r'\b\w+\b', text.lower())
+import os
+import queue
+import random
+import threading
+import time
+from engine import MeaEngine, NegativeSampler, OBJECTIVES, save_atomic, tokenize  # noqa: F401
+from corpus import list_corpus_files, count_vocabulary, skipgram_pairs, SkipGramStream, TokenCache
 
 def create_skipgram_dataset(tokens, vocab, window_size=2):
     """
     Crea pares de (palabra_objetivo, palabra_de_contexto) para el modelo Skip-gram.
+    Materializa todos los pares en memoria: para corpus grandes usar SkipGramStream.
     """
-    targets = []
-    contexts = []
-    
-    # Convierte todos los tokens a indices numericos
-    indexed_tokens = [vocab.get_index(token) for token in tokens]
+    # Convierte todos los tokens a indices numericos de una sola vez
+    indexed_tokens = vocab.get_indices(tokens)
+    targets, contexts = skipgram_pairs(indexed_tokens, window_size)
+    return torch.from_numpy(targets), torch.from_numpy(contexts)
+
+def build_optimizer(model, learning_rate):
+    """
+    Crea el optimizador adecuado al objetivo del modelo.
+    Con muestreo negativo los embeddings son dispersos y SparseAdam solo
+    actualiza las filas tocadas por el lote.
+    """
+    if model.objective == "negative":
+        return optim.SparseAdam(list(model.parameters()), lr=learning_rate)
+    return optim.Adam(model.parameters(), lr=learning_rate)
 
-    for i, target_idx in enumerate(indexed_tokens):
-        # Ignoramos palabras desconocidas en el centro
-        if target_idx == 0:
+def compute_loss(model, target_batch, context_batch, criterion=None, sampler=None, num_negatives=5):
+    """Calcula la perdida de un lote segun el objetivo del modelo."""
+    if model.objective == "negative":
+        negatives = sampler.sample(target_batch.size(0), num_negatives).to(target_batch.device)
+        return model.negative_sampling_loss(target_batch, context_batch, negatives)
+
+    # Forward pass: predecir scores de contexto desde la palabra objetivo
+    scores = model(target_batch)
+    return criterion(scores, context_batch)
+
+def make_dataset(file_paths, vocab, args, shard=None):
+    """Crea el dataset en streaming de pares Skip-gram con las opciones de la linea de comandos."""
+    # La cache ya se actualizo en main: aqui (tambien en cada proceso Hogwild) solo se abre
+    cache_dir = getattr(args, "cache_dir", None)
+    return SkipGramStream(file_paths, vocab, args.window_size, args.batch_size,
+                          seed=args.seed, subsample=args.subsample,
+                          dynamic_window=args.dynamic_window, shard=shard,
+                          token_cache=TokenCache(cache_dir) if cache_dir else None)
+
+def train_epoch(model, dataloader, optimizer, criterion, sampler, args, epoch, device,
+                log_prefix="", totals=None, on_batch=None):
+    """
+    Ejecuta una epoca de entrenamiento sobre el dataloader.
+    totals acumula {"loss", "batches", "pairs"} de la epoca; si ya trae lotes hechos
+    (reanudacion desde un checkpoint), esos primeros lotes se saltan sin entrenar.
+    on_batch(epoch, totals) se llama tras cada lote (por ejemplo, para guardar checkpoints).
+    """
+    totals = totals if totals is not None else {"loss": 0.0, "batches": 0, "pairs": 0}
+    done_batches = totals["batches"]
+    for i, (target_batch, context_batch) in enumerate(dataloader):
+        # El flujo de pares es determinista por epoca: saltar los lotes ya entrenados
+        if i < done_batches:
             continue
 
-        # Define la ventana de contexto alrededor de la palabra objetivo
-        start = max(0, i - window_size)
-        end = min(len(indexed_tokens), i + window_size + 1)
-
-        # Recorre las palabras en la ventana
-        for j in range(start, end):
-            if i == j: # No queremos que la palabra sea su propio contexto
-                continue
-            
-            context_idx = indexed_tokens[j]
-            # Ignoramos palabras de contexto desconocidas
-            if context_idx == 0:
-                continue
-            
-            targets.append(target_idx)
-            contexts.append(context_idx)
-            
-    return torch.LongTensor(targets), torch.LongTensor(contexts)
+        # Mueve los datos al dispositivo (CPU/GPU)
+        target_batch = target_batch.to(device)
+        context_batch = context_batch.to(device)
+
+        # Reinicia los gradientes
+        optimizer.zero_grad()
+
+        # Forward pass y calculo de la perdida
+        loss = compute_loss(model, target_batch, context_batch, criterion, sampler, args.negatives)
+
+        # Backward pass: calcular gradientes
+        loss.backward()
+
+        # Actualizar los pesos del modelo
+        optimizer.step()
+
+        totals["loss"] += loss.item()
+        totals["batches"] += 1
+        totals["pairs"] += target_batch.size(0)
+
+        # Imprime el progreso cada N lotes
+        if (i + 1) % 100 == 0:
+            print(f'{log_prefix}Epoch [{epoch+1}/{args.epochs}], Lote [{i+1}], Perdida: {loss.item():.4f}')
+
+        if on_batch:
+            on_batch(epoch, totals)
+
+    return totals
+
+def report_epoch(epoch, args, totals, elapsed, stats):
+    """Imprime el resumen de una epoca y devuelve la perdida promedio."""
+    avg_loss = totals["loss"] / max(totals["batches"], 1)
+    pairs_per_sec = totals["pairs"] / elapsed if elapsed > 0 else 0.0
+    print(f'Fin de Epoch [{epoch+1}/{args.epochs}], Perdida Promedio: {avg_loss:.4f}, '
+          f'Tiempo: {elapsed:.2f}s, Pares/seg: {pairs_per_sec:.0f}')
+    if args.subsample > 0:
+        kept_ratio = stats["kept_tokens"] / max(stats["tokens"], 1)
+        print(f'  Submuestreo: {stats["kept_tokens"]}/{stats["tokens"]} tokens conservados '
+              f'({kept_ratio:.1%}), {totals["pairs"]} pares generados')
+    return avg_loss
+
+# --- Checkpoints y parada temprana ---
+
+class EarlyStopping:
+    """Detiene el entrenamiento si la perdida promedio deja de mejorar durante 'patience' epocas."""
+    def __init__(self, patience=0, min_delta=0.0):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best_loss = float("inf")
+        self.bad_epochs = 0
+
+    def step(self, loss):
+        """Registra la perdida de una epoca. Devuelve True si hay que detenerse."""
+        if loss < self.best_loss - self.min_delta:
+            self.best_loss = loss
+            self.bad_epochs = 0
+        else:
+            self.bad_epochs += 1
+        return self.patience > 0 and self.bad_epochs >= self.patience
+
+    def state_dict(self):
+        return {"best_loss": self.best_loss, "bad_epochs": self.bad_epochs}
+
+    def load_state_dict(self, state):
+        self.best_loss = state["best_loss"]
+        self.bad_epochs = state["bad_epochs"]
+
+def get_rng_state():
+    """Captura el estado de los generadores aleatorios globales."""
+    return {
+        "torch": torch.get_rng_state(),
+        "numpy": np.random.get_state(),
+        "python": random.getstate(),
+    }
+
+def set_rng_state(state):
+    """Restaura el estado de los generadores aleatorios globales."""
+    torch.set_rng_state(state["torch"])
+    np.random.set_state(state["numpy"])
+    random.setstate(state["python"])
+
+def save_checkpoint(file_path, engine, optimizer, epoch, totals, early_stopping):
+    """
+    Guarda de forma atomica todo lo necesario para reanudar: motor (config, vocabulario
+    y pesos), estado del optimizador, posicion (epoca y lote) y estado de los RNG.
+    """
+    checkpoint = {
+        "engine": engine.to_dict(),
+        "optimizer_state_dict": optimizer.state_dict() if optimizer else None,
+        "epoch": epoch,
+        "epoch_totals": dict(totals),
+        "early_stopping": early_stopping.state_dict(),
+        "rng_state": get_rng_state(),
+    }
+    save_atomic(checkpoint, file_path)
+
+def load_checkpoint(file_path):
+    """Carga un checkpoint generado por save_checkpoint."""
+    # Los checkpoints incluyen estados de RNG de NumPy/Python: no son solo pesos
+    return torch.load(file_path, weights_only=False)
+
+# Cada cuanto comprueba el proceso principal que los procesos siguen vivos mientras espera
+WORKER_POLL_SECONDS = 1.0
+# Espera maxima en la barrera de fin de epoca una vez recibidos todos los informes
+BARRIER_TIMEOUT_SECONDS = 300.0
+
+def _hogwild_worker(rank, world_size, model, vocab, file_paths, args, results, barrier, stop, start_epoch):
+    """
+    Proceso de entrenamiento Hogwild: actualiza sin bloqueos los parametros del modelo,
+    que viven en memoria compartida, usando su propio tramo del corpus y su propio optimizador.
+    Al final de cada epoca espera al proceso principal (checkpoint y parada temprana).
+    """
+    torch.set_num_threads(args.threads_per_worker)
+    torch.manual_seed(args.seed + rank)
+
+    dataset = make_dataset(file_paths, vocab, args, shard=(rank, world_size))
+    dataloader = DataLoader(dataset, batch_size=None)
+    criterion = torch.nn.CrossEntropyLoss()
+    sampler = NegativeSampler(vocab) if model.objective == "negative" else None
+    optimizer = build_optimizer(model, args.learning_rate)
+    device = torch.device("cpu")
+
+    for epoch in range(start_epoch, args.epochs):
+        dataset.set_epoch(epoch)
+        epoch_start = time.perf_counter()
+        totals = train_epoch(
+            model, dataloader, optimizer, criterion, sampler, args, epoch, device, log_prefix=f"[Worker {rank}] ")
+        results.put({"rank": rank, "epoch": epoch, "totals": totals,
+                     "seconds": time.perf_counter() - epoch_start, "stats": dataset.stats})
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            # El proceso principal ha abortado el entrenamiento (otro proceso fallo)
+            return
+        if stop.value:
+            break
+
+def _collect_reports(results, processes):
+    """
+    Espera el informe de fin de epoca de cada proceso. Entre esperas comprueba que los
+    procesos sin informe siguen vivos: si alguno termino (excepcion, falta de memoria...)
+    lanza una excepcion en lugar de esperar para siempre.
+    """
+    reports = {}
+    while len(reports) < len(processes):
+        try:
+            report = results.get(timeout=WORKER_POLL_SECONDS)
+            reports[report["rank"]] = report
+        except queue.Empty:
+            for rank, process in enumerate(processes):
+                if rank not in reports and process.exitcode is not None:
+                    raise Exception(f"El proceso de entrenamiento {rank} termino inesperadamente "
+                                    f"(codigo de salida {process.exitcode}).")
+    return list(reports.values())
+
+def _abort_workers(processes, barrier):
+    """Libera a los procesos que esperan en la barrera y termina los que siguen vivos."""
+    barrier.abort()
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+def train_hogwild(engine, file_paths, args, start_epoch=0, early_stopping=None, on_epoch_end=None):
+    """
+    Entrena con args.workers procesos en CPU (estilo Hogwild) sobre un modelo en memoria
+    compartida. Como todos los procesos escriben en los mismos tensores, al terminar
+    basta con guardar el modelo del proceso principal.
+    on_epoch_end(epoch) se llama con todos los procesos detenidos en la barrera de fin de
+    epoca, por lo que el modelo es consistente (por ejemplo, para guardar un checkpoint).
+    Devuelve la lista de resumenes por epoca.
+    """
+    model = engine.model
+    model.train()
+    model.share_memory()
+
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    barrier = ctx.Barrier(args.workers + 1)
+    stop = ctx.Value("b", 0)
+    processes = [
+        ctx.Process(target=_hogwild_worker,
+                    args=(rank, args.workers, model, engine.vocab, file_paths, args, results,
+                          barrier, stop, start_epoch))
+        for rank in range(args.workers)
+    ]
+    print(f"Entrenando en CPU con {args.workers} procesos Hogwild "
+          f"({args.threads_per_worker} hilos por proceso)")
+
+    for process in processes:
+        process.start()
+
+    summaries = []
+    try:
+        for epoch in range(start_epoch, args.epochs):
+            # Espera el informe de todos los procesos para esta epoca
+            reports = _collect_reports(results, processes)
+            # La epoca dura lo que tarde el proceso mas lento (sin contar el arranque de los procesos)
+            elapsed = max(r["seconds"] for r in reports)
+
+            totals = {key: sum(r["totals"][key] for r in reports) for key in ("loss", "batches", "pairs")}
+            # Cada proceso submuestrea su propio tramo del corpus
+            stats = {key: sum(r["stats"][key] for r in reports) for key in ("tokens", "kept_tokens", "pairs")}
+            avg_loss = report_epoch(epoch, args, totals, elapsed, stats)
+            summaries.append({"epoch": epoch, "loss": avg_loss, "pairs": totals["pairs"], "seconds": elapsed})
+
+            should_stop = early_stopping.step(avg_loss) if early_stopping else False
+            if on_epoch_end:
+                on_epoch_end(epoch)
+            if should_stop:
+                print(f"Parada temprana: la perdida no mejora desde hace {early_stopping.bad_epochs} epocas.")
+                stop.value = 1
+            # Todos los procesos ya enviaron su informe: solo falta que lleguen a la barrera
+            barrier.wait(timeout=BARRIER_TIMEOUT_SECONDS)
+            if should_stop:
+                break
+    except BaseException:
+        # Un proceso fallo (o se interrumpio el entrenamiento): no dejar procesos bloqueados
+        _abort_workers(processes, barrier)
+        raise
+
+    for process in processes:
+        process.join()
+    return summaries
+
+def finalize_model(engine, args):
+    """Construye el indice aproximado (si se pidio) y guarda el modelo."""
+    if args.build_index:
+        engine.model.cpu()
+        engine.build_index(nlist=args.nlist, nprobe=args.nprobe)
+        recall = engine.tune_index(target_recall=args.target_recall, k=10)
+        print(f"Recall@10 del indice frente a la busqueda exacta: {recall:.3f} (nprobe={engine.index.nprobe})")
+    engine.save_model(args.model_path)
 
 def main(args):
+    if args.threads_per_worker is None:
+        args.threads_per_worker = max(1, (os.cpu_count() or 1) // args.workers)
+    checkpoint = load_checkpoint(args.resume) if args.resume else None
+
     # --- 1. Carga y Preparacion de Datos ---
-    print("Cargando archivos de texto...")
-    corpus = ""
+    # Los archivos se leen en streaming: nunca se carga el corpus completo en memoria.
     # Busca todos los archivos .txt en la ruta especificada
-    for file_path in glob.glob(f"{args.data_path}/**/*.txt", recursive=True):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            corpus += f.read() + "\n"
-    
-    if not corpus:
-        print("No se encontraron archivos .txt en la ruta especificada. Abortando.")
+    file_paths = list_corpus_files(args.data_path)
+    token_cache = None
+    if args.cache_dir:
+        # Solo se tokenizan los archivos nuevos o modificados desde la ultima ejecucion
+        cache_start = time.perf_counter()
+        token_cache = TokenCache(args.cache_dir)
+        cache_stats = token_cache.update(file_paths)
+        print(f"Cache de tokens en {args.cache_dir}: {cache_stats['reused']} archivos reutilizados, "
+              f"{cache_stats['tokenized']} tokenizados, {cache_stats['removed']} eliminados "
+              f"({time.perf_counter() - cache_start:.2f}s).")
+
+    # --- 2. Construccion del Motor y Vocabulario ---
+    if checkpoint:
+        # Al reanudar, el vocabulario y los pesos salen del checkpoint
+        engine = MeaEngine.from_dict(checkpoint["engine"])
+        print(f"Reanudando desde {args.resume} (epoca {checkpoint['epoch'] + 1}, "
+              f"lote {checkpoint['epoch_totals']['batches']}).")
+    else:
+        if token_cache is not None:
+            word_counts = token_cache.word_counts()
+        else:
+            print("Contando vocabulario de los archivos de texto...")
+            word_counts = count_vocabulary(file_paths)
+
+        if not word_counts:
+            print("No se encontraron archivos .txt en la ruta especificada. Abortando.")
+            return
+
+        print(f"Se contaron {sum(word_counts.values())} tokens en {len(file_paths)} archivos.")
+        engine = MeaEngine(
+            embedding_dim=args.embedding_dim,
+            min_word_count=args.min_count,
+            objective=args.objective,
+            ngram_buckets=args.ngram_buckets,
+            min_n=args.min_n,
+            max_n=args.max_n
+        )
+        engine.build_from_counts(word_counts)
+    print(f"Objetivo de entrenamiento: {engine.config['objective']}")
+
+    early_stopping = EarlyStopping(args.patience, args.min_delta)
+    start_epoch = 0
+    totals = None
+    if checkpoint:
+        early_stopping.load_state_dict(checkpoint["early_stopping"])
+        start_epoch = checkpoint["epoch"]
+        totals = checkpoint["epoch_totals"]
+        set_rng_state(checkpoint["rng_state"])
+
+    # --- 3. Entrenamiento multiproceso (Hogwild) ---
+    if args.workers > 1:
+        if totals and totals["batches"]:
+            print("[Advertencia] Con --workers > 1 se reanuda desde el inicio de la epoca guardada.")
+
+        def checkpoint_epoch(epoch):
+            if args.checkpoint_path:
+                save_checkpoint(args.checkpoint_path, engine, None, epoch + 1,
+                                {"loss": 0.0, "batches": 0, "pairs": 0}, early_stopping)
+
+        train_hogwild(engine, file_paths, args, start_epoch, early_stopping, checkpoint_epoch)
+        finalize_model(engine, args)
         return
 
-    print(f"Se cargaron {len(corpus)} caracteres para el entrenamiento.")
+    # --- 4. Creacion del Dataset de Entrenamiento ---
+    # Los pares Skip-gram se generan al vuelo, en lotes de tamaño fijo.
+    print("Creando dataset en streaming para Skip-gram...")
+    dataset = make_dataset(file_paths, engine.vocab, args)
+    # Generador propio: iterar el DataLoader no debe consumir el RNG global,
+    # para que reanudar desde un checkpoint reproduzca exactamente la misma ejecucion
+    dataloader = DataLoader(dataset, batch_size=None, generator=torch.Generator())
 
-    # --- 2. Construccion del Motor y Vocabulario ---
-    engine = MeaEngine(
-        embedding_dim=args.embedding_dim,
-        min_word_count=args.min_count
-    )
-    engine.build(corpus)
-
-    # --- 3. Creacion del Dataset de Entrenamiento ---
-    print("Creando dataset para Skip-gram...")
-    tokens = tokenize(corpus)
-    targets, contexts = create_skipgram_dataset(tokens, engine.vocab, args.window_size)
-    dataset = TensorDataset(targets, contexts)
-    dataloader = DataLoader(dataset, batch_size=args.batch_size, shuffle=True)
-
-    # --- 4. Configuracion del Entrenamiento ---
+    # --- 5. Configuracion del Entrenamiento ---
     model = engine.model
     # Usamos CrossEntropyLoss que combina LogSoftmax y NLLLoss para eficiencia
     criterion = torch.nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
+    # La tabla de ruido solo se necesita con muestreo negativo
+    sampler = NegativeSampler(engine.vocab) if model.objective == "negative" else None
+    optimizer = build_optimizer(model, args.learning_rate)
 
     # Mueve el modelo a la GPU si esta disponible
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     model.to(device)
     print(f"Entrenando en dispositivo: {device}")
+    if checkpoint and checkpoint["optimizer_state_dict"]:
+        optimizer.load_state_dict(checkpoint["optimizer_state_dict"])
 
-    # --- 5. Bucle de Entrenamiento ---
-    model.train() # Pone el modelo en modo de entrenamiento
-    for epoch in range(args.epochs):
-        total_loss = 0
-        for i, (target_batch, context_batch) in enumerate(dataloader):
-            # Mueve los datos al dispositivo (CPU/GPU)
-            target_batch = target_batch.to(device)
-            context_batch = context_batch.to(device)
-
-            # Reinicia los gradientes
-            optimizer.zero_grad()
+    def checkpoint_batch(epoch, epoch_totals):
+        # Checkpoint periodico a mitad de epoca
+        if args.checkpoint_path and args.checkpoint_every and epoch_totals["batches"] % args.checkpoint_every == 0:
+            save_checkpoint(args.checkpoint_path, engine, optimizer, epoch, epoch_totals, early_stopping)
 
-            # Forward pass: predecir scores de contexto desde la palabra objetivo
-            scores = model(target_batch)
-
-            # Calcular la perdida
-            loss = criterion(scores, context_batch)
-
-            # Backward pass: calcular gradientes
-            loss.backward()
-
-            # Actualizar los pesos del modelo
-            optimizer.step()
+    # --- 6. Bucle de Entrenamiento ---
+    model.train() # Pone el modelo en modo de entrenamiento
+    for epoch in range(start_epoch, args.epochs):
+        dataset.set_epoch(epoch)
+        epoch_start = time.perf_counter()
+        totals = train_epoch(model, dataloader, optimizer, criterion, sampler, args, epoch, device,
+                             totals=totals, on_batch=checkpoint_batch)
+        elapsed = time.perf_counter() - epoch_start
+        avg_loss = report_epoch(epoch, args, totals, elapsed, dataset.stats)
+        totals = None
 
-            total_loss += loss.item()
+        should_stop = early_stopping.step(avg_loss)
+        # Checkpoint de fin de epoca: la siguiente ejecucion empieza en la epoca siguiente
+        if args.checkpoint_path:
+            save_checkpoint(args.checkpoint_path, engine, optimizer, epoch + 1,
+                            {"loss": 0.0, "batches": 0, "pairs": 0}, early_stopping)
+        if should_stop:
+            print(f"Parada temprana: la perdida no mejora desde hace {early_stopping.bad_epochs} epocas.")
+            break
 
-            # Imprime el progreso cada N lotes
-            if (i + 1) % 100 == 0:
-                print(f'Epoch [{epoch+1}/{args.epochs}], Lote [{i+1}/{len(dataloader)}], Perdida: {loss.item():.4f}')
-        
-        avg_loss = total_loss / len(dataloader)
-        print(f'Fin de Epoch [{epoch+1}/{args.epochs}], Perdida Promedio: {avg_loss:.4f}')
+    # --- 7. Guardado del Modelo ---
+    finalize_model(engine, args)
 
-    # --- 6. Guardado del Modelo ---
-    engine.save_model(args.model_path)
-
-if __name__ == "__main__":
+def build_parser():
+    """Crea el parser de argumentos de la linea de comandos."""
     parser = argparse.ArgumentParser(description="Entrenar el motor de Mea-Core desde cero.")
     
     parser.add_argument("--data_path", type=str, required=True, help="Ruta a la carpeta con los archivos .txt para entrenar.")
@@ -132,6 +436,29 @@ if __name__ == "__main__":
     parser.add_argument("--learning_rate", type=float, default=0.001, help="Tasa de aprendizaje.")
     parser.add_argument("--window_size", type=int, default=2, help="Tamaño de la ventana de contexto (palabras a cada lado).")
     parser.add_argument("--min_count", type=int, default=5, help="Frecuencia minima para que una palabra sea incluida en el vocabulario.")
+    parser.add_argument("--objective", type=str, default="softmax", choices=OBJECTIVES, help="Objetivo de entrenamiento: softmax completo o muestreo negativo.")
+    parser.add_argument("--negatives", type=int, default=5, help="Numero de muestras negativas por par (solo con --objective negative).")
+    parser.add_argument("--ngram_buckets", type=int, default=0, help="Modo subpalabra: numero de buckets para los n-gramas de caracteres (ej. 200000). 0 lo desactiva.")
+    parser.add_argument("--min_n", type=int, default=3, help="Longitud minima de los n-gramas de caracteres (modo subpalabra).")
+    parser.add_argument("--max_n", type=int, default=6, help="Longitud maxima de los n-gramas de caracteres (modo subpalabra).")
+    parser.add_argument("--subsample", type=float, default=0.0, help="Umbral t de submuestreo de palabras frecuentes (ej. 1e-3). 0 lo desactiva.")
+    parser.add_argument("--dynamic_window", action="store_true", help="Usa ventanas de tamaño aleatorio en [1, window_size] para cada palabra objetivo.")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla para el barajado, el submuestreo y las ventanas dinamicas.")
+    parser.add_argument("--workers", type=int, default=1, help="Numero de procesos de entrenamiento en CPU (Hogwild). 1 = un solo proceso.")
+    parser.add_argument("--threads_per_worker", type=int, default=None, help="Hilos de PyTorch por proceso (por defecto: nucleos / workers).")
+    parser.add_argument("--checkpoint_path", type=str, default=None, help="Archivo de checkpoint (se sobrescribe de forma atomica). Sin el, no se guardan checkpoints.")
+    parser.add_argument("--checkpoint_every", type=int, default=0, help="Guarda un checkpoint cada N lotes, ademas de al final de cada epoca (solo con --workers 1).")
+    parser.add_argument("--resume", type=str, default=None, help="Reanuda el entrenamiento desde un checkpoint.")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Directorio de la cache del corpus pre-tokenizado. Se crea o actualiza (solo archivos modificados) y se reutiliza entre ejecuciones.")
+    parser.add_argument("--patience", type=int, default=0, help="Parada temprana: epocas sin mejora de la perdida antes de detenerse. 0 la desactiva.")
+    parser.add_argument("--min_delta", type=float, default=1e-4, help="Mejora minima de la perdida promedio para considerar que hay progreso.")
 
-    args = parser.parse_args()
+    parser.add_argument("--build_index", action="store_true", help="Construye y guarda un indice aproximado (IVF) junto al modelo.")
+    parser.add_argument("--nlist", type=int, default=None, help="Numero de listas del indice IVF (por defecto: raiz del tamaño del vocabulario).")
+    parser.add_argument("--nprobe", type=int, default=8, help="Listas del indice IVF inspeccionadas por consulta (valor inicial).")
+    parser.add_argument("--target_recall", type=float, default=0.95, help="Recall@10 minimo del indice: nprobe se aumenta hasta alcanzarlo.")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
     main(args)